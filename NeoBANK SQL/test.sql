@@ -166,17 +166,29 @@ ORDER BY weight_gain DESC;
 
 
 
-SELECT 
+-- weight z-score at PMA against the postnatal preterm standard (SQLite, nicu_hmo.db)
+-- growth_refs holds L/M/S per GA day; interpolate between the days either side
+-- and score with lms_z(), which neobank.db registers on its connections.
+-- neobank.db.zscores() runs the full version (all standards and measures).
+SELECT
     s."Subject ID",
     s."DOL",
     s."CGA",
     s."Current Weight",
-    (s."Current Weight" - r.mean) / r.sd AS weight_z
-FROM samples s
-JOIN growth_refs r
-  ON s."CGA" = r.GA_weeks
- AND s."Sex" = r.sex
- AND r.parameter = 'weight';
+    lms_z(s."Current Weight" / 1000.0,
+          lo.L + (s."PMA_weeks" * 7 - lo.ga_day) * (hi.L - lo.L),
+          lo.M + (s."PMA_weeks" * 7 - lo.ga_day) * (hi.M - lo.M),
+          lo.S + (s."PMA_weeks" * 7 - lo.ga_day) * (hi.S - lo.S)) AS weight_z
+FROM Subjects s
+JOIN growth_refs lo
+  ON lo.standard = 'postnatal_preterm'
+ AND lo.sex = LOWER(s."Infant Sex")
+ AND lo.measure = 'weight'
+ AND lo.ga_day = CAST(s."PMA_weeks" * 7 AS INTEGER)
+JOIN growth_refs hi
+  ON hi.standard = lo.standard AND hi.sex = lo.sex AND hi.measure = lo.measure
+ AND hi.ga_day = lo.ga_day + 1
+WHERE s."DOL" > 0;
 
 
 
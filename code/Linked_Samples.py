@@ -2,12 +2,16 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from neobank import data, growth
 
 st.title("NeoBank: Linked Samples")
 
 
-meta = pd.read_excel("cleaned_linkedmeta_updated.xlsx")
+meta = data.load_linked_meta()
 
 
 ####--------------------------------------------------------------------------------------------------------------
@@ -84,7 +88,7 @@ total_aliquots = meta["Aliquots"].sum()
 metric_card("Number of Total Aliquots", total_aliquots)
 
 # Aliquots per subject
-aliquots_per_subject = meta.groupby("Subject ID")["Aliquots"].sum().reset_index()
+aliquots_per_subject = meta.groupby("Subject ID", observed=True)["Aliquots"].sum().reset_index()
 aliquots_per_subject.columns = ["Subject ID", "Total Aliquots"]
 
 fig_aliquots = px.bar(
@@ -123,7 +127,9 @@ selected_milk_var = st.selectbox("Select a milk-related variable to explore:", m
 if selected_milk_var:
     st.markdown(f"**Distribution of** `{selected_milk_var}`")
 
+    # categorical columns list every category; only show the ones in use
     value_counts = meta[selected_milk_var].value_counts()
+    value_counts = value_counts[value_counts > 0]
 
     # Show value counts
     st.write(value_counts.to_frame().rename(columns={selected_milk_var: "Count"}))
@@ -201,7 +207,7 @@ else:
 st.subheader("DOL Category per Subject")
 
 # Prepare data: group by Subject ID and DOL Category, count occurrences
-dol_cat_counts = meta.groupby(["Subject ID", "DOL Category"]).size().reset_index(name="Count")
+dol_cat_counts = meta.groupby(["Subject ID", "DOL Category"], observed=True).size().reset_index(name="Count")
 
 # Pivot for plotting
 dol_cat_pivot = dol_cat_counts.pivot(index="Subject ID", columns="DOL Category", values="Count").fillna(0)
@@ -268,35 +274,8 @@ st.markdown(f"""
     </div>
 """, unsafe_allow_html=True)
 
-# Define columns for layout
-col1, col2, col3 = st.columns(3)
-
-# Standard figure style function
-def make_growth_plot(x, y, title):
-    fig1, ax = plt.subplots(figsize=(4, 3))
-    fig1.patch.set_facecolor('#1E1E1E')
-    ax.set_facecolor('#1E1E1E')
-    ax.plot(subject_df[x], subject_df[y], marker="o", color="#4A90E2")
-    ax.set_xlabel(x, color='white')
-    ax.set_ylabel(y, color='white')
-    ax.set_title(title, color='white')
-    ax.tick_params(colors='white')
-
-    # Add tick marks every 2 DOL units
-    x_vals = subject_df[x].dropna().sort_values()
-    if not x_vals.empty:
-        tick_range = np.arange(x_vals.min(), x_vals.max() + 2, 3)
-        ax.set_xticks(tick_range)
-    return fig1
-
-# Weight
-with col1:
-    st.pyplot(make_growth_plot("DOL", "Current Weight", "Weight (g)"))
-
-# Height
-with col2:
-    st.pyplot(make_growth_plot("DOL", "Current Height", "Height (cm)"))
-
-# Head Circumference
-with col3:
-    st.pyplot(make_growth_plot("DOL", "Current HC", "Head Circumference (cm)"))
+# Weight, height and head circumference as one interactive figure
+fig_growth = growth.growth_figure(
+    subject_df, line_color="#4A90E2", background="#1E1E1E", font_color="white"
+)
+st.plotly_chart(fig_growth, use_container_width=True)
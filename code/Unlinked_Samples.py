@@ -1,11 +1,15 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from sqlalchemy import create_engine
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from neobank import cube, data, growth, hmo, secretor, subjects
 
 # Set up the dashboard
 st.set_page_config(page_title="NeoBank HMO Dashboard", layout="wide")
@@ -45,7 +49,10 @@ with st.container():
     """, unsafe_allow_html=True)
 
 # Load the merged dataset
-df = pd.read_excel("Cleaned Data/Unlinked_Merged.xlsx")
+df = data.load_unlinked()
+subject_index = subjects.unlinked_index()
+hmo_store = hmo.unlinked()
+counts = cube.load("unlinked")
 
 ####--------------------------------------------------------------------------------------------------------------
 ############### Overview section ###############
@@ -85,7 +92,7 @@ with col2:
 st.subheader("Sample Count per Subject")
 
 # Count how many samples per subject
-sample_counts = df["Subject ID"].value_counts().sort_index()
+sample_counts = subject_index.counts
 sample_counts_df = sample_counts.reset_index()
 sample_counts_df.columns = ["Subject ID", "Sample Count"]
 
@@ -116,11 +123,11 @@ st.plotly_chart(fig, use_container_width=True)
 st.subheader("Aliquots Overview")
 
 # Metric card for total aliquots
-total_aliquots = df["Aliquots_num"].sum()
+total_aliquots = counts.total("aliquots")
 metric_card("Number of Total Aliquots", total_aliquots)
 
 # Aliquots per subject
-aliquots_per_subject = df.groupby("Subject ID")["Aliquots_num"].sum().reset_index()
+aliquots_per_subject = counts.counts("Subject ID", "aliquots").sort_index().reset_index()
 aliquots_per_subject.columns = ["Subject ID", "Total Aliquots"]
 
 fig_aliquots = px.bar(
@@ -163,7 +170,7 @@ selected_milk_var = st.selectbox("Select a milk-related variable to explore:", m
 if selected_milk_var:
     st.markdown(f"**Distribution of** `{selected_milk_var}`")
 
-    value_counts = df[selected_milk_var].value_counts()
+    value_counts = counts.counts(selected_milk_var).rename("count")
 
     # Show value counts
     st.write(value_counts.to_frame().rename(columns={selected_milk_var: "Count"}))
@@ -174,7 +181,7 @@ if selected_milk_var:
     st.subheader("Milk Collection Notes")
 
     # Count the occurrences of each unique note (excluding NaN)
-    notes_counts = df["Sample Source"].dropna().value_counts()
+    notes_counts = counts.counts("Sample Source").rename("count")
 
     if not notes_counts.empty:
         st.write(notes_counts.to_frame().rename(columns={"Sample Source": "Count"}))
@@ -202,17 +209,15 @@ st.subheader("Growth Metric Overview")
 #############-----------------
 
 
-# Filter subjects with >3 timepoints
-subject_counts = df["Subject ID"].value_counts()
-longitudinal_subjects = subject_counts[subject_counts > 3].index.tolist()
+# Subjects with >3 timepoints
+longitudinal_subjects = subject_index.longitudinal(4)
 
 st.markdown("📍 Showing only subjects with > 3 timepoints")
 selected_subject = st.selectbox("Select a subject:", longitudinal_subjects)
 
-# Filter and sort by DOL
-subject_df = df[df["Subject ID"] == selected_subject].copy()
+# Subject slice, already sorted by DOL so line plots follow the right order
+subject_df = subject_index.slice(selected_subject).copy()
 subject_df["DOL"] = pd.to_numeric(subject_df["DOL"], errors="coerce")  # ensure numeric
-subject_df = subject_df.sort_values("DOL")  # 👈 ensures line plots follow correct order
 
 
 # Show number of subjects with >3 timepoints
@@ -233,38 +238,8 @@ st.markdown(f"""
     </div>
 """, unsafe_allow_html=True)
 
-# Define columns for layout
-col1, col2, col3 = st.columns(3)
-
-# Standard figure style function
-def make_growth_plot(x, y, title):
-    fig, ax = plt.subplots(figsize=(4, 3))
-    fig.patch.set_facecolor('#ffffff')
-    ax.set_facecolor('#ffffff')
-    ax.plot(subject_df[x], subject_df[y], marker="o", color="#1B4A81")
-    ax.set_xlabel(x, color='black')
-    ax.set_ylabel(y, color='black')
-    ax.set_title(title, color='black')
-    ax.tick_params(colors='black')
-
-    # Add tick marks every 2 DOL units
-    x_vals = subject_df[x].dropna().sort_values()
-    if not x_vals.empty:
-        tick_range = np.arange(x_vals.min(), x_vals.max() + 2, 3)
-        ax.set_xticks(tick_range)
-    return fig
-
-# Weight
-with col1:
-    st.pyplot(make_growth_plot("DOL", "Current Weight", "Weight (g)"))
-
-# Height
-with col2:
-    st.pyplot(make_growth_plot("DOL", "Current Height", "Height (cm)"))
-
-# Head Circumference
-with col3:
-    st.pyplot(make_growth_plot("DOL", "Current HC", "Head Circumference (cm)"))
+# Weight, height and head circumference as one interactive figure
+st.plotly_chart(growth.growth_figure(subject_df), use_container_width=True)
 
 
 
@@ -323,7 +298,7 @@ secretor_colors = {
 st.subheader("MOM Secretor Status by Sample Source")
 
 
-status_check = pd.read_excel("Secretor_status_check.xlsx")
+status_check = secretor.load_check()
 
 # Box showing number of unique subject IDs that received MBM
 num_mbm_subjects = status_check.shape[0]
@@ -449,8 +424,8 @@ st.markdown("""
 st.subheader("Number of Samples by Group")
 
 sample_counts = (
-    df.groupby(["Secretor Status", "Sample Source", "Type of Milk"])
-      .size()
+    counts.counts(["Secretor Status", "Sample Source", "Type of Milk"])
+      .sort_index()
       .reset_index(name="Count")
 )
 
@@ -542,32 +517,20 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
 # --- Identify longitudinal subjects ---
-subject_counts = df["Subject ID"].value_counts()
-longitudinal_subjects = subject_counts[subject_counts >= 3].index.tolist()
+longitudinal_subjects = subject_index.longitudinal(3)
 
 # Dropdown only shows longitudinal subjects
-subject_id = st.selectbox("Select a Subject ID", sorted(longitudinal_subjects))
+subject_id = st.selectbox("Select a Subject ID", longitudinal_subjects)
 
 
 growth_metric = st.selectbox("Select Growth Metric", ["Current Weight", "Current Height", "Current HC"])
 
-# Filter and sort
-subject_df = df[df["Subject ID"] == subject_id].copy()
-subject_df = subject_df.sort_values("DOL")
+# Subject slice, sorted by DOL
+subject_df = subject_index.slice(subject_id).copy()
 
-# --- Normalize HMO values ---
-hmo_values = subject_df[hmo_columns]
+# --- Normalize HMO values (same samples, same order, from the HMO store) ---
+hmo_values = hmo_store.subject_wide(subject_id, hmo_columns)
 hmo_norm = (hmo_values - hmo_values.min()) / (hmo_values.max() - hmo_values.min())
-hmo_norm["Sample #"] = range(1, len(hmo_norm) + 1)
-hmo_norm["DOL"] = subject_df["DOL"].values
-
-# Melt only HMO columns
-hmo_long = hmo_norm.melt(
-    id_vars=["Sample #","DOL"], 
-    value_vars=hmo_columns, 
-    var_name="HMO", 
-    value_name="Relative Abundance"
-)
 
 # --- Build figure ---
 fig = make_subplots(
@@ -581,9 +544,9 @@ fig = make_subplots(
 # Heatmap with evenly spaced columns
 fig.add_trace(
     go.Heatmap(
-        x=hmo_long["Sample #"],   # evenly spaced sample index
-        y=hmo_long["HMO"],
-        z=hmo_long["Relative Abundance"],
+        x=list(range(1, len(hmo_norm) + 1)),   # evenly spaced sample index
+        y=hmo_columns,
+        z=hmo_norm.to_numpy().T,
         colorscale="Blues",
         colorbar=dict(title="Relative Abundance")
     ),
@@ -668,20 +631,18 @@ growth_metric_options = {
     "Head Circumference": "Current HC"
 }
 
-# Filter subjects with >3 timepoints
-subject_counts = df["Subject ID"].value_counts()
-longitudinal_subjects = subject_counts[subject_counts > 3].index.tolist()
+# Subjects with >3 timepoints
+longitudinal_subjects = subject_index.longitudinal(4)
 
 # Dropdowns
-selected_subject = st.selectbox("Select a Subject ID", sorted(longitudinal_subjects))
+selected_subject = st.selectbox("Select a Subject ID", longitudinal_subjects)
 selected_hmo = st.selectbox("Select an HMO to plot", hmo_columns)
 selected_growth_label = st.selectbox("Select Growth Metric", list(growth_metric_options.keys()))
 selected_growth_column = growth_metric_options[selected_growth_label]
 
 # Prepare subject data
-subject_df = df[df["Subject ID"] == selected_subject].copy()
+subject_df = subject_index.slice(selected_subject).copy()
 subject_df["DOL"] = pd.to_numeric(subject_df["DOL"], errors="coerce")
-subject_df = subject_df.sort_values("DOL")
 
 # CGA Binning
 subject_df["CGA_cat"] = pd.cut(
@@ -0,0 +1 @@
+"""Shared helpers for the NeoBANK dashboard and cleaning code."""
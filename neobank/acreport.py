@@ -0,0 +1,334 @@
+"""Ingest the lab's AC REPORT workbooks into a long HMO store.
+
+The report sheet has two header rows. The first labels each column block
+where it starts ("HMO", "HMO [nmol/mL]", "HMO [ug/mL]", "HMO [%]"); the
+second names the sample fields and the HMOs inside each block. Blocks are
+located from those labels instead of by position and checked against the
+known HMO list, so a report whose blocks change width fails loudly rather
+than shifting every later column onto the wrong name.
+
+Rows are streamed from the sheet in chunks into two tables:
+
+* ``ac_long.parquet`` - one row per (sample, HMO, unit) value, with the HMO
+  and unit dictionary-encoded as categoricals
+* ``ac_samples.parquet`` - one row per report row: sample ID, secretor call,
+  diversity and evenness
+
+Each report is one batch. ``append_report`` adds or replaces a single batch:
+the report is streamed into Parquet chunk by chunk, then the store is
+rewritten one row group at a time with the new batch appended, so peak
+memory stays at one chunk or row group however many batches the store
+holds. ``to_wide`` gives back the wide ``<HMO> [<unit>]`` frame the
+combined table is built from.
+"""
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from neobank import store, xlsx
+from neobank.data import CLEANED_DIR, RAW_DIR
+
+AC_REPORTS = sorted(p for p in RAW_DIR.glob("*AC REPORT*.xlsx") if not p.name.startswith("~$"))
+AC_LONG = CLEANED_DIR / "ac_long.parquet"
+AC_SAMPLES = CLEANED_DIR / "ac_samples.parquet"
+
+HMOS = [
+    "2FL", "3FL", "DFLac", "3SL", "6SL", "LNT", "LNnT", "LNFP I", "LNFP II", "LNFP III",
+    "LSTb", "LSTc", "DFLNT", "LNH", "DSLNT", "FLNH", "DFLNH", "FDSLNH", "DSLNH", "SUM", "Sia", "Fuc",
+]
+# every unit block has to report these; Sia and Fuc only appear as nmol/mL
+REQUIRED_HMOS = HMOS[:HMOS.index("SUM") + 1]
+UNITS = ["nmol/mL", "µg/mL", "%"]
+
+# first header row label -> unit of the block it starts
+BLOCK_UNITS = {
+    "HMO [nmol/mL]": "nmol/mL",
+    "HMO [ug/mL]": "µg/mL",
+    "HMO [µg/mL]": "µg/mL",
+    "HMO [%]": "%",
+}
+# per-sample fields (either header row) -> output column
+SAMPLE_FIELDS = {
+    "Name": "sample_unique_id",
+    "Secretor": "secretor_status",
+    "Diversity": "Diversity",
+    "Evenness": "Evenness",
+}
+
+CHUNK_ROWS = 256
+
+# on-disk layout of the two tables; every row group is written with it
+LONG_SCHEMA = pa.schema([
+    ("batch", pa.string()),
+    ("row", pa.int32()),
+    ("hmo", pa.dictionary(pa.int16(), pa.string())),
+    ("unit", pa.dictionary(pa.int8(), pa.string())),
+    ("value", pa.float64()),
+    ("sample_unique_id", pa.string()),
+])
+SAMPLES_SCHEMA = pa.schema([
+    ("batch", pa.string()),
+    ("row", pa.int32()),
+    ("sample_unique_id", pa.string()),
+    ("secretor_status", pa.float64()),
+    ("Diversity", pa.float64()),
+    ("Evenness", pa.float64()),
+    ("report_sha", pa.string()),
+])
+
+
+def _hmo_name(label):
+    # the report writes 2'FL, 3'SL, 6'SL; the cleaned tables drop the prime
+    return str(label).replace("'", "").strip()
+
+
+def detect_layout(top, names):
+    """Locate the sample fields and unit blocks from the two header rows.
+
+    Returns ``(fields, blocks)``: ``fields`` maps output column -> sheet
+    column index, ``blocks`` maps unit -> list of (sheet column, HMO).
+    Raises ValueError if a block is missing, repeated, or does not hold
+    the expected HMOs.
+    """
+    width = max(len(top), len(names))
+    top = list(top) + [None] * (width - len(top))
+    names = list(names) + [None] * (width - len(names))
+
+    starts = [i for i, v in enumerate(top) if xlsx.label(v)]
+    blocks = {}
+    in_block = set()
+    for k, start in enumerate(starts):
+        label = xlsx.label(top[start])
+        if label not in BLOCK_UNITS:
+            continue
+        unit = BLOCK_UNITS[label]
+        if unit in blocks:
+            raise ValueError(f"AC report has more than one {label!r} block")
+        stop = starts[k + 1] if k + 1 < len(starts) else width
+        blocks[unit] = [(i, _hmo_name(names[i])) for i in range(start, stop) if xlsx.label(names[i])]
+        in_block.update(range(start, stop))
+
+    missing = [u for u in UNITS if u not in blocks]
+    if missing:
+        raise ValueError(f"AC report is missing the {', '.join(missing)} block(s)")
+
+    for unit, cols in blocks.items():
+        hmos = [h for _, h in cols]
+        unknown = sorted(set(hmos) - set(HMOS))
+        absent = [h for h in REQUIRED_HMOS if h not in hmos]
+        dupes = sorted({h for h in hmos if hmos.count(h) > 1})
+        if unknown or absent or dupes:
+            raise ValueError(
+                f"AC report {unit} block has {len(cols)} columns "
+                f"(unknown: {unknown}, missing: {absent}, repeated: {dupes})"
+            )
+
+    fields = {}
+    for i in range(width):
+        if i in in_block:
+            continue
+        for label in (xlsx.label(names[i]), xlsx.label(top[i])):
+            if label in SAMPLE_FIELDS:
+                fields[SAMPLE_FIELDS[label]] = i
+                break
+    if "sample_unique_id" not in fields:
+        raise ValueError("AC report has no 'Name' (sample ID) column")
+    return fields, blocks
+
+
+def _numeric(values):
+    return pd.DataFrame(values).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+
+def file_sha(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def iter_report(path, batch=None, chunk_rows=CHUNK_ROWS):
+    """Parse one AC report chunk by chunk, yielding ``(long, samples)`` frames."""
+    path = Path(path)
+    batch = batch or path.name
+    sha = file_sha(path)
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        fields, blocks = detect_layout(next(rows), next(rows))
+
+        value_cols = np.array([i for u in UNITS for i, _ in blocks[u]])
+        hmo_codes = np.array([HMOS.index(h) for u in UNITS for _, h in blocks[u]], dtype=np.int16)
+        unit_codes = np.array([UNITS.index(u) for u in UNITS for _ in blocks[u]], dtype=np.int8)
+        name_col = fields["sample_unique_id"]
+
+        offset = 0
+        for chunk in xlsx.chunks(rows, chunk_rows):
+            # read-only sheets run on through formatted but empty rows
+            chunk = [r for r in chunk if len(r) > name_col and xlsx.label(r[name_col])]
+            if not chunk:
+                continue
+            grid = xlsx.grid(chunk, max(len(r) for r in chunk))
+            row_ids = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+
+            samples = pd.DataFrame({"batch": batch, "row": row_ids})
+            for col in SAMPLE_FIELDS.values():
+                samples[col] = grid[:, fields[col]] if col in fields else np.nan
+            samples["sample_unique_id"] = samples["sample_unique_id"].map(xlsx.label).astype("string")
+            for col in ("secretor_status", "Diversity", "Evenness"):
+                samples[col] = pd.to_numeric(samples[col], errors="coerce").astype(float)
+            samples["report_sha"] = sha
+
+            values = _numeric(grid[:, value_cols])
+            r, c = np.nonzero(~np.isnan(values))
+            long = pd.DataFrame({
+                "batch": batch,
+                "row": row_ids[r],
+                "hmo": hmo_codes[c],
+                "unit": unit_codes[c],
+                "value": values[r, c],
+                "sample_unique_id": samples["sample_unique_id"].to_numpy()[r],
+            })
+            yield _encode(long), _encode(samples)
+    finally:
+        wb.close()
+
+
+def read_report(path, batch=None, chunk_rows=CHUNK_ROWS):
+    """Parse one AC report into ``(long, samples)`` frames for ``batch``."""
+    parts = list(iter_report(path, batch, chunk_rows))
+    if not parts:
+        return _empty(LONG_SCHEMA), _empty(SAMPLES_SCHEMA)
+    return _decode(pd.concat([p[0] for p in parts], ignore_index=True)), _decode(
+        pd.concat([p[1] for p in parts], ignore_index=True)
+    )
+
+
+def _encode(df):
+    out = df.copy()
+    if "hmo" in out and not isinstance(out["hmo"].dtype, pd.CategoricalDtype):
+        out["hmo"] = pd.Categorical.from_codes(out["hmo"].astype(np.int16), categories=HMOS)
+        out["unit"] = pd.Categorical.from_codes(out["unit"].astype(np.int8), categories=UNITS)
+    out["batch"] = out["batch"].astype(str)
+    out["row"] = out["row"].astype(np.int32)
+    return out
+
+
+def _decode(df):
+    # row groups written by different batches carry their own dictionaries
+    out = df.copy()
+    for col, categories in (("hmo", HMOS), ("unit", UNITS)):
+        if col in out:
+            out[col] = pd.Categorical(out[col].astype(object), categories=categories)
+    out["batch"] = out["batch"].astype(str).astype("category")
+    return out
+
+
+def _empty(schema):
+    return _decode(schema.empty_table().to_pandas())
+
+
+def _rewrite(path, schema, drop=(), new=()):
+    """Stream ``path`` back without the ``drop`` batches, followed by ``new`` frames.
+
+    Only one row group is held in memory at a time, however many batches
+    the store holds.
+    """
+    def frames():
+        if Path(path).exists():
+            for frame in store.iter_parquet(path):
+                frame = frame[~frame["batch"].astype(str).isin(drop)]
+                yield frame.astype({"batch": str})
+        yield from new
+
+    return store.write_batches(frames(), path, schema)
+
+
+def append_report(path, batch=None, long_path=AC_LONG, samples_path=AC_SAMPLES):
+    """Add one report to the store as ``batch``, replacing an earlier copy.
+
+    The report is streamed into temporary Parquet files, which are then
+    appended to the store behind the old batches, so peak memory is one
+    chunk of the report or one row group of the store.
+    """
+    batch = batch or Path(path).name
+    long_tmp, samples_tmp = Path(long_path).with_suffix(".new"), Path(samples_path).with_suffix(".new")
+
+    # both tables come out of one pass over the sheet
+    with pq.ParquetWriter(long_tmp, LONG_SCHEMA) as long_out, pq.ParquetWriter(samples_tmp, SAMPLES_SCHEMA) as samples_out:
+        for long, samples in iter_report(path, batch):
+            if len(long):
+                long_out.write_table(pa.Table.from_pandas(long, schema=LONG_SCHEMA, preserve_index=False))
+            samples_out.write_table(pa.Table.from_pandas(samples, schema=SAMPLES_SCHEMA, preserve_index=False))
+    try:
+        _rewrite(long_path, LONG_SCHEMA, [batch], store.iter_parquet(long_tmp))
+        _rewrite(samples_path, SAMPLES_SCHEMA, [batch], store.iter_parquet(samples_tmp))
+    finally:
+        long_tmp.unlink(missing_ok=True)
+        samples_tmp.unlink(missing_ok=True)
+
+
+def build(reports=None, long_path=AC_LONG, samples_path=AC_SAMPLES):
+    """Bring the store in line with ``reports``, parsing only new or changed ones."""
+    reports = AC_REPORTS if reports is None else [Path(p) for p in reports]
+    ingested = {}
+    if Path(samples_path).exists():
+        samples = pd.read_parquet(samples_path, columns=["batch", "report_sha"])
+        ingested = samples.drop_duplicates("batch").set_index("batch")["report_sha"].astype(str).to_dict()
+
+    wanted = {p.name for p in reports}
+    stale = [b for b in ingested if b not in wanted]
+    if stale:
+        _rewrite(long_path, LONG_SCHEMA, stale)
+        _rewrite(samples_path, SAMPLES_SCHEMA, stale)
+
+    for path in reports:
+        if ingested.get(path.name) != file_sha(path):
+            append_report(path, long_path=long_path, samples_path=samples_path)
+
+
+def load(long_path=AC_LONG, samples_path=AC_SAMPLES):
+    return _decode(pd.read_parquet(long_path)), _decode(pd.read_parquet(samples_path))
+
+
+def _row_keys(df):
+    return pd.MultiIndex.from_frame(df[["batch", "row"]].astype({"batch": str}))
+
+
+def first_reported(long, samples):
+    """Rows of ``samples`` holding the first results reported for each sample.
+
+    Later batches only add samples that have no results yet; values they
+    repeat for known samples are what ``batches.upsert_batch`` reports as
+    conflicts. A sample listed twice in one batch keeps its first row the
+    same way. A blank report row does not count as results.
+    """
+    sid = samples["sample_unique_id"]
+    reported = _row_keys(samples).isin(_row_keys(long))
+    # rows with results first, otherwise in batch and report order
+    ranked = sid.iloc[np.argsort(~reported, kind="stable")]
+    first = ranked.index[~ranked.duplicated()]
+    return samples[samples.index.isin(first) | sid.isna()]
+
+
+def to_wide(long, samples):
+    """One row per row of ``samples`` with ``<HMO> [<unit>]`` columns."""
+    pos = _row_keys(samples).get_indexer(_row_keys(long))
+    keep = pos >= 0
+    long, pos = long[keep], pos[keep]
+
+    col = long["unit"].cat.codes.to_numpy(dtype=np.int64) * len(HMOS) + long["hmo"].cat.codes.to_numpy()
+    grid = np.full((len(samples), len(UNITS) * len(HMOS)), np.nan)
+    grid[pos, col] = long["value"].to_numpy(dtype=float)
+
+    present = np.zeros(grid.shape[1], dtype=bool)
+    present[np.unique(col)] = True
+    names = [f"{hmo} [{unit}]" for unit in UNITS for hmo in HMOS]
+    values = pd.DataFrame(
+        grid[:, present], columns=[n for n, keep in zip(names, present) if keep], index=samples.index
+    )
+    fields = [c for c in SAMPLE_FIELDS.values() if c in samples]
+    return pd.concat([samples[fields], values], axis=1).reset_index(drop=True)
@@ -0,0 +1,189 @@
+"""Upsert a new lab batch into the combined cohort table.
+
+A full rebuild re-reads every raw workbook to add one batch of HPLC
+results. ``upsert_batch`` instead parses just the new AC report, matches it
+to ``merged_ALL`` on ``sample_unique_id`` and
+
+* fills the HMO columns of samples that have no results yet (a blank
+  report row is not results)
+* leaves samples that already have results alone, reporting every value
+  the batch disagrees with as a conflict
+* keeps the first row of a sample listed twice in the batch, reporting
+  where the repeat differs as a duplicate
+* recomputes the derived columns - the MOM secretor status, z-scores and
+  centiles - for the affected subjects' rows only
+
+The batch is also added to the AC long store, and a full pipeline run
+resolves repeated samples the same way (first batch wins, see
+``acreport.first_reported``), so both paths give the same table and
+upserting a batch that is already in the cohort changes nothing.
+
+    python -m neobank.batches "Raw Data/NeoBANK AC REPORT 2.xlsx"
+"""
+import argparse
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from neobank import acreport, centiles, reference, secretor, store, zscore
+from neobank.data import MERGED_ALL
+
+KEY = "sample_unique_id"
+SUBJECT_COL = "Subject ID"
+
+# relative tolerance below which a re-measured value is the same value
+CONFLICT_RTOL = 1e-9
+
+
+@dataclass
+class UpsertResult:
+    batch: str
+    inserted: list = field(default_factory=list)     # samples that got results
+    unchanged: list = field(default_factory=list)    # already held the same values
+    unmatched: list = field(default_factory=list)    # no cohort metadata yet
+    subjects: list = field(default_factory=list)     # subjects whose rows changed
+    conflicts: pd.DataFrame = None                   # sample, column, existing, incoming
+    duplicates: pd.DataFrame = None                  # same, for a sample repeated in the batch
+
+    def summary(self):
+        n_conflicts = 0 if self.conflicts is None else self.conflicts[KEY].nunique()
+        n_duplicates = 0 if self.duplicates is None else self.duplicates[KEY].nunique()
+        return (
+            f"[{self.batch}] {len(self.inserted)} inserted, {len(self.unchanged)} unchanged, "
+            f"{n_conflicts} with conflicts, {len(self.unmatched)} without metadata, "
+            f"{n_duplicates} repeated in the batch; {len(self.subjects)} subjects updated"
+        )
+
+
+def _conflict_frame(rows):
+    return pd.DataFrame(rows, columns=[KEY, "column", "existing", "incoming"])
+
+
+def _same(a, b):
+    return np.isclose(a, b, rtol=CONFLICT_RTOL, atol=0.0) | (np.isnan(a) & np.isnan(b))
+
+
+def diff_batch(cohort, incoming, value_cols):
+    """Compare ``incoming`` (one row per sample) with the cohort's values.
+
+    Returns per-sample masks (new, same, conflicting) aligned to
+    ``incoming`` and the conflicting cells as a long frame. A sample is new
+    when the cohort has no values for it and the batch has some.
+    """
+    existing = (cohort.drop_duplicates(KEY).set_index(KEY)[value_cols]
+                .reindex(incoming[KEY]).to_numpy(dtype=float))
+    new = incoming[value_cols].to_numpy(dtype=float)
+
+    has_existing = ~np.isnan(existing).all(axis=1)
+    # a blank incoming cell carries no information, it is never a conflict
+    differs = ~_same(existing, new) & ~np.isnan(new) & has_existing[:, None]
+    conflicting = differs.any(axis=1)
+    new_rows = ~has_existing & ~np.isnan(new).all(axis=1)
+
+    r, c = np.nonzero(differs)
+    conflicts = _conflict_frame({
+        KEY: incoming[KEY].to_numpy()[r],
+        "column": np.asarray(value_cols, dtype=object)[c],
+        "existing": existing[r, c],
+        "incoming": new[r, c],
+    })
+    return new_rows, ~new_rows & ~conflicting, conflicting, conflicts
+
+
+def _dedupe_batch(wide, value_cols):
+    # a sample reported twice in one batch: keep the first row with results
+    # (as acreport.first_reported does), report where the others differ
+    blank = wide[value_cols].isna().all(axis=1).to_numpy()
+    ranked = wide.iloc[np.argsort(blank, kind="stable")]
+    dup = ranked[KEY].duplicated(keep="first")
+    if not dup.any():
+        return wide, _conflict_frame([])
+    first = wide[wide.index.isin(ranked.index[~dup])]
+    _, _, _, duplicates = diff_batch(first, ranked[dup], value_cols)
+    return first, duplicates
+
+
+def refresh_derived(cohort, subjects):
+    """Recompute secretor status, z-scores and centiles for ``subjects``' rows."""
+    rows = cohort[SUBJECT_COL].isin(subjects)
+    if not rows.any():
+        return cohort
+    part = cohort.loc[rows]
+
+    if "2FL [nmol/mL]" in part:
+        status = secretor.classify(part["2FL [nmol/mL]"], secretor.THRESHOLDS["nmol/mL"])
+        part = part.assign(moms_secretor_status=secretor.mom_status(part, status))
+
+    z_cols = [z for _, _, z in zscore.MEASURE_COLUMNS.values()]
+    if any(z in cohort for z in z_cols):
+        if zscore.AGE_COL not in part or zscore.GA_BIRTH_COL not in part:
+            part = zscore.add_gestational_ages(part)
+        part = centiles.add_centiles(zscore.add_routed_zscores(part, reference.load()))
+
+    out = cohort.copy()
+    for col in part.columns:
+        if col not in out:
+            out[col] = pd.Series(pd.NA, index=out.index, dtype=part[col].dtype)
+        out.loc[rows, col] = part[col]
+    return out
+
+
+def upsert_batch(report_path, batch=None, cohort_path=MERGED_ALL, write=True):
+    """Merge one AC report into the cohort table; see the module docstring."""
+    long, samples = acreport.read_report(report_path, batch)
+    batch = str(samples["batch"].iloc[0]) if len(samples) else str(batch)
+    incoming = acreport.to_wide(long, samples)
+    incoming = incoming[incoming[KEY].notna()]
+
+    cohort = store.read_parquet(cohort_path)
+    value_cols = [c for c in incoming.columns if c != KEY and c in cohort]
+    incoming, duplicates = _dedupe_batch(incoming, value_cols)
+
+    known = incoming[KEY].isin(cohort[KEY])
+    unmatched = incoming.loc[~known, KEY].tolist()
+    incoming = incoming[known].reset_index(drop=True)
+
+    is_new, is_same, is_conflict, conflicts = diff_batch(cohort, incoming, value_cols)
+
+    updates = incoming.loc[is_new].set_index(KEY)[value_cols]
+    target = cohort[KEY].isin(updates.index)
+    cohort = cohort.copy()
+    if target.any():
+        cohort.loc[target, value_cols] = updates.reindex(cohort.loc[target, KEY]).to_numpy(dtype=float)
+
+    subjects = sorted(cohort.loc[target, SUBJECT_COL].dropna().unique().tolist())
+    cohort = refresh_derived(cohort, subjects)
+
+    result = UpsertResult(
+        batch=batch,
+        inserted=incoming.loc[is_new, KEY].tolist(),
+        unchanged=incoming.loc[is_same, KEY].tolist(),
+        unmatched=unmatched,
+        subjects=subjects,
+        conflicts=conflicts,
+        duplicates=duplicates,
+    )
+    if write:
+        acreport.append_report(report_path, batch)
+        store.write_table(cohort, cohort_path)
+    return result, cohort
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upsert an AC report batch into merged_ALL.")
+    parser.add_argument("report", help="AC REPORT workbook")
+    parser.add_argument("--batch", help="batch name (default: file name)")
+    parser.add_argument("--dry-run", action="store_true", help="report only, write nothing")
+    args = parser.parse_args(argv)
+
+    result, _ = upsert_batch(args.report, args.batch, write=not args.dry_run)
+    print(result.summary())
+    if len(result.conflicts):
+        print(result.conflicts.to_string(index=False))
+    if len(result.duplicates):
+        print(result.duplicates.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""INTERGROWTH centiles: bulk conversion and cached reference bands.
+
+Measurements become centiles through their LMS z-score (``100 * Phi(z)``),
+so any row ``zscore.add_routed_zscores`` has scored gets a centile for free.
+
+Reference bands for plot overlays come from two places, both computed once
+per (sex, measure) and cached until their source changes:
+
+* ``published_bands`` - the 3rd-97th centile curves in
+  ``INTERGROWTH/Centiles/VERY PRETERM Centiles`` (size at birth, 24-33 weeks),
+  shown at birth on the growth panels
+* ``lms_bands`` - any centiles rebuilt from the compiled LMS reference, e.g.
+  the postnatal preterm standard the cohort is actually scored against
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+
+from neobank import reference
+from neobank.data import ROOT
+from neobank.zscore import MEASURE_COLUMNS, MEASURES, POSTNATAL_PRETERM, SEX_MAP, SEXES, group_codes
+
+CENTILE_DIR = ROOT / "INTERGROWTH" / "Centiles" / "VERY PRETERM Centiles"
+CENTILE_FILES = sorted(CENTILE_DIR.glob("IG21_*_centiles_*_long*.csv"))
+CENTILES = [3, 5, 10, 50, 90, 95, 97]
+
+# z-score column -> centile column
+CENTILE_COLUMNS = {
+    z_col: z_col.replace("z_", "centile_", 1) for _, _, z_col in MEASURE_COLUMNS.values()
+}
+
+
+def z_to_centile(z):
+    return 100.0 * ndtr(np.asarray(z, dtype=float))
+
+
+def add_centiles(df):
+    """Add a centile column for every z-score column present in ``df``."""
+    out = df.copy()
+    for z_col, c_col in CENTILE_COLUMNS.items():
+        if z_col in out:
+            out[c_col] = z_to_centile(out[z_col].to_numpy(dtype=float))
+    return out
+
+
+def _to_cohort_units(bands, measure):
+    # reference weight is kg, the cohort records grams
+    _, factor, _ = MEASURE_COLUMNS[measure]
+    return bands / factor
+
+
+def _stamp(paths):
+    return tuple((p.stat().st_mtime_ns, p.stat().st_size) for p in paths)
+
+
+@lru_cache(maxsize=None)
+def _published(stamp):
+    long = pd.concat(
+        [reference.normalize_ga(pd.read_csv(p)) for p in CENTILE_FILES], ignore_index=True
+    )
+    bands = {}
+    for (sex, measure), rows in long.groupby(["sex", "measure"]):
+        wide = rows.pivot_table(index="ga_weeks", columns="centile", values="value")
+        wide.columns = [int(c) for c in wide.columns]
+        bands[(sex, measure)] = wide.sort_index()
+    return bands
+
+
+def published_bands(sex, measure, cohort_units=True):
+    """Published centile curves as a ``ga_weeks`` x centile frame (shared, read-only)."""
+    bands = _published(_stamp(CENTILE_FILES))[(SEX_MAP[sex], measure)]
+    return _to_cohort_units(bands, measure) if cohort_units else bands
+
+
+@lru_cache(maxsize=None)
+def _lms_bands(stamp, standard, sex, measure, centiles, step_days):
+    index = reference.load_index(standard, step_days)
+    ref = index.ref
+    g = int(group_codes(SEXES.index(sex), MEASURES.index(measure), ref.standard_code(standard)))
+    L, M, S = index.table[g].T
+    keep = ~np.isnan(M)
+    L, M, S = L[keep], M[keep], S[keep]
+    ages = (np.arange(index.table.shape[1])[keep] + index.first) * step_days / 7.0
+
+    z = ndtri(np.asarray(centiles, dtype=float) / 100.0)[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        box_cox = M[:, None] * (1 + L[:, None] * S[:, None] * z) ** (1 / L[:, None])
+        log = M[:, None] * np.exp(S[:, None] * z)
+    values = np.where(np.isclose(L, 0.0)[:, None], log, box_cox)
+    return pd.DataFrame(values, index=pd.Index(ages, name="ga_weeks"), columns=list(centiles))
+
+
+def lms_bands(sex, measure, standard=POSTNATAL_PRETERM, centiles=tuple(CENTILES),
+              step_days=1, cohort_units=True):
+    """Centile curves rebuilt from the LMS reference (shared, read-only)."""
+    stat = reference.LMS_ARTIFACT.stat()
+    bands = _lms_bands(
+        (stat.st_mtime_ns, stat.st_size), standard, SEX_MAP[sex], measure,
+        tuple(centiles), step_days,
+    )
+    return _to_cohort_units(bands, measure) if cohort_units else bands
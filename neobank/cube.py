@@ -0,0 +1,98 @@
+"""Pre-aggregated count cube over the categorical dimensions.
+
+The pipeline groups each cohort table once by all of its ``DIMENSIONS``
+together (Subject ID included, missing values kept as their own key) and
+stores the group sizes (``rows``) and aliquot totals (``aliquots``). This
+base table is bounded by the number of distinct combinations, not the
+number of samples, so the bar and pie charts roll up a few hundred rows
+however large the cohort gets:
+
+* ``Cube.counts(dims, measure)`` - a measure summed over any subset of
+  dimensions, optionally restricted with ``where``
+* ``Cube.subjects(dims)`` - distinct subjects, which is exact because
+  Subject ID is one of the dimensions
+
+As in SQL, groups whose key is missing are left out of the roll-ups.
+Each cube file records the digest of the table it aggregates, and ``load``
+refuses a cube built from another version of it.
+"""
+from functools import lru_cache
+
+import pandas as pd
+
+from neobank import data, store
+from neobank.data import CLEANED_DIR, MERGED_ALL, UNLINKED_MERGED
+
+SUBJECT_COL = "Subject ID"
+MILK_VARS = ["Type of Milk", "HMF", "TPN", "Iron"]
+
+DIMENSIONS = {
+    "combined": [SUBJECT_COL, "Linked", "Sample Source", "Infant Sex"] + MILK_VARS,
+    "unlinked": [SUBJECT_COL, "Secretor Status", "Sample Source"] + MILK_VARS,
+}
+SOURCES = {"combined": MERGED_ALL, "unlinked": UNLINKED_MERGED}
+PATHS = {name: CLEANED_DIR / f"cube_{name}.parquet" for name in SOURCES}
+
+# measure -> column summed (None = row count)
+MEASURES = {"rows": None, "aliquots": "Aliquots_num"}
+
+
+def aggregate(df, dimensions):
+    """The base cuboid of ``df``: every measure per combination of ``dimensions``."""
+    dims = [d for d in dimensions if d in df]
+    measures = pd.DataFrame({
+        name: 1 if col is None else pd.to_numeric(df[col], errors="coerce").fillna(0)
+        for name, col in MEASURES.items() if col is None or col in df
+    }, index=df.index)
+    base = measures.groupby([df[d] for d in dims], dropna=False, observed=True).sum()
+    return base.reset_index()
+
+
+def build(names=None):
+    for name in names or SOURCES:
+        base = aggregate(store.read_parquet(SOURCES[name]), DIMENSIONS[name])
+        store.write_derived(base, PATHS[name], data.digest(SOURCES[name]))
+
+
+class Cube:
+    def __init__(self, base):
+        self.base = base
+
+    def _rows(self, where):
+        if not where:
+            return self.base
+        mask = pd.Series(True, index=self.base.index)
+        for dim, value in where.items():
+            mask &= self.base[dim] == value
+        return self.base[mask]
+
+    def counts(self, dims, measure="rows", where=None):
+        """``measure`` per value of ``dims``, largest first."""
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        out = self._rows(where).groupby(dims, observed=True)[measure].sum()
+        return out.sort_values(ascending=False, kind="stable")
+
+    def subjects(self, dims=None, where=None):
+        """Distinct subjects, overall or per value of ``dims``."""
+        rows = self._rows(where)
+        if not dims:
+            return int(rows[SUBJECT_COL].nunique())
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        return rows.groupby(dims, observed=True)[SUBJECT_COL].nunique()
+
+    def total(self, measure="rows"):
+        return self.base[measure].sum()
+
+
+@lru_cache(maxsize=4)
+def _cube(name, source_digest):
+    return Cube(store.read_derived(PATHS[name], SOURCES[name], source_digest))
+
+
+def load(name):
+    """Cached ``Cube`` of ``SOURCES[name]`` (shared, treat as read-only).
+
+    Cached per version of the source table; raises ``store.OutOfDateError``
+    until the pipeline has rebuilt the cube for it.
+    """
+    return _cube(name, data.digest(SOURCES[name]))
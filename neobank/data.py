@@ -0,0 +1,154 @@
+"""Cached access to the cleaned NeoBANK tables.
+
+Every page imports its data from here instead of calling ``pd.read_excel``
+at the top of the script. Parsed frames live in a process-wide cache keyed
+on the file path and its mtime, so a Streamlit rerun reuses the frame that
+is already in memory and only re-parses a workbook after it changes on disk.
+
+Where the cleaning notebooks have written a Parquet twin next to the
+workbook (see ``neobank.store``) it is read instead of the Excel file, and
+``columns=`` is pushed down as a column projection. Either way the frame
+comes back with the ``neobank.schema`` dtypes.
+
+Frames returned from the cache are shared between pages and sessions;
+treat them as read-only and ``.copy()`` before modifying.
+"""
+import hashlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from neobank import schema, store
+
+ROOT = Path(__file__).resolve().parents[1]
+CLEANED_DIR = ROOT / "Cleaned Data"
+RAW_DIR = ROOT / "Raw Data"
+
+UNLINKED_META = CLEANED_DIR / "cleaned_unlinked_updated.xlsx"
+UNLINKED_MERGED = CLEANED_DIR / "Unlinked_Merged.xlsx"
+LINKED_MERGED = CLEANED_DIR / "Linked_Merged.xlsx"
+LINKED_META = CLEANED_DIR / "cleaned_linkedmeta_updated.xlsx"
+MERGED_DF = CLEANED_DIR / "merged_df.xlsx"
+MERGED_ALL = CLEANED_DIR / "merged_ALL.xlsx"
+SECRETOR_CHECK = CLEANED_DIR / "Secretor_status_check.xlsx"
+
+# nmol/mL HMO block plotted on the cohort page, 2'FL through DSLNH
+HMO_NMOL_COLUMNS = [
+    "2FL [nmol/mL]",
+    "DFLac [nmol/mL]",
+    "3SL [nmol/mL]",
+    "6SL [nmol/mL]",
+    "LNT [nmol/mL]",
+    "LNnT [nmol/mL]",
+    "LNFP I [nmol/mL]",
+    "LNFP II [nmol/mL]",
+    "LNFP III [nmol/mL]",
+    "LSTc [nmol/mL]",
+    "DFLNT [nmol/mL]",
+    "DSLNT [nmol/mL]",
+    "DFLNH [nmol/mL]",
+    "FDSLNH [nmol/mL]",
+    "DSLNH [nmol/mL]",
+]
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _resolve(path):
+    path = Path(path)
+    return path if path.is_absolute() else ROOT / path
+
+
+def _stamp(path):
+    # mtime alone can miss a rewrite within the filesystem's timestamp
+    # resolution, so pair it with the size
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def version(path):
+    """Stamp of the file ``read_table(path)`` would read; changes when it does."""
+    path = _resolve(path)
+    parquet = store.parquet_path(path)
+    return _stamp(parquet if parquet.exists() else path)
+
+
+@lru_cache(maxsize=32)
+def _digest(path, stamp):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def digest(path):
+    """Content hash of the file ``read_table(path)`` would read.
+
+    Hashed once per ``version``. Unlike the version it survives a rewrite
+    with the same bytes (a pipeline rerun, a fresh checkout), so files
+    derived from a table record it as their source.
+    """
+    path = _resolve(path)
+    parquet = store.parquet_path(path)
+    source = parquet if parquet.exists() else path
+    return _digest(source, _stamp(source))
+
+
+def read_table(path, columns=None, **kwargs):
+    """Read a cleaned table through the cache.
+
+    Uses the Parquet twin when one exists, otherwise falls back to
+    ``pd.read_excel`` (extra kwargs are passed to it).
+    """
+    path = _resolve(path)
+    columns = list(columns) if columns is not None else None
+    parquet = store.parquet_path(path)
+    use_parquet = parquet.exists() and not kwargs
+    source = parquet if use_parquet else path
+
+    key = (str(source), repr(columns), repr(sorted(kwargs.items())))
+    stamp = _stamp(source)
+
+    with _lock:
+        hit = _cache.get(key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+
+    if use_parquet:
+        df = store.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_excel(path, usecols=columns, **kwargs)
+    df = schema.apply(df)
+    with _lock:
+        _cache[key] = (stamp, df)
+    return df
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+# ---- Named tables used by the pages ----
+def load_unlinked(columns=None):
+    return read_table(UNLINKED_MERGED, columns)
+
+
+def load_linked(columns=None):
+    return read_table(LINKED_MERGED, columns)
+
+
+def load_linked_meta(columns=None):
+    return read_table(LINKED_META, columns)
+
+
+def load_merged_df(columns=None):
+    return read_table(MERGED_DF, columns)
+
+
+def load_combined(columns=None):
+    return read_table(MERGED_ALL, columns)
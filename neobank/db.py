@@ -0,0 +1,368 @@
+"""SQLite query backend for the dashboard.
+
+``build`` writes ``NeoBANK SQL/nicu_hmo.db`` from the combined cohort
+table: the ``Subjects`` / ``Samples`` / ``Milk`` / ``HMO_Wide`` /
+``HMO_Long`` split of ``sqldata.ipynb``, one row per row of
+``merged_ALL`` (inserted in the same order, so ``rowid`` breaks ties the
+way a stable sort would), with indexes on the keys the pages filter and
+group by, the per-subject ``growth_features`` of ``neobank.trajectory``,
+plus the summary tables of ``neobank.reports``. Of those,
+``subject_summary`` is copied from ``neobank.summary``, which only
+recomputes subjects whose rows changed. ``HMO_Long`` holds the non-missing
+facts of ``neobank.hmo`` (the same facts the pages read) and ``HMO_Wide``
+is a view pivoting it, so the two cannot drift.
+
+Only the pipeline's ``sqlite`` stage builds the database; pages open it
+read-only. It records the digest of the table it was built from, and
+``stale`` tells a page the database is behind that table so it can ask for
+a pipeline run.
+
+The page aggregations that need distinct counts or row order (totals,
+first-MOM secretor status, z-scores, one subject's samples) are plain SQL
+with bound parameters; only their small results come back as DataFrames,
+cached per database version. Plain category counts come from
+``neobank.cube``.
+"""
+import math
+import os
+import sqlite3
+from functools import lru_cache
+
+import pandas as pd
+
+from neobank import data, hmo, reference, reports, store, summary, trajectory, zscore
+
+DB_PATH = data.ROOT / "NeoBANK SQL" / "nicu_hmo.db"
+SOURCE = data.MERGED_ALL
+STALE_WARNING = f"The query database is out of date with the cohort table; {store.RUN_PIPELINE}."
+
+SUBJECT_COL = "Subject ID"
+SAMPLE_COL = "sample_unique_id"
+KEYS = [SUBJECT_COL, SAMPLE_COL]
+
+TABLES = {
+    "Subjects": KEYS + [
+        "DOL", "CGA", "Current Weight", "Current Height", "Current HC",
+        "Infant Sex", "GA_birth_weeks", "PMA_weeks",
+    ],
+    "Samples": KEYS + ["Sample Source", "Type of Milk", "Aliquots_num", "Linked"],
+    "Milk": KEYS + [
+        "CGA", "DOL", "Type of Milk", "HMF", "TPN", "Iron", "Sample Source",
+        "secretor_status", "moms_secretor_status",
+    ],
+}
+HMO_UNIT = "nmol/mL"
+
+INDEXES = {
+    "Subjects": [[SUBJECT_COL], [SAMPLE_COL]],
+    "Samples": [[SUBJECT_COL], [SAMPLE_COL]],
+    "Milk": [[SUBJECT_COL], [SAMPLE_COL]],
+    "HMO_Long": [["HMO", SUBJECT_COL], ["HMO", "Unit", "Value"], [SAMPLE_COL], ["row_id"]],
+    "growth_refs": [["standard", "sex", "measure", "ga_day"]],
+    "growth_features": [[SUBJECT_COL]],
+}
+
+
+def quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def lms_z(value, L, M, S):
+    """LMS z-score, registered as the SQL function ``lms_z``."""
+    if value is None or M is None or value <= 0:
+        return None
+    if abs(L) < 1e-8:
+        return math.log(value / M) / S
+    return ((value / M) ** L - 1) / (L * S)
+
+
+def register_functions(con):
+    con.create_function("lms_z", 4, lms_z, deterministic=True)
+    return con
+
+
+def column_tables(df, names=tuple(TABLES)):
+    """The ``TABLES`` column splits of ``df`` named in ``names``, as DataFrames."""
+    return {name: df[[c for c in TABLES[name] if c in df]] for name in names}
+
+
+def tables(df):
+    """The database tables for the combined frame ``df``, as DataFrames."""
+    out = column_tables(df)
+
+    # row_id is the rowid of the sample in Subjects (rows are inserted in order)
+    columns = hmo.unit_columns(df)
+    facts = hmo.facts(df, list(columns))
+    facts = facts[facts["value"].notna()]
+    labels = pd.DataFrame(list(columns.values()), columns=["HMO", "Unit"]).iloc[facts["HMO"].cat.codes]
+    out["HMO_Long"] = pd.DataFrame({
+        "row_id": facts["row"].to_numpy() + 1,
+        SUBJECT_COL: facts[SUBJECT_COL].to_numpy(),
+        SAMPLE_COL: facts[SAMPLE_COL].to_numpy(),
+        "HMO": labels["HMO"].to_numpy(),
+        "Unit": labels["Unit"].to_numpy(),
+        "Value": facts["value"].to_numpy(),
+    })
+    out["growth_refs"] = reference.growth_refs()
+    out["growth_features"] = trajectory.subject_features(trajectory.prepare(df)).reset_index()
+    return out
+
+
+def _hmo_wide_sql(columns):
+    # one row per Subjects row, the HMO_UNIT values pivoted back out of HMO_Long
+    pivots = ",\n".join(
+        f"MAX(CASE WHEN l.HMO = '{name}' AND l.Unit = '{unit}' THEN l.Value END) AS {quote(column)}"
+        for column, (name, unit) in columns.items() if unit == HMO_UNIT
+    )
+    return f"""
+    CREATE VIEW HMO_Wide AS
+    SELECT s.{quote(SUBJECT_COL)}, s.{quote(SAMPLE_COL)},
+           {pivots}
+    FROM Subjects s
+    LEFT JOIN HMO_Long l ON l.row_id = s.rowid
+    GROUP BY s.rowid
+    ORDER BY s.rowid
+    """
+
+
+def build(source=SOURCE, path=DB_PATH):
+    """Write the database for ``source`` next to it, then swap it in."""
+    df = store.read_parquet(source)
+    # per-process scratch file, so concurrent builds never share one
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp)
+    try:
+        for name, table in tables(df).items():
+            table.to_sql(name, con, index=False)
+            for k, cols in enumerate(INDEXES.get(name, [])):
+                con.execute(f"CREATE INDEX {quote(f'ix_{name}_{k}')} ON {quote(name)} ({', '.join(map(quote, cols))})")
+        con.execute(_hmo_wide_sql(hmo.unit_columns(df)))
+        # subject_summary is kept incrementally in the cohort store
+        summary.refresh(df).drop(columns=summary.DIGEST_COL).to_sql("subject_summary", con, index=False)
+        con.execute(f'CREATE INDEX ix_subject_summary_0 ON subject_summary ({quote(SUBJECT_COL)})')
+        reports.materialize(con, [name for name in reports.REPORTS if name != "subject_summary"])
+        con.execute("CREATE TABLE _build (source_digest TEXT)")
+        con.execute("INSERT INTO _build VALUES (?)", (data.digest(source),))
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, path)
+    return path
+
+
+def _built_from(path):
+    try:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return con.execute("SELECT source_digest FROM _build").fetchone()[0]
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return None
+
+
+def stale(path=DB_PATH, source=SOURCE):
+    """True when the database is missing or was not built from the current ``source``."""
+    return _built_from(path) != data.digest(source)
+
+
+def connect(path=DB_PATH):
+    """Read-only connection to the database the pipeline built."""
+    if not path.exists():
+        raise FileNotFoundError(f"{path.name} has not been built; {store.RUN_PIPELINE}")
+    return register_functions(sqlite3.connect(f"file:{path}?mode=ro", uri=True))
+
+
+@lru_cache(maxsize=128)
+def _query(sql, params, path, version):
+    con = connect(path)
+    try:
+        return pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+
+
+def query(sql, params=(), path=DB_PATH):
+    """Run ``sql`` with bound ``params``; the result is cached until the data changes.
+
+    Results are shared between callers; treat them as read-only.
+    """
+    return _query(sql, tuple(params), path, data.version(path))
+
+
+# ---- Page aggregations ----
+def cohort_totals():
+    """Distinct samples and subjects and the total aliquot count."""
+    row = query(f"""
+        SELECT COUNT(DISTINCT {quote(SAMPLE_COL)}) AS n_samples,
+               COUNT(DISTINCT {quote(SUBJECT_COL)}) AS n_subjects,
+               COALESCE(SUM("Aliquots_num"), 0) AS n_aliquots
+        FROM Samples
+    """).iloc[0]
+    return {k: int(v) for k, v in row.items()}
+
+
+def secretor_counts(milk_type="MOM"):
+    """MOM secretor status of each subject's first ``milk_type`` sample."""
+    return query(f"""
+        WITH firsts AS (
+            SELECT moms_secretor_status,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY {quote(SUBJECT_COL)} ORDER BY {quote(SAMPLE_COL)}, rowid
+                   ) AS n
+            FROM Milk
+            WHERE "Type of Milk" = ?
+        )
+        SELECT moms_secretor_status, COUNT(*) AS count
+        FROM firsts
+        WHERE n = 1 AND moms_secretor_status IS NOT NULL
+        GROUP BY moms_secretor_status
+        ORDER BY count DESC, moms_secretor_status
+    """, (milk_type,))
+
+
+def longitudinal_subjects(min_samples):
+    """Subject IDs (sorted) with at least ``min_samples`` samples."""
+    return query(f"""
+        SELECT {quote(SUBJECT_COL)}
+        FROM Subjects
+        WHERE {quote(SUBJECT_COL)} IS NOT NULL
+        GROUP BY {quote(SUBJECT_COL)}
+        HAVING COUNT(*) >= ?
+        ORDER BY {quote(SUBJECT_COL)}
+    """, (min_samples,))[SUBJECT_COL].tolist()
+
+
+def _columns(table):
+    return query("SELECT name FROM pragma_table_info(?)", (table,))["name"].tolist()
+
+
+def subject_samples(subject, hmo_columns=()):
+    """One subject's samples with the ``hmo_columns`` (``"<HMO> [<unit>]"``) pivoted in.
+
+    The ``Subjects``, ``Samples`` and ``Milk`` columns of each sample, in the
+    order of ``subjects.SubjectIndex``: by DOL, ties in file order, samples
+    without a DOL last.
+    """
+    seen = set(_columns("Subjects"))
+    extra = []
+    for alias, table in (("p", "Samples"), ("m", "Milk")):
+        for col in _columns(table):
+            if col not in seen:
+                seen.add(col)
+                extra.append(f"{alias}.{quote(col)}")
+    params = []
+    for column in hmo_columns:
+        name, _, unit = column[:-1].rpartition(" [")
+        extra.append(f"MAX(CASE WHEN l.HMO = ? AND l.Unit = ? THEN l.Value END) AS {quote(column)}")
+        params += [name, unit]
+    return query(f"""
+        SELECT s.*{"".join(", " + e for e in extra)}
+        FROM Subjects s
+        JOIN Samples p ON p.rowid = s.rowid
+        JOIN Milk m ON m.rowid = s.rowid
+        LEFT JOIN HMO_Long l ON l.row_id = s.rowid
+        WHERE s.{quote(SUBJECT_COL)} = ?
+        GROUP BY s.rowid
+        ORDER BY s."DOL" IS NULL, s."DOL", s.rowid
+    """, params + [subject])
+
+
+def growth_features(subject):
+    """The ``neobank.trajectory`` features of one subject as a Series, or None."""
+    rows = query(f"SELECT * FROM growth_features WHERE {quote(SUBJECT_COL)} = ?", (subject,))
+    return rows.iloc[0] if len(rows) else None
+
+
+def _route_sql():
+    # zscore.route_standards: size at birth for DOL <= BIRTH_DOL (very preterm
+    # below VERY_PRETERM_GA, newborn from it), postnatal preterm after birth
+    # for GA < PRETERM_GA; the age is GA at birth at birth, PMA after
+    return f"""
+        CASE
+            WHEN "DOL" <= {zscore.BIRTH_DOL} AND "GA_birth_weeks" < {zscore.VERY_PRETERM_GA} THEN '{zscore.VERY_PRETERM}'
+            WHEN "DOL" <= {zscore.BIRTH_DOL} AND "GA_birth_weeks" >= {zscore.VERY_PRETERM_GA} THEN '{zscore.NEWBORN}'
+            WHEN "DOL" > {zscore.BIRTH_DOL} AND "GA_birth_weeks" < {zscore.PRETERM_GA} THEN '{zscore.POSTNATAL_PRETERM}'
+        END AS standard,
+        CASE WHEN "DOL" <= {zscore.BIRTH_DOL} THEN "GA_birth_weeks" ELSE "PMA_weeks" END * 7.0 AS day
+    """
+
+
+def _zscore_sql():
+    male = [k.lower() for k, v in zscore.SEX_MAP.items() if isinstance(k, str) and v == "male"]
+    female = [k.lower() for k, v in zscore.SEX_MAP.items() if isinstance(k, str) and v == "female"]
+    measures = " UNION ALL ".join(
+        f"SELECT row_id, standard, sex, day, '{measure}' AS measure, {quote(column)} * {factor!r} AS value FROM routed"
+        for measure, (column, factor, _) in zscore.MEASURE_COLUMNS.items()
+    )
+    z_cols = ",\n".join(
+        f"MAX(CASE WHEN measure = '{measure}' THEN z END) AS {quote(z_col)}"
+        for measure, (_, _, z_col) in zscore.MEASURE_COLUMNS.items()
+    )
+    return f"""
+    WITH routed AS (
+        SELECT rowid AS row_id,
+               CASE WHEN LOWER(TRIM("Infant Sex")) IN ({", ".join(f"'{m}'" for m in male)}) THEN 'male'
+                    WHEN LOWER(TRIM("Infant Sex")) IN ({", ".join(f"'{f}'" for f in female)}) THEN 'female'
+               END AS sex,
+               {", ".join(quote(column) for column, _, _ in zscore.MEASURE_COLUMNS.values())},
+               {_route_sql()}
+        FROM Subjects
+        WHERE {{where}}
+    ),
+    points AS ({measures}),
+    scored AS (
+        -- linear interpolation between the GA days either side; NULL outside the curve
+        SELECT p.row_id, p.standard, p.measure,
+               lms_z(p.value,
+                     lo.L + (p.day - lo.ga_day) * (COALESCE(hi.L, lo.L) - lo.L),
+                     lo.M + (p.day - lo.ga_day) * (COALESCE(hi.M, lo.M) - lo.M),
+                     lo.S + (p.day - lo.ga_day) * (COALESCE(hi.S, lo.S) - lo.S)) AS z
+        FROM points p
+        JOIN growth_refs lo
+          ON lo.standard = p.standard AND lo.sex = p.sex AND lo.measure = p.measure
+         AND lo.ga_day = CAST(p.day AS INTEGER)
+        LEFT JOIN growth_refs hi
+          ON hi.standard = p.standard AND hi.sex = p.sex AND hi.measure = p.measure
+         AND hi.ga_day = lo.ga_day + 1
+        WHERE hi.ga_day IS NOT NULL OR p.day = lo.ga_day
+    )
+    SELECT s.rowid AS row_id, s.{quote(SUBJECT_COL)}, s.{quote(SAMPLE_COL)}, s."DOL",
+           r.standard AS {quote(zscore.STANDARD_COL)},
+           {z_cols}
+    FROM Subjects s
+    JOIN routed r ON r.row_id = s.rowid
+    LEFT JOIN scored z ON z.row_id = s.rowid
+    GROUP BY s.rowid
+    ORDER BY s.rowid
+    """
+
+
+def zscores(subject=None):
+    """INTERGROWTH z-scores for every sample (or one subject's), scored in SQL.
+
+    Same routing and interpolation as ``zscore.add_routed_zscores``: each
+    row is joined to the ``growth_refs`` days either side of its age and
+    scored with the ``lms_z`` function.
+    """
+    if subject is None:
+        return query(_zscore_sql().format(where="1"))
+    return query(_zscore_sql().format(where=f"{quote(SUBJECT_COL)} = ?"), (subject,))
+
+
+def report(name):
+    """One of the materialized ``reports.REPORTS`` tables."""
+    if name not in reports.REPORTS:
+        raise ValueError(f"Unknown report {name!r}")
+    return query(f"SELECT * FROM {quote(name)}")
+
+
+def hmo_values(hmo, unit=HMO_UNIT, subject=None):
+    """Long-format values of one HMO, optionally for one subject."""
+    sql = f"SELECT {quote(SUBJECT_COL)}, {quote(SAMPLE_COL)}, Value FROM HMO_Long WHERE HMO = ? AND Unit = ?"
+    params = [hmo, unit]
+    if subject is not None:
+        sql += f" AND {quote(SUBJECT_COL)} = ?"
+        params.append(subject)
+    return query(sql + " ORDER BY rowid", params)
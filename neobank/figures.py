@@ -0,0 +1,108 @@
+"""Memoized figures for the dashboard pages.
+
+Figures are stored under a key of (view, subject, HMO, growth metric,
+data version), so a rerun that only changed one selectbox rebuilds only the
+panel that depends on it. Plotly figures are kept as figure objects, so a
+hit hands back the figure without parsing anything; Matplotlib figures are
+kept as PNG bytes. The cache is process-wide, evicts least recently used
+entries and is capped by the total size of the stored figures (a Plotly
+figure counts as the length of its JSON, measured once when it is built).
+
+Cached figures are shared between reruns and sessions; treat them as
+read-only.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import matplotlib.pyplot as plt
+
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, payload, nbytes=None):
+        """Store ``payload``, counted as ``nbytes`` (its ``len`` by default)."""
+        nbytes = len(payload) if nbytes is None else nbytes
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            # a figure larger than the whole cache is served but not kept
+            if nbytes > self.max_bytes:
+                return payload
+            self._entries[key] = (payload, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def plotly(self, key, build):
+        """A Plotly figure for ``key``, built by ``build()`` on a miss (shared, read-only)."""
+        fig = self.get(key)
+        if fig is None:
+            fig = build()
+            self.put(key, fig, len(fig.to_json()))
+        return fig
+
+    def png(self, key, build, dpi=200):
+        """PNG bytes of the Matplotlib figure ``build()`` returns for ``key``.
+
+        The figure is closed once rendered, so cached views hold no pyplot state.
+        """
+        payload = self.get(key)
+        if payload is None:
+            fig = build()
+            try:
+                buf = io.BytesIO()
+                fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+            finally:
+                plt.close(fig)
+            payload = self.put(key, buf.getvalue())
+        return payload
+
+
+_default = FigureCache()
+
+
+def figure_key(view, version, subject=None, hmo=None, metric=None):
+    return (view, subject, hmo, metric, version)
+
+
+def plotly(view, build, version, subject=None, hmo=None, metric=None):
+    return _default.plotly(figure_key(view, version, subject, hmo, metric), build)
+
+
+def png(view, build, version, subject=None, hmo=None, metric=None):
+    return _default.png(figure_key(view, version, subject, hmo, metric), build)
+
+
+def clear():
+    _default.clear()
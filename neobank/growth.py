@@ -0,0 +1,164 @@
+"""Interactive growth panels for one subject.
+
+Weight, length and head circumference are drawn as panels of a single
+Plotly figure from one pass over the subject's samples, replacing the three
+separate Matplotlib figures the pages used to rasterize on every rerun.
+Optional overlays:
+
+* ``centiles`` - INTERGROWTH postnatal preterm centile curves behind the
+  measurements, placed on the DOL axis from the subject's GA at birth, and
+  the published size-at-birth 3rd/50th/97th centiles for that GA at DOL 0
+* ``zscores`` - a second row with the measurement z-scores and +/-2 SD lines
+
+Nothing here touches pyplot, so there is no figure state to leak.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from neobank import centiles as ig_centiles
+from neobank import reference, zscore
+
+PANELS = [
+    ("weight", "Current Weight", "Weight (g)"),
+    ("length", "Current Height", "Height (cm)"),
+    ("hc", "Current HC", "Head Circumference (cm)"),
+]
+LINE_COLOR = "#1B4A81"
+BAND_COLOR = "#9E9E9E"
+BAND_CENTILES = (3, 10, 50, 90, 97)
+BIRTH_CENTILES = (3, 50, 97)
+DOL_TICK = 3
+
+
+def _with_zscores(df):
+    z_cols = [z_col for _, _, z_col in zscore.MEASURE_COLUMNS.values()]
+    if all(c in df for c in z_cols):
+        return df
+    if zscore.AGE_COL not in df or zscore.GA_BIRTH_COL not in df:
+        df = zscore.add_gestational_ages(df)
+    return zscore.add_routed_zscores(df, reference.load())
+
+
+def _subject_sex(df):
+    sex = df[zscore.SEX_COL].dropna() if zscore.SEX_COL in df else pd.Series(dtype=object)
+    sex = sex[sex.isin(list(zscore.SEX_MAP))]
+    return zscore.SEX_MAP[sex.iloc[0]] if len(sex) else None
+
+
+def _ga_birth(df):
+    if zscore.GA_BIRTH_COL in df:
+        ga = pd.to_numeric(df[zscore.GA_BIRTH_COL], errors="coerce")
+    else:
+        ga = zscore.add_gestational_ages(df[[zscore.CGA_COL, zscore.DOL_COL]])[zscore.GA_BIRTH_COL]
+    ga = ga.dropna()
+    return float(ga.median()) if len(ga) else None
+
+
+def _birth_centiles(sex, measure, ga_birth):
+    # the published curves only cover very preterm births (24-33 weeks)
+    bands = ig_centiles.published_bands(sex, measure)
+    ga = bands.index.to_numpy()
+    if not ga[0] <= ga_birth <= ga[-1]:
+        return None
+    return [float(np.interp(ga_birth, ga, bands[c].to_numpy())) for c in BIRTH_CENTILES]
+
+
+def growth_figure(subject_df, zscores=False, centiles=False, dol_col="DOL",
+                  line_color=LINE_COLOR, background="#ffffff", font_color="black"):
+    """One figure with a panel per growth measure for ``subject_df``."""
+    df = subject_df.copy()
+    df[dol_col] = pd.to_numeric(df[dol_col], errors="coerce")
+    df = df.sort_values(dol_col, kind="stable")
+    if zscores:
+        df = _with_zscores(df)
+
+    sex = _subject_sex(df) if centiles else None
+    ga_birth = _ga_birth(df) if centiles else None
+    dol = df[dol_col].to_numpy(dtype=float)
+    observed = dol[~np.isnan(dol)]
+
+    rows = 2 if zscores else 1
+    fig = make_subplots(
+        rows=rows, cols=len(PANELS),
+        shared_xaxes=True,
+        row_heights=[0.65, 0.35] if zscores else None,
+        vertical_spacing=0.08,
+        horizontal_spacing=0.06,
+        subplot_titles=[title for _, _, title in PANELS],
+    )
+
+    for col, (measure, column, title) in enumerate(PANELS, start=1):
+        if sex is not None and ga_birth is not None and len(observed):
+            bands = ig_centiles.lms_bands(sex, measure)
+            band_dol = (bands.index.to_numpy() - ga_birth) * 7
+            keep = (band_dol >= observed.min() - DOL_TICK) & (band_dol <= observed.max() + DOL_TICK)
+            for c in BAND_CENTILES:
+                fig.add_trace(
+                    go.Scatter(
+                        x=band_dol[keep], y=bands[c].to_numpy()[keep],
+                        mode="lines",
+                        line=dict(color=BAND_COLOR, width=1.5 if c == 50 else 1,
+                                  dash="solid" if c == 50 else "dot"),
+                        name=f"centile {c}", legendgroup="centiles",
+                        showlegend=False, hoverinfo="name",
+                    ),
+                    row=1, col=col,
+                )
+
+            birth = _birth_centiles(sex, measure, ga_birth)
+            if birth is not None:
+                low, median, high = birth
+                fig.add_trace(
+                    go.Scatter(
+                        x=[0], y=[median],
+                        mode="markers",
+                        marker=dict(color=BAND_COLOR, symbol="diamond"),
+                        error_y=dict(type="data", symmetric=False, array=[high - median],
+                                     arrayminus=[median - low], color=BAND_COLOR),
+                        name="birth centiles 3-50-97", legendgroup="centiles",
+                        showlegend=False, hoverinfo="name+y",
+                    ),
+                    row=1, col=col,
+                )
+
+        fig.add_trace(
+            go.Scatter(
+                x=dol, y=df[column].to_numpy(dtype=float),
+                mode="lines+markers",
+                marker=dict(color=line_color), line=dict(color=line_color),
+                name=title, showlegend=False,
+                connectgaps=True,
+            ),
+            row=1, col=col,
+        )
+        fig.update_yaxes(title_text=title, row=1, col=col)
+
+        if zscores:
+            z_col = zscore.MEASURE_COLUMNS[measure][2]
+            fig.add_trace(
+                go.Scatter(
+                    x=dol, y=df[z_col].to_numpy(dtype=float),
+                    mode="lines+markers",
+                    marker=dict(color=line_color), line=dict(color=line_color, dash="dash"),
+                    name=f"{title} z-score", showlegend=False,
+                    connectgaps=True,
+                ),
+                row=2, col=col,
+            )
+            for level in (-2, 0, 2):
+                fig.add_hline(y=level, line=dict(color=BAND_COLOR, width=1, dash="dot" if level else "solid"),
+                              row=2, col=col)
+            fig.update_yaxes(title_text="z-score", row=2, col=col)
+
+    fig.update_xaxes(dtick=DOL_TICK, showgrid=False)
+    fig.update_xaxes(title_text="DOL", row=rows)
+    fig.update_layout(
+        height=380 if rows == 1 else 600,
+        plot_bgcolor=background,
+        paper_bgcolor=background,
+        font_color=font_color,
+        margin=dict(t=40),
+    )
+    return fig
@@ -0,0 +1,182 @@
+"""Canonical HMO fact store.
+
+One long table per cohort table, one row per (sample, HMO column), dense
+(missing values included) and sorted by (subject, DOL, HMO) in the sample
+order of ``subjects.SubjectIndex``. Because every sample has the same
+HMO columns in the same order, the ``value`` column reshapes into the
+(samples x HMOs) matrix without a copy, so:
+
+* ``HMOStore.long`` is the fact table itself
+* ``HMOStore.wide`` is a DataFrame over that same matrix
+* a subject's block is a contiguous slice of both
+
+The second access path, ``by_hmo``, holds the non-missing facts sorted by
+(HMO, value), with each HMO's values contiguous, for distribution queries
+(quantiles, ranges, ranks) by binary search.
+
+The pipeline writes the facts to Parquet (``build``), and the SQLite
+``HMO_Long`` table is loaded from the same facts (see ``neobank.db``), so
+the pages and the SQL side cannot drift. Each fact file records the digest
+of the cohort table it came from; ``load`` refuses facts built from another
+version of it rather than serve sample blocks that no longer line up.
+Pages never melt or pivot the HMO block at render time.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from neobank import acreport, data, store
+from neobank.data import CLEANED_DIR, MERGED_ALL, UNLINKED_MERGED
+from neobank.subjects import SubjectIndex
+
+HMO_FACTS = CLEANED_DIR / "hmo_facts.parquet"
+UNLINKED_HMO_FACTS = CLEANED_DIR / "unlinked_hmo_facts.parquet"
+# fact file -> cohort table it is built from
+SOURCES = {HMO_FACTS: MERGED_ALL, UNLINKED_HMO_FACTS: UNLINKED_MERGED}
+
+SUBJECT_COL = "Subject ID"
+SAMPLE_COL = "sample_unique_id"
+DOL_COL = "DOL"
+KEYS = ["row", SUBJECT_COL, SAMPLE_COL, DOL_COL]
+
+# relative-abundance (AUC) block of the unlinked table
+UNLINKED_HMO_COLUMNS = [
+    "2FL", "DFLAC", "3SL", "6SL", "LNT", "LNnT", "LNFPI", "LNFPII", "LNFPIII",
+    "LSTc", "DFLNT", "DSLNT", "DFLNH", "FDSLNH", "DSLNH",
+]
+
+
+def unit_columns(df):
+    """The ``<HMO> [<unit>]`` columns of ``df`` as {column: (hmo, unit)}."""
+    names = {f"{hmo} [{unit}]": (hmo, unit) for unit in acreport.UNITS for hmo in acreport.HMOS}
+    return {c: names[c] for c in df.columns if c in names}
+
+
+def facts(df, columns):
+    """Dense long facts of ``columns`` of ``df``, sorted by (subject, DOL, HMO).
+
+    ``row`` is the sample's position in ``df``.
+    """
+    frame = df[[SUBJECT_COL, SAMPLE_COL, DOL_COL] + list(columns)].copy()
+    frame.insert(0, "row", np.arange(len(df), dtype=np.int32))
+    frame = SubjectIndex(frame).frame
+
+    n_samples, n_hmo = len(frame), len(columns)
+    out = pd.DataFrame({
+        key: np.repeat(frame[key].to_numpy(), n_hmo) for key in KEYS
+    })
+    out[DOL_COL] = pd.to_numeric(out[DOL_COL], errors="coerce").astype(float)
+    out["HMO"] = pd.Categorical.from_codes(np.tile(np.arange(n_hmo), n_samples), categories=list(columns))
+    out["value"] = frame[list(columns)].to_numpy(dtype=float).reshape(-1)
+    return out
+
+
+def build():
+    """Write the fact tables of the combined and unlinked cohort tables."""
+    combined = store.read_parquet(MERGED_ALL)
+    store.write_derived(facts(combined, list(unit_columns(combined))), HMO_FACTS, data.digest(MERGED_ALL))
+    unlinked = store.read_parquet(UNLINKED_MERGED)
+    store.write_derived(facts(unlinked, UNLINKED_HMO_COLUMNS), UNLINKED_HMO_FACTS, data.digest(UNLINKED_MERGED))
+
+
+class HMOStore:
+    def __init__(self, long):
+        self.long = long.reset_index(drop=True)
+        self.hmos = list(self.long["HMO"].cat.categories)
+        n_hmo = len(self.hmos)
+        n_samples = len(self.long) // n_hmo if n_hmo else 0
+
+        # every n_hmo-th fact starts a sample
+        self.samples = self.long.iloc[::n_hmo][KEYS].reset_index(drop=True) if n_hmo else self.long[KEYS]
+        self.values = self.long["value"].to_numpy().reshape(n_samples, n_hmo)
+        self._column = {h: i for i, h in enumerate(self.hmos)}
+
+        ids = self.samples[SUBJECT_COL].astype(str).to_numpy()
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+        self.subjects = ids[starts].tolist()
+        self.offsets = np.r_[starts, len(ids)]
+        self._position = {s: i for i, s in enumerate(self.subjects)}
+
+        # (HMO, value) access path: non-missing facts, each HMO contiguous
+        codes = self.long["HMO"].cat.codes.to_numpy()
+        value = self.long["value"].to_numpy()
+        keep = np.flatnonzero(~np.isnan(value))
+        order = keep[np.lexsort((value[keep], codes[keep]))]
+        self.by_hmo = self.long.iloc[order].reset_index(drop=True)
+        self._hmo_offsets = np.searchsorted(codes[order], np.arange(n_hmo + 1))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def _rows(self, subject):
+        i = self._position.get(subject)
+        return (0, 0) if i is None else (self.offsets[i], self.offsets[i + 1])
+
+    def wide(self, columns=None):
+        """Samples x HMOs; a view of the facts unless ``columns`` picks a subset."""
+        frame = pd.DataFrame(self.values, columns=self.hmos, copy=False)
+        return frame if columns is None else frame[list(columns)]
+
+    def subject_wide(self, subject, columns=None):
+        """The subject's samples (in DOL order) x HMOs."""
+        start, stop = self._rows(subject)
+        return self.wide(columns).iloc[start:stop]
+
+    def subject_long(self, subject):
+        """The subject's facts, sorted by (DOL, HMO); a slice of ``long``."""
+        start, stop = self._rows(subject)
+        n_hmo = len(self.hmos)
+        return self.long.iloc[start * n_hmo:stop * n_hmo]
+
+    def subject_samples(self, subject):
+        start, stop = self._rows(subject)
+        return self.samples.iloc[start:stop]
+
+    def distribution(self, hmo):
+        """Sorted non-missing values of one HMO (a view)."""
+        j = self._column[hmo]
+        return self.by_hmo["value"].to_numpy()[self._hmo_offsets[j]:self._hmo_offsets[j + 1]]
+
+    def facts_for(self, hmo):
+        """Non-missing facts of one HMO, sorted by value."""
+        j = self._column[hmo]
+        return self.by_hmo.iloc[self._hmo_offsets[j]:self._hmo_offsets[j + 1]]
+
+    def quantiles(self, hmo, q):
+        values = self.distribution(hmo)
+        return np.quantile(values, q) if len(values) else np.full(np.shape(q), np.nan)
+
+    def between(self, hmo, low, high):
+        """Facts of ``hmo`` with ``low <= value <= high``."""
+        values = self.distribution(hmo)
+        lo = np.searchsorted(values, low, side="left")
+        hi = np.searchsorted(values, high, side="right")
+        return self.facts_for(hmo).iloc[lo:hi]
+
+    def rank(self, hmo, value):
+        """Fraction of the HMO's values at or below ``value``."""
+        values = self.distribution(hmo)
+        return np.searchsorted(values, value, side="right") / len(values) if len(values) else np.nan
+
+
+@lru_cache(maxsize=4)
+def _store(path, source_digest):
+    return HMOStore(store.read_derived(path, SOURCES[path], source_digest))
+
+
+def load(path=HMO_FACTS):
+    """Cached ``HMOStore`` for a fact file (shared, treat as read-only).
+
+    Cached per version of the source table; raises ``store.OutOfDateError``
+    until the pipeline has rebuilt the facts for it.
+    """
+    return _store(path, data.digest(SOURCES[path]))
+
+
+def combined():
+    return load(HMO_FACTS)
+
+
+def unlinked():
+    return load(UNLINKED_HMO_FACTS)
@@ -0,0 +1,188 @@
+"""Rule-table text normalization for the metadata cleaning stages.
+
+A column's cleaning is declared as a list of ``(op, arg)`` steps, e.g.::
+
+    [("compact", {"mbm": "MBM"}), ("synonyms", {"MBM": "MOM", "MBM+DBM": "MOM + DBM"})]
+
+``normalize`` factorizes the column (or takes a categorical's categories as
+they are), runs the steps as ``.str`` operations over the distinct values
+only and maps the result back through the codes, so the cost follows the
+number of distinct spellings rather than the number of rows. Missing values
+are one of the distinct values and go through the rules too (``classify``
+gives them its default, ``extract`` leaves them missing).
+
+Steps only touch string values; numbers and other types pass through
+unchanged unless a ``stringify`` step comes first.
+
+Ops:
+
+* ``strip`` / ``lstrip`` - ``arg`` is the characters to strip (None: whitespace)
+* ``capitalize``
+* ``synonyms`` - exact ``{value: replacement}``
+* ``pattern`` - ``{regex: replacement}`` for values the regex fully matches
+* ``prefix`` - ``{prefix: replacement}`` on the stripped, lower-cased value
+* ``compact`` - ``{key: replacement}`` on the lower-cased value without spaces
+* ``extract`` - first group of a case-insensitive regex search, else missing
+* ``truncate_after`` - cut after a case-insensitive regex match
+* ``classify`` - ``([(substring, label), ...], default)`` on the lower-cased value
+* ``empty_to_na``
+* ``stringify`` - ``str()`` of every non-missing value
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def _is_str(values):
+    return values.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+
+
+def _on_strings(values, func):
+    mask = _is_str(values)
+    if not mask.any():
+        return values
+    out = values.copy()
+    out[mask] = func(values[mask].astype(str)).to_numpy(dtype=object)
+    return out
+
+
+def _keyed(key_func):
+    # {key: replacement} ops: replace the strings whose derived key matches
+    def op(values, table):
+        def apply(s):
+            key = key_func(s)
+            out = s.copy()
+            for k, v in table.items():
+                out = out.mask(key == k, v)
+            return out
+        return _on_strings(values, apply)
+    return op
+
+
+def _prefix(values, table):
+    def apply(s):
+        key = s.str.strip().str.lower()
+        out = s.copy()
+        for prefix, v in table.items():
+            out = out.mask(key.str.startswith(prefix), v)
+        return out
+    return _on_strings(values, apply)
+
+
+def _pattern(values, table):
+    def apply(s):
+        out = s.copy()
+        for regex, v in table.items():
+            out = out.mask(s.str.fullmatch(regex), v)
+        return out
+    return _on_strings(values, apply)
+
+
+def _extract(values, regex):
+    mask = _is_str(values)
+    out = pd.Series(None, index=values.index, dtype=object)
+    if mask.any():
+        found = values[mask].astype(str).str.extract(regex, flags=re.IGNORECASE, expand=False)
+        if isinstance(found, pd.DataFrame):
+            found = found.iloc[:, 0]
+        out[mask] = found.astype(object).where(found.notna(), None).to_numpy(dtype=object)
+    return out
+
+
+def _truncate_after(values, regex):
+    def apply(s):
+        head = s.str.extract(f"^(.*?(?:{regex}))", flags=re.IGNORECASE | re.DOTALL, expand=False)
+        return head.str.strip().where(head.notna(), s)
+    return _on_strings(values, apply)
+
+
+def _classify(values, arg):
+    rules, default = arg
+    mask = _is_str(values)
+    out = pd.Series(default, index=values.index, dtype=object)
+    if mask.any():
+        lower = values[mask].astype(str).str.lower()
+        labels = pd.Series(None, index=lower.index, dtype=object)
+        # first matching rule wins, so fill in reverse order
+        for needle, label in reversed(rules):
+            labels = labels.mask(lower.str.contains(needle, regex=False), label)
+        out[mask] = labels.fillna(default).to_numpy(dtype=object)
+    return out
+
+
+def _stringify(values, _):
+    out = values.copy()
+    keep = values.notna().to_numpy() & ~_is_str(values)
+    out[keep] = values[keep].map(str)
+    return out
+
+
+OPS = {
+    "strip": lambda values, chars: _on_strings(values, lambda s: s.str.strip(chars)),
+    "lstrip": lambda values, chars: _on_strings(values, lambda s: s.str.lstrip(chars)),
+    "capitalize": lambda values, _: _on_strings(values, lambda s: s.str.capitalize()),
+    "synonyms": lambda values, table: values.replace(table),
+    "pattern": _pattern,
+    "prefix": _prefix,
+    "compact": _keyed(lambda s: s.str.lower().str.replace(" ", "", regex=False)),
+    "extract": _extract,
+    "truncate_after": _truncate_after,
+    "classify": _classify,
+    "empty_to_na": lambda values, _: values.mask(values.eq("").fillna(False).astype(bool), None),
+    "stringify": _stringify,
+}
+
+
+def run_steps(values, steps):
+    """Apply ``steps`` to a Series of distinct values (object dtype)."""
+    for step in steps:
+        op, arg = step if len(step) == 2 else (step[0], None)
+        if op not in OPS:
+            raise ValueError(f"Unknown normalization op {op!r}")
+        values = OPS[op](values, arg)
+    return values
+
+
+def normalize(series, steps):
+    """``series`` with ``steps`` applied to each distinct value."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = list(series.cat.categories) + [np.nan]
+        codes = np.where(codes < 0, len(uniques) - 1, codes)
+    else:
+        codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=False)
+        uniques = list(uniques)
+    distinct = run_steps(pd.Series(uniques, dtype=object), steps)
+    out = pd.Series(distinct.to_numpy(dtype=object)[codes], index=series.index, name=series.name)
+    if isinstance(series.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return out.astype("category" if isinstance(series.dtype, pd.CategoricalDtype) else series.dtype)
+    return out
+
+
+def apply_rules(df, rules):
+    """Normalize every column of ``df`` named in ``rules`` ({column: steps})."""
+    out = df.copy()
+    for col, steps in rules.items():
+        if col in out:
+            out[col] = normalize(out[col], steps)
+    return out
+
+
+def strip_strings(df):
+    """Strip whitespace from the string values of every object/string column."""
+    cols = [c for c in df.columns if df[c].dtype == object or pd.api.types.is_string_dtype(df[c])]
+    return apply_rules(df, {c: [("strip",)] for c in cols})
+
+
+def unmapped(df, vocabularies):
+    """Values outside each column's vocabulary: (column, value, count) rows."""
+    rows = []
+    for col, vocab in vocabularies.items():
+        if col not in df:
+            continue
+        counts = df[col].dropna().value_counts()
+        counts = counts[counts > 0]
+        for value, count in counts[~counts.index.isin(vocab)].items():
+            rows.append((col, value, int(count)))
+    return pd.DataFrame(rows, columns=["column", "value", "count"])
@@ -0,0 +1,12 @@
+"""Scripted, incremental rebuild of ``Cleaned Data/``.
+
+    python -m neobank.pipeline            # rebuild stages whose inputs changed
+    python -m neobank.pipeline --force    # rebuild everything
+    python -m neobank.pipeline --workers 1    # no process pool
+"""
+from neobank.pipeline.core import Stage, run
+from neobank.pipeline.stages import STAGES
+
+
+def build(force=False, log=print, workers=None):
+    return run(STAGES, force=force, log=log, workers=workers)
@@ -0,0 +1,11 @@
+import argparse
+
+from neobank.pipeline import build
+
+parser = argparse.ArgumentParser(description="Rebuild the NeoBANK cleaned tables.")
+parser.add_argument("--force", action="store_true", help="rebuild every stage")
+parser.add_argument("--workers", type=int, default=None,
+                    help="processes per wave of independent stages (default: one per CPU)")
+args = parser.parse_args()
+
+build(force=args.force, workers=args.workers)
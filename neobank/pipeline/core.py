@@ -0,0 +1,216 @@
+"""Stage bookkeeping for the cleaning pipeline.
+
+Each stage declares the files it reads and the tables it writes. After a
+stage runs, the content hash of every input and output is recorded in a
+manifest; on the next run a stage is skipped when its inputs, its outputs
+and the stage code all still hash the same. The code hash covers the module
+defining the stage and every ``neobank`` module it reaches through its
+imports, so an edit to a shared helper (zscore, normalize, ...) rebuilds the
+stages that call it. The manifest is saved after every wave, so a failure
+later in the run does not throw away the stages that already finished.
+
+Cleaned tables are fingerprinted through their Parquet twin, which is
+written deterministically, so re-exporting an identical table does not
+force the stages downstream of it to rebuild.
+
+Stages are run in waves: consecutive stages that do not read each other's
+outputs (e.g. the raw-workbook stages) go in the same wave, and the ones
+that need rebuilding run concurrently in a process pool of ``workers``
+processes. A stage's ``reads`` (the raw sheets it parses) are separate
+pool tasks, submitted for the whole wave before any stage starts, so every
+workbook and sheet is parsed in parallel and the stage gets the frames as
+keyword arguments. With ``workers=1`` everything runs in this process, one
+after another.
+"""
+import hashlib
+import inspect
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from neobank import store
+from neobank.data import CLEANED_DIR, ROOT
+
+MANIFEST = CLEANED_DIR / ".pipeline.json"
+
+
+@dataclass
+class Stage:
+    name: str
+    func: object
+    inputs: list
+    outputs: list
+    # keyword -> picklable callable (e.g. a functools.partial of a sheet
+    # reader); the results are passed to ``func`` under those keywords
+    reads: dict = field(default_factory=dict)
+
+    def code_hash(self):
+        # any edit to the stage's module or a neobank module it uses invalidates it
+        func = getattr(self.func, "func", self.func)
+        h = hashlib.sha256()
+        for module in _dependencies(inspect.getmodule(func)):
+            h.update(module.__name__.encode("utf-8"))
+            h.update(inspect.getsource(module).encode("utf-8"))
+        return h.hexdigest()
+
+
+def _is_neobank(module):
+    name = getattr(module, "__name__", "")
+    return name == "neobank" or name.startswith("neobank.")
+
+
+def _dependencies(module):
+    """``module`` and the neobank modules it imports, directly or not, by name."""
+    seen, todo = {}, [module]
+    while todo:
+        module = todo.pop()
+        if module is None or module.__name__ in seen:
+            continue
+        seen[module.__name__] = module
+        for value in vars(module).values():
+            # ``import x`` binds the module, ``from x import f`` a member of it
+            used = value if inspect.ismodule(value) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if _is_neobank(used):
+                todo.append(used)
+    return [seen[name] for name in sorted(seen)]
+
+
+def _rel(path):
+    return Path(path).resolve().relative_to(ROOT).as_posix()
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Fingerprints:
+    """Content hashes of files, reusing earlier hashes when mtime/size match."""
+
+    def __init__(self, previous=None):
+        self.previous = previous or {}
+        self.current = {}
+
+    def __call__(self, path):
+        path = Path(path)
+        twin = store.parquet_path(path)
+        target = twin if twin.exists() else path
+        if not target.exists():
+            return None
+
+        key = _rel(target)
+        stat = target.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        old = self.current.get(key) or self.previous.get(key)
+        if old is not None and old["stat"] == stamp:
+            digest = old["sha256"]
+        else:
+            digest = _sha256(target)
+        self.current[key] = {"stat": stamp, "sha256": digest}
+        return digest
+
+
+def _load_manifest(path):
+    if not path.exists():
+        return {"files": {}, "stages": {}}
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _save_manifest(manifest, fingerprint, path):
+    manifest["files"] = {**manifest["files"], **fingerprint.current}
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _stage_record(stage, fingerprint):
+    return {
+        "code": stage.code_hash(),
+        "inputs": {_rel(p): fingerprint(p) for p in stage.inputs},
+        "outputs": {_rel(p): fingerprint(p) for p in stage.outputs},
+    }
+
+
+def waves(stages):
+    """Split ``stages`` into runs of consecutive stages that can run together."""
+    out, wave, produced = [], [], set()
+    for stage in stages:
+        if wave and any(_rel(p) in produced for p in stage.inputs):
+            out.append(wave)
+            wave, produced = [], set()
+        wave.append(stage)
+        produced.update(_rel(p) for p in stage.outputs)
+    if wave:
+        out.append(wave)
+    return out
+
+
+def _execute(stages, workers):
+    tasks = len(stages) + sum(len(stage.reads) for stage in stages)
+    if workers <= 1 or tasks < 2:
+        for stage in stages:
+            stage.func(**{key: read() for key, read in stage.reads.items()})
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, tasks)) as pool:
+        parsed = {
+            (stage.name, key): pool.submit(read)
+            for stage in stages for key, read in stage.reads.items()
+        }
+        # stages without reads start right away, the others as their sheets arrive
+        futures = []
+        for stage in sorted(stages, key=lambda s: bool(s.reads)):
+            frames = {key: parsed[(stage.name, key)].result() for key in stage.reads}
+            futures.append(pool.submit(stage.func, **frames))
+    # every stage of the wave has finished; report the first failure
+    for future in futures:
+        future.result()
+
+
+def run(stages, force=False, manifest_path=MANIFEST, log=print, workers=None):
+    """Run ``stages`` in order, skipping the ones that are up to date.
+
+    ``workers`` caps the processes used per wave (default: one per CPU).
+    Returns the names of the stages that were rebuilt.
+    """
+    workers = workers or os.cpu_count() or 1
+    manifest = _load_manifest(manifest_path)
+    fingerprint = Fingerprints(manifest["files"])
+    rebuilt = []
+
+    for wave in waves(stages):
+        todo = []
+        for stage in wave:
+            missing = [p for p in stage.inputs if fingerprint(p) is None]
+            if missing:
+                raise FileNotFoundError(f"Stage '{stage.name}' is missing inputs: {missing}")
+
+            before = _stage_record(stage, fingerprint)
+            recorded = manifest["stages"].get(stage.name)
+            outputs_ok = all(h is not None for h in before["outputs"].values())
+            if not force and outputs_ok and recorded == before:
+                log(f"[{stage.name}] up to date")
+                continue
+
+            log(f"[{stage.name}] rebuilding")
+            todo.append(stage)
+
+        if not todo:
+            continue
+        _execute(todo, workers)
+        for stage in todo:
+            manifest["stages"][stage.name] = _stage_record(stage, fingerprint)
+            rebuilt.append(stage.name)
+        # record the wave now so a failure further on does not redo it
+        _save_manifest(manifest, fingerprint, manifest_path)
+
+    _save_manifest(manifest, fingerprint, manifest_path)
+    return rebuilt
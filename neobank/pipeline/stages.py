@@ -0,0 +1,347 @@
+"""Cleaning stages, one per notebook in ``code/``.
+
+The notebooks remain the place to explore the data; these functions are the
+same steps without the inspection cells, so ``Cleaned Data/`` can be rebuilt
+with one command instead of running the notebooks by hand in order. The
+INTERGROWTH LMS reference is compiled here as well.
+"""
+
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from neobank import acreport, centiles, cube, db, hmo, normalize, reference, reports, schema, secretor, store, summary, xlsx, zscore
+from neobank.data import (
+    LINKED_MERGED,
+    LINKED_META,
+    MERGED_ALL,
+    MERGED_DF,
+    RAW_DIR,
+    SECRETOR_CHECK,
+    UNLINKED_MERGED,
+    UNLINKED_META,
+)
+from neobank.pipeline.core import Stage
+
+UNLINKED_METADATA_XLSX = RAW_DIR / "Unlinked Metadata 0625.xlsx"
+UNLINKED_SUBJECTS_XLSX = RAW_DIR / "Unlinked Subject Metadata.xlsx"
+UNLINKED_AC_XLSX = RAW_DIR / "NeoBank Unlinked AC.xlsx"
+LINKED_SAMPLE_XLSX = RAW_DIR / "Copy of NeoBANK Linked Sample.xlsx"
+LINKED_AC_XLSX = RAW_DIR / "Linked AC.xlsx"
+
+# Unlinked AC columns read from the sheet (anything else on it is skipped)
+UNLINKED_AC_COLUMNS = [
+    "sample ID", "inj vol", "2'FL", "DFLAC", "3'SL", "6'SL", "LNT", "LNnT", "LNFPI", "LNFPII",
+    "LNFPIII", "LSTc", "DFLNT", "DSLNT", "DFLNH", "FDSLNH", "DSLNH",
+]
+
+AUC_HMO_COLUMNS = [
+    "2FL", "DFLAC", "3SL", "6SL", "LNT", "LNnT", "LNFPI", "LNFPII", "LNFPIII",
+    "LSTc", "DFLNT", "DSLNT", "DFLNH", "FDSLNH", "DSLNH",
+]
+
+# ---- metadata normalization rules (see neobank.normalize) ----
+ALIQUOTS = [("stringify",), ("extract", r"^(\d+)")]
+
+UNLINKED_RULES = {
+    "Scavenged/Fresh?": [("prefix", {"scavenged": "Scavenged"})],
+    "MBM/DMB?": [
+        ("compact", {"mbm": "MBM"}),
+        ("synonyms", {
+            "MBM": "MOM",
+            "MBM + DBM": "MOM + DBM",
+            "Switched to Fortifier ": "Switched to Formula",
+            "MBM+DBM": "MOM + DBM",
+        }),
+    ],
+}
+
+# "Scavenged Feeding Tube + <note>": the note, then the comment without it
+SCAVENGED_NOTES = [
+    ("extract", r"scavenged feeding tube.*?([+-].*)"),
+    ("strip",),
+    ("lstrip", "+- "),
+    ("empty_to_na",),
+]
+UNLINKED_COMMENTS = [
+    ("truncate_after", "scavenged feeding tube"),
+    ("synonyms", {
+        "Residual from Milk Prep Room & B2 Full": "Residual from Milk Prep Room",
+        "Scanvenged Feeding Tube - Collected Outside of 4 hr Window ": "Scavenged Feeding Tube",
+        "Residual from Milk Prep Room - Baby not on NG Feeds no linked sample": "Residual from Milk Prep Room",
+    }),
+    ("synonyms", {"Residual from Milk Prep Room": "Prepped in Milk Room"}),
+    ("classify", ([("scavenged", "Scavenged"), ("milk room", "Prepped in Milk Room")], "Other")),
+]
+
+LINKED_RULES = {
+    "Type of Milk": [("synonyms", {"MBM": "MOM", "MBM + DBM": "MOM+DBM", "DBM+MBM": "MOM+DBM"})],
+    "Scavenged/Fresh?": [("strip",), ("capitalize",), ("synonyms", {"Scaveneged": "Scavenged"})],
+    "HMF": [("synonyms", {"Y + Nutramigen": "Y+Nutramigen"})],
+    "Iron": [("pattern", {r"\s*Y\s*": "Y"})],
+}
+LINKED_SAMPLE_SOURCE = [
+    ("synonyms", {
+        "Residual from Milk Prep Room": "Prepped in Milk Room",
+        "Scavenged Feeding Tube": "Scavenged",
+        "Scavenged Bottle - Residual Feed": "Scavenged",
+        "Scavenged Feeding Syringe": "Scavenged",
+    }),
+]
+
+def aliquot_counts(values):
+    # leading number of the "# Aliquots" text, e.g. "7 (2 mL)" -> 7
+    return pd.to_numeric(normalize.normalize(values, ALIQUOTS))
+
+
+def report_unmapped(df, stage):
+    for col, value, count in normalize.unmapped(df, schema.CATEGORIES).itertuples(index=False):
+        print(f"[{stage}] unmapped {col} value {value!r} ({count} rows)")
+
+
+def clean_unlinked_metadata(df, SI):
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+
+    merged = df.merge(SI, on="Subject ID", how="left")
+    merged = merged.rename(columns={"Sample Type_#": "sample_unique_id"})
+    merged["sample_unique_id"] = merged["sample_unique_id"].astype(str).str.strip()
+
+    merged = normalize.apply_rules(merged, UNLINKED_RULES)
+
+    merged['Aliquots_num'] = aliquot_counts(merged['# Aliquots'])
+    merged = merged.drop(columns=["# Aliquots"])
+
+    # Additional Comments -> scavenged notes + Sample Source
+    merged["scavenged notes"] = normalize.normalize(merged["Additional Comments"], SCAVENGED_NOTES)
+    merged["Sample Source"] = normalize.normalize(merged["Additional Comments"], UNLINKED_COMMENTS)
+    merged = merged.drop(columns=["Additional Comments"])
+
+    # Rename columns to remove '?' and 'Y/N' for clarity
+    merged = merged.rename(columns={
+        "Scavenged/Fresh?": "Scavenged or Fresh",
+        "MBM/DMB?": "Type of Milk",
+        "HMF Y/N?": "HMF",
+        "TPN Y/N?": "TPN",
+        "Iron Y/N?": "Iron",
+        "Linked?": "Linked"
+    })
+    report_unmapped(merged, "unlinked")
+    return merged
+
+
+def iter_unlinked_area_counts(chunk_rows=xlsx.CHUNK_ROWS):
+    return xlsx.iter_sheet(UNLINKED_AC_XLSX, "Sheet2", UNLINKED_AC_COLUMNS,
+                           dtypes={"sample ID": "string", "inj vol": "Int64"}, chunk_rows=chunk_rows)
+
+
+def merge_unlinked_area_counts(meta, chunks):
+    # the AC sheet is joined one chunk at a time, so only its matched rows
+    # are ever held; the row position puts them back in metadata order
+    meta = meta.assign(_row=np.arange(len(meta)))
+    parts = []
+    for AC in chunks:
+        AC = AC.rename(columns={"sample ID": "sample_unique_id", "2'FL": "2FL", "3'SL": "3SL", "6'SL": "6SL"})
+        AC["sample_unique_id"] = AC["sample_unique_id"].astype(str).str.strip()
+        # inner join = samples that exist in both DataFrames
+        parts.append(meta.merge(AC, on="sample_unique_id", how="inner"))
+    if not parts:
+        raise ValueError(f"{UNLINKED_AC_XLSX.name} has no area counts")
+    merged = (pd.concat(parts, ignore_index=True)
+              .sort_values("_row", kind="stable")
+              .drop(columns="_row")
+              .reset_index(drop=True))
+
+    merged["Secretor Status"] = secretor.classify(merged["2FL"], secretor.THRESHOLDS["auc"])
+    # Mother's status = status of the subject's first MOM sample
+    merged["secretorstatus_mom"] = secretor.first_mom(merged)
+    return merged
+
+
+def build_unlinked(metadata, subjects):
+    meta = clean_unlinked_metadata(metadata, subjects)
+    store.write_table(meta, UNLINKED_META)
+    merged = merge_unlinked_area_counts(meta, iter_unlinked_area_counts())
+    store.write_table(merged, UNLINKED_MERGED)
+    store.write_table(secretor.check_table(merged), SECRETOR_CHECK)
+
+
+# ---- linked_data.ipynb ----
+def clean_linked_metadata(df):
+    df = df.rename(columns={
+        "HMF Y/N?": "HMF",
+        "TPN Y/N?": "TPN",
+        "Linked?": "Linked",
+        "MBM/DMB?": "Type of Milk",
+        "Sample Type_#": "sample_unique_id",
+        'Duration\n(min)': "Feeding Duration"
+    })
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={'Iron Y/N?': 'Iron'})
+
+    df = normalize.strip_strings(df)
+    df = normalize.apply_rules(df, LINKED_RULES)
+
+    df['Sample Source'] = normalize.normalize(df['Additional Comments'], LINKED_SAMPLE_SOURCE)
+    df = df.drop(columns=['Additional Comments'])
+
+    df['Aliquots_num'] = aliquot_counts(df['# Aliquots'])
+    df = df.drop(columns=['# Aliquots'])
+    report_unmapped(df, "linked")
+    return df
+
+
+def load_linked_area_counts(AC, AC_volumes):
+    AC_long = AC.set_index('sample_unique_id').transpose().reset_index()
+    AC_long = AC_long.rename(columns={'index': 'Lab_ID_full', "2'FL": "2FL", "3'SL": "3SL", "6'SL": "6SL"})
+    AC_long.columns.name = None
+
+    # Lab IDs -> sample_unique_id via the volumes sheet
+    AC_volumes = AC_volumes.copy()
+    AC_volumes['Lab_ID_full'] = AC_volumes['Lab ID'].astype(str) + AC_volumes['Unnamed: 4'].astype(str)
+    AC_volumes['sample_unique_id'] = AC_volumes['Subject ID'].astype(str) + '_' + AC_volumes['Prepped'].astype(str)
+    AC_volumes = AC_volumes[['Lab_ID_full', 'sample_unique_id']]
+
+    AC_long = AC_long.merge(AC_volumes, on='Lab_ID_full', how='left')
+    cols = ['sample_unique_id'] + [col for col in AC_long.columns if col != 'sample_unique_id']
+    return AC_long[cols].drop(columns=['Lab_ID_full'])
+
+
+def build_linked(metadata, area_counts, volumes):
+    df = clean_linked_metadata(metadata)
+    store.write_table(df, LINKED_META)
+    merged_df = df.merge(load_linked_area_counts(area_counts, volumes), on='sample_unique_id', how='left')
+    store.write_table(merged_df, LINKED_MERGED)
+
+
+# ---- unlinked+linked.ipynb ----
+def combine_metadata():
+    unlinked = store.read_parquet(UNLINKED_MERGED)
+    linked = store.read_parquet(LINKED_META)
+
+    cols_to_drop = ["inj vol"] + AUC_HMO_COLUMNS + ['Secretor Status', 'secretorstatus_mom']
+    unlinked = unlinked.drop(columns=cols_to_drop, errors="ignore")
+    linked = linked.rename(columns={"Linked?": "Linked"})
+
+    merged_df = pd.concat([unlinked, linked], ignore_index=True, sort=False)
+
+    # remove twin samples
+    merged_df['is_twin'] = merged_df['sample_unique_id'].str.contains('/', na=False)
+    merged_df = merged_df[~merged_df['is_twin']].copy()
+
+    # PMA: CGA where recorded, otherwise GA at birth + DOL
+    merged_df = zscore.add_gestational_ages(merged_df)
+
+    # QC flags
+    merged_df['qc_ga_birth_implausible'] = (
+        (merged_df['GA_birth_weeks'] < 22) | (merged_df['GA_birth_weeks'] > 42)
+    )
+    merged_df['qc_pma_missing'] = merged_df['PMA_weeks'].isna()
+
+    # Milk information
+    merged_df['Type of Milk'] = merged_df['Type of Milk'].replace('MOM + DBM', 'MOM+DBM')
+    merged_df['Type of Milk'] = merged_df['Type of Milk'].replace('Switched to Fortifier ', 'Switched to Formula')
+    merged_df = merged_df[~merged_df['Type of Milk'].isin(['FBM/MBM'])]
+    merged_df["Infant Sex"] = merged_df["Infant Sex"].str.strip()
+
+    # INTERGROWTH z-scores, each row against the standard that applies to it
+    merged_df = zscore.add_routed_zscores(merged_df, reference.load())
+    return centiles.add_centiles(merged_df)
+
+
+def load_ac_report():
+    # unit blocks are located from the report headers (see neobank.acreport);
+    # a sample repeated by a later batch keeps its first results
+    long, samples = acreport.load()
+    return acreport.to_wide(long, acreport.first_reported(long, samples))
+
+
+def build_combined():
+    merged_df = combine_metadata()
+    store.write_table(merged_df, MERGED_DF)
+
+    merged_all = merged_df.merge(load_ac_report(), on="sample_unique_id", how="left")
+    merged_all.columns = merged_all.columns.str.strip()
+
+    # Fill missing Subject IDs from the sample_unique_id prefix
+    sid = (merged_all["Subject ID"]
+           .astype("string")
+           .str.strip()
+           .replace({"": pd.NA, "nan": pd.NA, "NaN": pd.NA, "None": pd.NA}))
+    sid_from_suid = (merged_all["sample_unique_id"]
+                     .astype("string")
+                     .str.extract(r"^([^_]+)")[0])
+    merged_all["Subject ID"] = sid.fillna(sid_from_suid)
+
+    status = secretor.classify(merged_all["2FL [nmol/mL]"], secretor.THRESHOLDS["nmol/mL"])
+    for sample in secretor.disagreements(merged_all, status, merged_all["secretor_status"])["sample_unique_id"]:
+        print(f"[combined] secretor call differs from the lab's for {sample}")
+    merged_all["moms_secretor_status"] = secretor.mom_status(merged_all, status)
+    store.write_table(merged_all, MERGED_ALL)
+
+
+def build_sqlite():
+    summary.refresh(log=print)
+    reports.export(db.build())
+
+
+STAGES = [
+    Stage(
+        name="reference",
+        func=reference.build,
+        inputs=list(reference.STANDARDS.values()),
+        outputs=[reference.LMS_ARTIFACT],
+    ),
+    Stage(
+        name="unlinked",
+        func=build_unlinked,
+        inputs=[UNLINKED_METADATA_XLSX, UNLINKED_SUBJECTS_XLSX, UNLINKED_AC_XLSX],
+        outputs=[UNLINKED_META, UNLINKED_MERGED, SECRETOR_CHECK],
+        reads={
+            "metadata": partial(pd.read_excel, UNLINKED_METADATA_XLSX),
+            "subjects": partial(pd.read_excel, UNLINKED_SUBJECTS_XLSX, sheet_name="Subject Metadata"),
+        },
+    ),
+    Stage(
+        name="linked",
+        func=build_linked,
+        inputs=[LINKED_SAMPLE_XLSX, LINKED_AC_XLSX],
+        outputs=[LINKED_META, LINKED_MERGED],
+        reads={
+            "metadata": partial(pd.read_excel, LINKED_SAMPLE_XLSX, sheet_name="Metadata"),
+            "area_counts": partial(pd.read_excel, LINKED_AC_XLSX),
+            "volumes": partial(pd.read_excel, LINKED_AC_XLSX, sheet_name="volumes"),
+        },
+    ),
+    Stage(
+        name="ac_report",
+        func=acreport.build,
+        inputs=acreport.AC_REPORTS,
+        outputs=[acreport.AC_LONG, acreport.AC_SAMPLES],
+    ),
+    Stage(
+        name="combined",
+        func=build_combined,
+        inputs=[UNLINKED_MERGED, LINKED_META, acreport.AC_LONG, acreport.AC_SAMPLES, reference.LMS_ARTIFACT],
+        outputs=[MERGED_DF, MERGED_ALL],
+    ),
+    Stage(
+        name="hmo_facts",
+        func=hmo.build,
+        inputs=[MERGED_ALL, UNLINKED_MERGED],
+        outputs=[hmo.HMO_FACTS, hmo.UNLINKED_HMO_FACTS],
+    ),
+    Stage(
+        name="cube",
+        func=cube.build,
+        inputs=[MERGED_ALL, UNLINKED_MERGED],
+        outputs=list(cube.PATHS.values()),
+    ),
+    Stage(
+        name="sqlite",
+        func=build_sqlite,
+        inputs=[MERGED_ALL, reference.LMS_ARTIFACT],
+        outputs=[db.DB_PATH, summary.SUMMARY] + [db.DB_PATH.parent / f"{name}.xlsx" for name in reports.EXCEL_EXPORTS],
+    ),
+]
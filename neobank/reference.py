@@ -0,0 +1,244 @@
+"""Compile the INTERGROWTH z-level tables into an LMS reference artifact.
+
+The files in ``INTERGROWTH/Zscores/Cleaned Zscore Files/`` publish each curve
+as the measurement at z = -3 ... +3 for every GA. The z-score engine needs
+L, M and S instead, so for every (standard, sex, measure, GA) row this module
+takes M as the published median and fits L and S by least squares in z
+units: for a candidate L, ``((value / M) ** L - 1) / L = S * z`` is linear
+in z. The fit is checked by re-scoring the published values; GAs inside
+gaps wider than ``MAX_GA_GAP_WEEKS`` between published points
+(``coverage_gaps``) are not interpolated and score as NaN. The result is
+written to one uncompressed ``.npz`` that loads in microseconds.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from neobank.data import ROOT
+from neobank.zscore import (
+    GAP_TOLERANCE,
+    MEASURES,
+    NEWBORN,
+    POSTNATAL_PRETERM,
+    SEXES,
+    VERY_PRETERM,
+    LMSIndex,
+    LMSReference,
+    measure_codes,
+    sex_codes,
+)
+
+ZSCORE_DIR = ROOT / "INTERGROWTH" / "Zscores" / "Cleaned Zscore Files"
+LMS_ARTIFACT = ROOT / "INTERGROWTH" / "intergrowth_lms.npz"
+
+# standard -> published z-level table
+STANDARDS = {
+    NEWBORN: ZSCORE_DIR / "International Newborn Size Standards.csv",
+    VERY_PRETERM: ZSCORE_DIR / "Very Preterm Zscores.csv",
+    POSTNATAL_PRETERM: ZSCORE_DIR / "MERGED Postnatal Growth of Preterm Infants ZScores.csv",
+}
+
+Z_LEVELS = np.arange(-3, 4, dtype=float)
+
+# Largest allowed miss, in z, when re-scoring the published z-levels.
+# Values are rounded to 2 decimals, which costs a few hundredths of a z at
+# the bottom of the weight curves. The newborn size standards come from a
+# skewed model that LMS cannot follow exactly in the +/-3 z tails (~0.15 z).
+MAX_ABS_DZ = {
+    NEWBORN: 0.2,
+    VERY_PRETERM: 0.1,
+    POSTNATAL_PRETERM: 0.1,
+}
+
+# Widest spacing of published GAs that is still interpolated. Some curves
+# are published at only a few GAs (very preterm female HC has two rows,
+# 9 weeks apart); ages inside a wider gap score as NaN instead of being
+# read off a straight line between the ends.
+MAX_GA_GAP_WEEKS = 1.0
+
+_L_COARSE = np.linspace(-3.0, 3.0, 601)
+
+
+def normalize_ga(table):
+    """Common measure names and fractional ``ga_weeks`` for a published table."""
+    table = table.copy()
+    table["measure"] = table["measure"].replace({"wt": "weight"})
+    if "ga_weeks_days" in table:
+        # "24+2" -> 24 2/7 weeks; ga_weeks only holds the whole week here
+        parts = table["ga_weeks_days"].str.split("+", expand=True).astype(float)
+        table["ga_weeks"] = parts[0] + parts[1] / 7.0
+    return table
+
+
+def read_zlevel_table(path):
+    """A published table as ``sex``/``measure``/``ga_weeks``/``z_level``/``value``."""
+    table = pd.read_csv(path)
+    table = normalize_ga(table)
+    return table[["sex", "measure", "ga_weeks", "z_level", "value"]]
+
+
+def _fit_rows(values):
+    """Fit L and S for each row of a (rows, 7) matrix of z-level values."""
+    mid = int(np.flatnonzero(Z_LEVELS == 0)[0])
+    M = values[:, mid]
+    ratio = values / M[:, None]
+    zz = Z_LEVELS @ Z_LEVELS
+
+    def solve(L_grid):
+        # L_grid: (k,) shared or (k, rows) per-row candidates
+        grid = L_grid[:, None] if L_grid.ndim == 1 else L_grid
+        grid = np.broadcast_to(grid, (grid.shape[0], values.shape[0]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            y = np.where(
+                np.isclose(grid, 0.0)[..., None],
+                np.log(ratio)[None],
+                (ratio[None] ** grid[..., None] - 1) / grid[..., None],
+            )
+        S = (y @ Z_LEVELS) / zz
+        resid = y / S[..., None] - Z_LEVELS
+        sse = np.nansum(resid ** 2, axis=-1)
+        best = np.argmin(sse, axis=0)
+        pick = np.arange(values.shape[0])
+        return grid[best, pick], S[best, pick], np.abs(resid[best, pick]).max(axis=-1)
+
+    L, _, _ = solve(_L_COARSE)
+    step = _L_COARSE[1] - _L_COARSE[0]
+    fine = L[None, :] + np.linspace(-step, step, 201)[:, None]
+    L, S, max_dz = solve(fine)
+    return L, M, S, max_dz
+
+
+def fit_lms(table):
+    """Fit one published table; returns a frame with L/M/S and the fit error."""
+    wide = table.pivot_table(
+        index=["sex", "measure", "ga_weeks"], columns="z_level", values="value"
+    )
+    wide = wide.reindex(columns=Z_LEVELS).dropna()
+    L, M, S, max_dz = _fit_rows(wide.to_numpy(dtype=float))
+    out = wide.index.to_frame(index=False)
+    out["L"], out["M"], out["S"], out["max_abs_dz"] = L, M, S, max_dz
+    return out
+
+
+def compile_reference():
+    """Fit every standard into one long frame with a ``standard`` column."""
+    frames = []
+    for standard, path in STANDARDS.items():
+        fitted = fit_lms(read_zlevel_table(path))
+        fitted.insert(0, "standard", standard)
+        frames.append(fitted)
+    ref = pd.concat(frames, ignore_index=True)
+
+    excess = ref["max_abs_dz"] - ref["standard"].map(MAX_ABS_DZ)
+    worst = ref.loc[excess.idxmax()]
+    if excess.max() > 0:
+        raise ValueError(
+            f"LMS fit misses the published z-levels by {worst['max_abs_dz']:.3f} z for "
+            f"{worst['standard']}/{worst['sex']}/{worst['measure']} at {worst['ga_weeks']:.2f} weeks"
+        )
+    return ref
+
+
+def coverage_gaps(ref, max_gap=MAX_GA_GAP_WEEKS):
+    """Published points followed by a gap wider than ``max_gap`` in their curve."""
+    ref = ref.sort_values(["standard", "sex", "measure", "ga_weeks"])
+    gap = ref.groupby(["standard", "sex", "measure"])["ga_weeks"].diff(-1).abs()
+    return ref.assign(gap_weeks=gap)[gap > max_gap + GAP_TOLERANCE].reset_index(drop=True)
+
+
+def write_artifact(ref, path=LMS_ARTIFACT):
+    standards = list(STANDARDS)
+    np.savez(
+        path,
+        standards=np.array(standards),
+        standard=ref["standard"].map(standards.index).to_numpy(dtype=np.int8),
+        sex=sex_codes(ref["sex"].to_numpy()).astype(np.int8),
+        measure=measure_codes(ref["measure"].to_numpy()).astype(np.int8),
+        ga_weeks=ref["ga_weeks"].to_numpy(dtype=float),
+        L=ref["L"].to_numpy(dtype=float),
+        M=ref["M"].to_numpy(dtype=float),
+        S=ref["S"].to_numpy(dtype=float),
+        max_abs_dz=ref["max_abs_dz"].to_numpy(dtype=float),
+    )
+
+
+def build():
+    write_artifact(compile_reference())
+
+
+def read_artifact(path=LMS_ARTIFACT):
+    """The artifact back as a long frame (for inspection and SQL export)."""
+    with np.load(path) as npz:
+        standards = npz["standards"]
+        return pd.DataFrame({
+            "standard": standards[npz["standard"]],
+            "sex": np.array(SEXES)[npz["sex"]],
+            "measure": np.array(MEASURES)[npz["measure"]],
+            "ga_weeks": npz["ga_weeks"],
+            "L": npz["L"],
+            "M": npz["M"],
+            "S": npz["S"],
+            "max_abs_dz": npz["max_abs_dz"],
+        })
+
+
+@lru_cache(maxsize=None)
+def _load(path, stamp):
+    with np.load(path) as npz:
+        standards = [str(s) for s in npz["standards"]]
+        arrays = {k: npz[k] for k in ("standard", "sex", "measure", "ga_weeks", "L", "M", "S")}
+
+    refs = {None: LMSReference.from_arrays(
+        arrays["sex"], arrays["measure"], arrays["ga_weeks"],
+        arrays["L"], arrays["M"], arrays["S"],
+        arrays["standard"], standards, MAX_GA_GAP_WEEKS,
+    )}
+    for code, standard in enumerate(standards):
+        rows = arrays["standard"] == code
+        refs[standard] = LMSReference.from_arrays(
+            arrays["sex"][rows], arrays["measure"][rows], arrays["ga_weeks"][rows],
+            arrays["L"][rows], arrays["M"][rows], arrays["S"][rows],
+            standards=[standard], max_gap=MAX_GA_GAP_WEEKS,
+        )
+    return refs
+
+
+def load(standard=None, path=LMS_ARTIFACT):
+    """Compiled ``LMSReference`` for one standard, or for all of them by default."""
+    stat = path.stat()
+    return _load(path, (stat.st_mtime_ns, stat.st_size))[standard]
+
+
+def growth_refs(path=LMS_ARTIFACT):
+    """L, M, S per (standard, sex, measure, GA day): the ``growth_refs`` SQL table.
+
+    Rows are the daily steps of ``load_index`` that fall inside each curve,
+    so linear interpolation between neighbouring days reproduces
+    ``LMSReference.interpolate``.
+    """
+    index = load_index(step_days=1, path=path)
+    group, step = np.nonzero(~np.isnan(index.table[..., 1]))
+    per_standard = len(SEXES) * len(MEASURES)
+    ga_day = step + index.first
+    return pd.DataFrame({
+        "standard": np.array(index.ref.standards)[group // per_standard],
+        "sex": np.array(SEXES)[(group // len(MEASURES)) % len(SEXES)],
+        "measure": np.array(MEASURES)[group % len(MEASURES)],
+        "ga_day": ga_day,
+        "ga_weeks": ga_day / 7.0,
+        "L": index.table[group, step, 0],
+        "M": index.table[group, step, 1],
+        "S": index.table[group, step, 2],
+    })
+
+
+@lru_cache(maxsize=None)
+def _load_index(path, stamp, standard, step_days):
+    return LMSIndex(_load(path, stamp)[standard], step_days)
+
+
+def load_index(standard=None, step_days=1, path=LMS_ARTIFACT):
+    """Dense ``LMSIndex`` for point lookups by GA day (or week with ``step_days=7``)."""
+    stat = path.stat()
+    return _load_index(path, (stat.st_mtime_ns, stat.st_size), standard, step_days)
@@ -0,0 +1,135 @@
+"""Cohort summary reports, run inside the SQLite database.
+
+These are the ``test.sql`` / ``sqldata.ipynb`` analytics ported from
+Postgres to SQLite: ``DISTINCT ON`` becomes a ``ROW_NUMBER()`` window and
+``::int`` a ``CAST(ROUND(...))``. They read the ``Subjects`` and ``Milk``
+tables of ``neobank.db`` and are materialized as tables of the same
+database by ``materialize``, which ``db.build`` runs in the same
+transaction that writes the data, so the reports never lag behind it.
+Pages read them with ``db.report(name)``.
+
+The MBM/MOM query keys on the cleaned ``Type of Milk`` values (``MOM``,
+``MOM+DBM``) rather than the raw ``MBM`` spellings.
+"""
+import sqlite3
+
+import pandas as pd
+
+# GA at birth is CGA - DOL/7 with whole-week DOL (integer division, as in
+# Postgres), rounded to the nearest week
+SUBJECT_SUMMARY = """
+WITH birth_calc AS (
+    SELECT
+        "Subject ID",
+        MIN(CAST(ROUND("CGA" - ("DOL" / 7)) AS INTEGER)) AS ga_at_birth_weeks,
+        CAST(ROUND(MIN("CGA")) AS INTEGER) AS cga_first_sample
+    FROM Subjects
+    WHERE "DOL" IS NOT NULL AND "Subject ID" IS NOT NULL
+    GROUP BY "Subject ID"
+),
+duration AS (
+    SELECT
+        "Subject ID",
+        MIN("DOL") AS first_dol,
+        MAX("DOL") AS last_dol,
+        MAX("DOL") - MIN("DOL") AS length_of_days
+    FROM Subjects
+    GROUP BY "Subject ID"
+),
+first_mbm AS (
+    SELECT
+        "Subject ID",
+        MIN("DOL") AS first_mbm_day
+    FROM Milk
+    WHERE "Type of Milk" LIKE 'MOM%'
+    GROUP BY "Subject ID"
+)
+SELECT
+    b."Subject ID",
+    b.ga_at_birth_weeks,
+    b.cga_first_sample,
+    b.cga_first_sample - b.ga_at_birth_weeks AS time_between_birth_and_first_sample_weeks,
+    d.first_dol,
+    d.last_dol,
+    d.length_of_days,
+    COALESCE(CAST(f.first_mbm_day AS TEXT), 'Did not receive MOM') AS first_mbm_day,
+    f.first_mbm_day - d.first_dol AS time_to_mom_days
+FROM birth_calc b
+JOIN duration d ON b."Subject ID" = d."Subject ID"
+LEFT JOIN first_mbm f ON b."Subject ID" = f."Subject ID"
+ORDER BY b.ga_at_birth_weeks, b."Subject ID"
+"""
+
+TPN_USE = """
+SELECT
+    "Subject ID",
+    MIN("DOL") AS first_tpn_dol,
+    MAX("DOL") AS last_tpn_dol,
+    MAX("DOL") - MIN("DOL") AS tpn_duration_days,
+    MIN("CGA") AS first_tpn_cga,
+    MAX("CGA") AS last_tpn_cga,
+    MAX("CGA") - MIN("CGA") AS tpn_duration_weeks
+FROM Milk
+WHERE "TPN" = 'Y'
+GROUP BY "Subject ID"
+ORDER BY tpn_duration_days DESC, "Subject ID"
+"""
+
+# first and last measured sample per subject, in DOL order
+GROWTH_CHANGE = """
+WITH ordered AS (
+    SELECT
+        "Subject ID", "DOL", "Current Weight", "Current Height", "Current HC",
+        ROW_NUMBER() OVER (PARTITION BY "Subject ID" ORDER BY "DOL" ASC, rowid) AS from_first,
+        ROW_NUMBER() OVER (PARTITION BY "Subject ID" ORDER BY "DOL" DESC, rowid) AS from_last
+    FROM Subjects
+    WHERE "DOL" IS NOT NULL AND "Subject ID" IS NOT NULL
+),
+first_vals AS (SELECT * FROM ordered WHERE from_first = 1),
+last_vals AS (SELECT * FROM ordered WHERE from_last = 1)
+SELECT
+    f."Subject ID",
+    f."DOL" AS first_dol,
+    l."DOL" AS last_dol,
+    f."Current Weight" AS weight_first,
+    l."Current Weight" AS weight_last,
+    l."Current Weight" - f."Current Weight" AS weight_gain,
+    f."Current Height" AS height_first,
+    l."Current Height" AS height_last,
+    l."Current Height" - f."Current Height" AS height_gain,
+    f."Current HC" AS hc_first,
+    l."Current HC" AS hc_last,
+    l."Current HC" - f."Current HC" AS hc_gain
+FROM first_vals f
+JOIN last_vals l ON f."Subject ID" = l."Subject ID"
+ORDER BY weight_gain DESC, f."Subject ID"
+"""
+
+REPORTS = {
+    "subject_summary": SUBJECT_SUMMARY,
+    "tpn_use": TPN_USE,
+    "growth_change": GROWTH_CHANGE,
+}
+
+# tables saved as workbooks next to the database: the reports the notebook
+# used to save by hand, and the neobank.trajectory growth features
+EXCEL_EXPORTS = ["subject_summary", "tpn_use", "growth_features"]
+
+
+def materialize(con, names=None):
+    """(Re)create the report tables on the open connection ``con``."""
+    for name in names or REPORTS:
+        con.execute(f'DROP TABLE IF EXISTS "{name}"')
+        con.execute(f'CREATE TABLE "{name}" AS {REPORTS[name]}')
+
+
+def export(db_path, directory=None):
+    """Write the ``EXCEL_EXPORTS`` tables as workbooks next to the database."""
+    directory = directory or db_path.parent
+    con = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for name in EXCEL_EXPORTS:
+            pd.read_sql_query(f'SELECT * FROM "{name}"', con).to_excel(directory / f"{name}.xlsx", index=False)
+    finally:
+        con.close()
+    return [directory / f"{name}.xlsx" for name in EXCEL_EXPORTS]
@@ -0,0 +1,78 @@
+"""Column dtypes shared by every cleaned table.
+
+The coded metadata columns are stored as pandas categoricals with a fixed
+vocabulary, so filters, ``value_counts`` and groupbys on the pages compare
+small integer codes instead of hashing strings. ``Subject ID`` is
+categorical too; its categories are the sorted IDs present in the table.
+``DOL``, ``CGA`` and ``Aliquots_num`` use nullable numeric dtypes so a
+missing value does not turn the counts into floats.
+
+``apply`` is run when a table is written to the Parquet store (the dtypes
+are kept in the file) and again when it is loaded, so workbooks read
+without a Parquet twin get the same dtypes.
+
+A value outside a column's vocabulary is kept, as an extra category after
+the known ones; ``normalize.unmapped`` is what reports it. Because the
+vocabulary is fixed, ``value_counts`` lists unused categories with a count
+of 0, and groupbys should pass ``observed=True``.
+"""
+import pandas as pd
+
+YES_NO = ["Y", "N"]
+
+CATEGORIES = {
+    "Type of Milk": ["MOM", "DBM", "MOM+DBM", "MOM + DBM", "Switched to Formula", "FBM/MBM"],
+    "Sample Source": ["Scavenged", "Prepped in Milk Room", "Other"],
+    "HMF": YES_NO + ["Nutramigen", "Y+Nutramigen", "Y + Nutramigen", "N+Nutramigen"],
+    "TPN": YES_NO,
+    "Iron": YES_NO,
+    "Infant Sex": ["Female", "Male"],
+    "Linked": YES_NO,
+    "Secretor Status": ["Secretor", "Non-Secretor"],
+    "moms_secretor_status": ["Secretor", "Non-Secretor"],
+    "Scavenged or Fresh": ["Scavenged", "Fresh"],
+    "Scavenged/Fresh?": ["Scavenged", "Fresh"],
+}
+# categorical columns whose categories come from the data
+OPEN_CATEGORIES = ["Subject ID"]
+
+NUMERIC = {
+    "DOL": "Int64",
+    "CGA": "Float64",
+    "Aliquots_num": "Int64",
+}
+
+
+def categorical(values, vocabulary=None):
+    """``values`` as a categorical over ``vocabulary`` plus any unseen values."""
+    if isinstance(values.dtype, pd.CategoricalDtype) and vocabulary is None:
+        return values
+    seen = pd.Series(values.dropna().unique(), dtype=object)
+    known = list(vocabulary or [])
+    extra = sorted(seen[~seen.isin(known)], key=str)
+    return values.astype(object).astype(pd.CategoricalDtype(known + extra))
+
+
+def numeric(values, dtype):
+    values = pd.to_numeric(values, errors="coerce")
+    if dtype == "Int64":
+        whole = values.dropna()
+        # a fractional DOL stays a float rather than being truncated
+        if not (whole == whole.round()).all():
+            return values.astype("Float64")
+    return values.astype(dtype)
+
+
+def apply(df):
+    """``df`` with the schema dtypes for whichever of its columns it covers."""
+    out = df.copy()
+    for col, vocabulary in CATEGORIES.items():
+        if col in out:
+            out[col] = categorical(out[col], vocabulary)
+    for col in OPEN_CATEGORIES:
+        if col in out:
+            out[col] = categorical(out[col])
+    for col, dtype in NUMERIC.items():
+        if col in out:
+            out[col] = numeric(out[col], dtype)
+    return out
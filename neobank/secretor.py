@@ -0,0 +1,91 @@
+"""Secretor-status classification and the per-subject check table.
+
+A sample is called Secretor when its 2'FL reaches a threshold, which
+depends on how 2'FL was measured:
+
+* ``auc`` - area count of the unlinked LC-MS export (``2FL``)
+* ``nmol/mL`` - absolute concentration of the AC reports (``2FL [nmol/mL]``)
+
+The AC-report threshold sits in the gap between the lab's own calls
+(non-secretors up to ~611 nmol/mL, secretors from ~1184 nmol/mL), so the
+classifier and the ``Secretor`` column of the reports agree; ``disagreements``
+lists the samples where they do not.
+
+``check_table`` replaces the hand-maintained ``Secretor_status_check.xlsx``:
+for every subject that received MOM, the status of the first MOM sample
+(in sample ID order) and whether the status changed between MOM samples,
+in a single groupby. The unlinked pipeline stage writes it to Cleaned Data.
+"""
+import numpy as np
+import pandas as pd
+
+from neobank import data, store
+
+SECRETOR = "Secretor"
+NON_SECRETOR = "Non-Secretor"
+LABELS = [SECRETOR, NON_SECRETOR]
+NO_MOM = "No MOM"
+CHANGED, NO_CHANGE = "Changed", "No Change"
+
+THRESHOLDS = {
+    "auc": 0.5,
+    "nmol/mL": 1000.0,
+}
+
+SUBJECT_COL = "Subject ID"
+SAMPLE_COL = "sample_unique_id"
+MILK_COL = "Type of Milk"
+MOM = "MOM"
+
+CHECK_COLUMNS = [SUBJECT_COL, "secretorstatus_mom", "Change Flag"]
+
+
+def classify(values, threshold):
+    """Secretor / Non-Secretor per 2'FL value (missing stays missing)."""
+    values = pd.to_numeric(values, errors="coerce")
+    labels = np.where(values.to_numpy(dtype=float) >= threshold, SECRETOR, NON_SECRETOR)
+    return pd.Series(pd.Categorical(labels, categories=LABELS), index=values.index).where(values.notna())
+
+
+def from_calls(calls):
+    """The lab's 1/0 ``Secretor`` calls as labels."""
+    return pd.to_numeric(calls, errors="coerce").map({1: SECRETOR, 0: NON_SECRETOR}).astype(
+        pd.CategoricalDtype(LABELS)
+    )
+
+
+def disagreements(df, status, calls):
+    """Rows of ``df`` where ``status`` and the lab's ``calls`` are both set and differ."""
+    lab = from_calls(calls)
+    ours = status.astype(pd.CategoricalDtype(LABELS))
+    return df[ours.notna() & lab.notna() & (ours.astype(object) != lab.astype(object))]
+
+
+def mom_status(df, status):
+    """``status`` on MOM samples, missing elsewhere."""
+    return status.where(df[MILK_COL] == MOM)
+
+
+def check_table(df, status_col="Secretor Status"):
+    """First-MOM status and change flag for every subject that received MOM."""
+    mom = df.loc[(df[MILK_COL] == MOM) & df[SUBJECT_COL].notna(), [SUBJECT_COL, SAMPLE_COL, status_col]]
+    mom = mom.assign(**{SUBJECT_COL: mom[SUBJECT_COL].astype(str)}).sort_values(SAMPLE_COL, kind="stable")
+    per_subject = mom.groupby(SUBJECT_COL, sort=True)[status_col].agg(["first", "nunique"])
+    return pd.DataFrame({
+        SUBJECT_COL: per_subject.index,
+        "secretorstatus_mom": per_subject["first"].to_numpy(),
+        "Change Flag": np.where(per_subject["nunique"].to_numpy() > 1, CHANGED, NO_CHANGE),
+    })
+
+
+def first_mom(df, status_col="Secretor Status"):
+    """Status of each row's subject's first MOM sample, ``No MOM`` if none."""
+    table = check_table(df, status_col).set_index(SUBJECT_COL)["secretorstatus_mom"]
+    return df[SUBJECT_COL].astype(str).map(table).fillna(NO_MOM)
+
+
+def load_check(path=data.SECRETOR_CHECK):
+    """The secretor check table the unlinked pipeline stage writes (read-only)."""
+    if not store.parquet_path(path).exists():
+        raise FileNotFoundError(f"{path.name} has not been built; {store.RUN_PIPELINE}")
+    return data.read_table(path)
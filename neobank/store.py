@@ -0,0 +1,121 @@
+"""Columnar (Parquet) serving store for the cleaned tables.
+
+The cleaning notebooks write every cleaned table twice: the Excel workbook
+people open by hand, and a typed Parquet file next to it that the dashboard
+reads. Parquet lets a page pull only the columns it needs, e.g. the 15
+``[nmol/mL]`` HMO columns for the heatmap, instead of parsing all ~90
+columns of ``merged_ALL.xlsx``. The Parquet file keeps the categorical and
+nullable dtypes from ``neobank.schema``.
+
+``write_batches`` and ``iter_parquet`` stream a table through Parquet one
+row group at a time, for stores that grow by appending.
+
+Files the pipeline derives from a cleaned table (HMO facts, count cubes)
+are written with ``write_derived``, which records the source's content
+digest in the Parquet metadata. ``read_derived`` refuses a file built from
+another version of its source, so pages never serve facts that do not line
+up with the table next to them and never rebuild them during a request.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from neobank import schema
+
+RUN_PIPELINE = "run the pipeline (python -m neobank.pipeline)"
+SOURCE_KEY = b"neobank.source_digest"
+
+
+class OutOfDateError(RuntimeError):
+    """A derived file was built from another version of its source table."""
+
+
+def parquet_path(path):
+    """Return the Parquet path that sits next to an Excel output."""
+    return Path(path).with_suffix(".parquet")
+
+
+def _arrow_safe(df):
+    # Excel hands back object columns that mix strings, numbers and
+    # datetimes (e.g. "feeding time"); Arrow needs one type per column
+    out = df.copy()
+    for col in out.columns:
+        if out[col].dtype != object:
+            continue
+        values = out[col].dropna()
+        if values.map(type).nunique() > 1:
+            out[col] = out[col].map(lambda v: v if pd.isna(v) else str(v))
+        out[col] = out[col].astype("string")
+    return out
+
+
+def write_parquet(df, path):
+    path = parquet_path(path)
+    _arrow_safe(schema.apply(df)).to_parquet(path, index=False)
+    return path
+
+
+def write_table(df, path):
+    """Write the Excel export and its Parquet twin."""
+    df.to_excel(path, index=False)
+    return write_parquet(df, path)
+
+
+def read_parquet(path, columns=None):
+    """Read the Parquet twin of ``path``, optionally projecting ``columns``."""
+    return pd.read_parquet(parquet_path(path), columns=columns)
+
+
+def iter_parquet(path, batch_rows=65536, columns=None):
+    """Yield a Parquet file as DataFrames of at most ``batch_rows`` rows."""
+    with pq.ParquetFile(path) as f:
+        for batch in f.iter_batches(batch_size=batch_rows, columns=columns):
+            yield batch.to_pandas()
+
+
+def write_batches(frames, path, schema):
+    """Stream DataFrames into the Parquet file ``path`` as row groups of ``schema``.
+
+    The file is written alongside and swapped in at the end, so ``frames``
+    may stream from the file it replaces.
+    """
+    path = Path(path)
+    tmp = path.with_suffix(".tmp")
+    with pq.ParquetWriter(tmp, schema) as writer:
+        for frame in frames:
+            if len(frame):
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+    os.replace(tmp, path)
+    return path
+
+
+def write_derived(df, path, source_digest):
+    """Write ``df`` to the Parquet file ``path``, recording the digest of its source."""
+    path = Path(path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[SOURCE_KEY] = source_digest.encode()
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(table.replace_schema_metadata(metadata), tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def derived_from(path):
+    """The source digest ``write_derived`` recorded in ``path``, or None."""
+    metadata = pq.read_schema(path).metadata or {}
+    value = metadata.get(SOURCE_KEY)
+    return value.decode() if value is not None else None
+
+
+def read_derived(path, source, source_digest):
+    """Read ``path`` if it was derived from the ``source`` table with ``source_digest``."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"{path.name} has not been built; {RUN_PIPELINE}")
+    if derived_from(path) != source_digest:
+        raise OutOfDateError(f"{path.name} is out of date with {Path(source).name}; {RUN_PIPELINE}")
+    return pd.read_parquet(path)
@@ -0,0 +1,77 @@
+"""Subject-indexed view of a sample table.
+
+The table is sorted once by (Subject ID, DOL) and the start offset of every
+subject recorded, so a subject's samples are a positional slice rather than
+a boolean mask over the whole cohort. Sample counts and the longitudinal
+subject lists the pages filter on are computed at build time.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from neobank import data
+
+SUBJECT_COL = "Subject ID"
+DOL_COL = "DOL"
+
+# minimum timepoints for the "longitudinal" selectors (> 3 and >= 3)
+LONGITUDINAL_MIN = (4, 3)
+
+
+class SubjectIndex:
+    def __init__(self, df, subject_col=SUBJECT_COL, order_col=DOL_COL):
+        codes, _ = pd.factorize(df[subject_col], sort=True)
+        order = pd.to_numeric(df[order_col], errors="coerce").to_numpy(dtype=float)
+        # row positions (whatever df's index), stable on ties, missing DOL last
+        rows = np.lexsort((order, codes))
+        # rows without a Subject ID cannot be selected, leave them out
+        rows = rows[codes[rows] >= 0]
+        self.frame = df.iloc[rows].reset_index(drop=True)
+
+        ids = self.frame[subject_col].to_numpy()
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+        self.subjects = ids[starts].tolist()
+        self.offsets = np.r_[starts, len(ids)]
+        self._position = {s: i for i, s in enumerate(self.subjects)}
+
+        self.counts = pd.Series(np.diff(self.offsets), index=pd.Index(self.subjects, name=subject_col), name="count")
+        self._longitudinal = {n: self.counts.index[self.counts >= n].tolist() for n in LONGITUDINAL_MIN}
+
+    def __len__(self):
+        return len(self.subjects)
+
+    def __contains__(self, subject):
+        return subject in self._position
+
+    def slice(self, subject, columns=None):
+        """The subject's samples in DOL order (empty if the subject is unknown)."""
+        frame = self.frame if columns is None else self.frame[columns]
+        i = self._position.get(subject)
+        if i is None:
+            return frame.iloc[0:0]
+        return frame.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+    def longitudinal(self, min_timepoints):
+        """Subject IDs (sorted) with at least ``min_timepoints`` samples."""
+        if min_timepoints not in self._longitudinal:
+            self._longitudinal[min_timepoints] = self.counts.index[self.counts >= min_timepoints].tolist()
+        return self._longitudinal[min_timepoints]
+
+
+@lru_cache(maxsize=8)
+def _index(path, version):
+    return SubjectIndex(data.read_table(path))
+
+
+def index_for(path):
+    """Cached SubjectIndex of a cleaned table, rebuilt when the table changes."""
+    return _index(path, data.version(path))
+
+
+def combined_index():
+    return index_for(data.MERGED_ALL)
+
+
+def unlinked_index():
+    return index_for(data.UNLINKED_MERGED)
@@ -0,0 +1,104 @@
+"""Materialized per-subject summary (``subject_summary.parquet``).
+
+One row per subject with the ``reports.SUBJECT_SUMMARY`` columns: GA at
+birth, first/last DOL, length of stay, first MOM day and time to MOM.
+Each row also stores a digest of the subject's input rows (``DOL``,
+``CGA``, ``Type of Milk``). ``refresh`` compares those digests with the
+current cohort table and re-runs the summary SQL only for subjects that
+are new or whose rows changed, keeps the other rows as they are and drops
+subjects that are gone.
+
+``db.build`` refreshes it and loads it into the database, so the pipeline
+keeps it current. Pages look subjects up with ``lookup``.
+"""
+import sqlite3
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from neobank import data, reports, store
+from neobank.data import CLEANED_DIR
+
+SUMMARY = CLEANED_DIR / "subject_summary.parquet"
+SUBJECT_COL = "Subject ID"
+INPUT_COLUMNS = ["DOL", "CGA", "Type of Milk"]
+DIGEST_COL = "rows_digest"
+
+
+def subject_digests(cohort):
+    """Order-independent digest of each subject's ``INPUT_COLUMNS`` rows."""
+    rows = cohort[cohort[SUBJECT_COL].notna()]
+    hashes = pd.util.hash_pandas_object(rows[INPUT_COLUMNS].astype(object), index=False)
+    # sum of the row hashes (mod 2**64) mixed with the row count, so the
+    # digest does not depend on row order
+    parts = hashes.groupby(rows[SUBJECT_COL].astype(str).to_numpy()).agg(["sum", "size"])
+    digest = parts["sum"].to_numpy(dtype=np.uint64) ^ parts["size"].to_numpy(dtype=np.uint64)
+    return pd.Series(digest, index=parts.index, name=DIGEST_COL)
+
+
+def compute(cohort):
+    """``reports.SUBJECT_SUMMARY`` for the subjects in ``cohort``."""
+    from neobank import db  # db imports this module
+
+    con = sqlite3.connect(":memory:")
+    try:
+        # only the tables the summary SQL reads, not the whole database
+        for name, table in db.column_tables(cohort, ("Subjects", "Milk")).items():
+            table.to_sql(name, con, index=False)
+        return pd.read_sql_query(reports.SUBJECT_SUMMARY, con)
+    finally:
+        con.close()
+
+
+def _sort(summary):
+    # the order reports.SUBJECT_SUMMARY returns
+    return summary.sort_values(["ga_at_birth_weeks", SUBJECT_COL], kind="stable").reset_index(drop=True)
+
+
+def refresh(cohort=None, path=SUMMARY, log=None):
+    """Bring ``path`` in line with ``cohort``, recomputing changed subjects only."""
+    cohort = store.read_parquet(data.MERGED_ALL) if cohort is None else cohort
+    current = subject_digests(cohort)
+
+    old = pd.read_parquet(path) if path.exists() else None
+    if old is not None and DIGEST_COL in old:
+        stored = old.set_index(SUBJECT_COL)[DIGEST_COL]
+        same = current.index.isin(stored.index)
+        same[same] = stored.reindex(current.index[same]).to_numpy(dtype=np.uint64) == current[same].to_numpy()
+        changed = current.index[~same]
+        kept = old[old[SUBJECT_COL].isin(current.index[same])]
+    else:
+        changed = current.index
+        kept = None
+
+    if log:
+        log(f"[subject_summary] {len(changed)} of {len(current)} subjects recomputed")
+    if kept is not None and not len(changed) and len(kept) == len(old):
+        return old
+
+    fresh = compute(cohort[cohort[SUBJECT_COL].astype(str).isin(changed)]) if len(changed) else None
+    if fresh is not None:
+        fresh[DIGEST_COL] = current.reindex(fresh[SUBJECT_COL].astype(str)).to_numpy(dtype=np.uint64)
+    parts = [p for p in (kept, fresh) if p is not None and len(p)]
+    summary = _sort(pd.concat(parts, ignore_index=True)) if parts else compute(cohort.iloc[0:0])
+    summary.to_parquet(path, index=False)
+    return summary
+
+
+@lru_cache(maxsize=4)
+def _indexed(path, version):
+    return pd.read_parquet(path).drop(columns=DIGEST_COL, errors="ignore").set_index(SUBJECT_COL)
+
+
+def load(path=SUMMARY):
+    """The summary the pipeline keeps, indexed by Subject ID (shared, treat as read-only)."""
+    if not path.exists():
+        raise FileNotFoundError(f"{path.name} has not been built; {store.RUN_PIPELINE}")
+    return _indexed(path, data.version(path))
+
+
+def lookup(subject, path=SUMMARY):
+    """The summary row of ``subject`` as a Series, or None."""
+    table = load(path)
+    return table.loc[subject] if subject in table.index else None
@@ -0,0 +1,202 @@
+"""Per-subject growth trajectory features.
+
+Everything is computed from the cohort sorted by (Subject ID, DOL):
+velocities between consecutive samples come from shifted arrays, and the
+first-to-last features for every subject from a single ``groupby().agg``.
+The pipeline stores the subject features as the ``growth_features`` table
+of ``neobank.db``, which the cohort page reads one subject at a time and
+which is exported next to the database, so pages and exports share one
+computation. ``cohort_features`` computes them in-process (for notebooks),
+cached against the table's version.
+
+A z-score change needs two measured samples; with fewer it is NaN, and
+flags whose input is NaN are NA rather than False.
+
+Weight velocity is reported in g/kg/day by the exponential method,
+``1000 * ln(W2 / W1) / dt``, and by the average-weight method,
+``(W2 - W1) / ((W1 + W2) / 2 / 1000) / dt``. Length and HC velocity are
+cm/week.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from neobank import data
+
+SUBJECT_COL = "Subject ID"
+DOL_COL = "DOL"
+
+GROWTH_COLUMNS = {
+    "weight": "Current Weight",
+    "length": "Current Height",
+    "hc": "Current HC",
+}
+Z_COLUMNS = {
+    "weight": "z_weight_for_age",
+    "length": "z_length_for_age",
+    "hc": "z_hc_for_age",
+}
+
+# growth faltering: weight z falls by more than 1 SD, or weight gain
+# below 15 g/kg/day over the observed stay
+FALTERING_DELTA_Z = -1.0
+SLOW_WEIGHT_GAIN = 15.0
+
+# DOL stride for subject-composite search keys (any value above the
+# longest stay keeps subjects apart)
+DOL_STRIDE = 100_000.0
+
+
+def prepare(df):
+    """The subject time series: numeric, without missing IDs/DOL, sorted."""
+    cols = [SUBJECT_COL, DOL_COL] + list(GROWTH_COLUMNS.values())
+    cols += [c for c in Z_COLUMNS.values() if c in df]
+    ts = df[cols].copy()
+    for col in cols[1:]:
+        ts[col] = pd.to_numeric(ts[col], errors="coerce").astype(float)
+    ts = ts.dropna(subset=[SUBJECT_COL, DOL_COL])
+    return ts.sort_values([SUBJECT_COL, DOL_COL], kind="stable").reset_index(drop=True)
+
+
+def weight_velocity_exp(w1, w2, days):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(days > 0, 1000.0 * np.log(w2 / w1) / days, np.nan)
+
+
+def weight_velocity_avg(w1, w2, days):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(days > 0, (w2 - w1) / ((w1 + w2) / 2.0 / 1000.0) / days, np.nan)
+
+
+def cm_per_week(x1, x2, days):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(days > 0, (x2 - x1) / (days / 7.0), np.nan)
+
+
+def interval_features(ts):
+    """Velocities between each sample and the subject's previous sample."""
+    same = ts[SUBJECT_COL].eq(ts[SUBJECT_COL].shift()).to_numpy(dtype=bool, na_value=False)
+    dol = ts[DOL_COL].to_numpy(dtype=float)
+    days = np.where(same, dol - np.roll(dol, 1), np.nan)
+
+    def prev(col):
+        v = ts[col].to_numpy(dtype=float)
+        return np.where(same, np.roll(v, 1), np.nan)
+
+    w = ts[GROWTH_COLUMNS["weight"]].to_numpy(dtype=float)
+    out = ts[[SUBJECT_COL, DOL_COL]].copy()
+    out["interval_days"] = days
+    out["weight_velocity_exp"] = weight_velocity_exp(prev(GROWTH_COLUMNS["weight"]), w, days)
+    out["weight_velocity_avg"] = weight_velocity_avg(prev(GROWTH_COLUMNS["weight"]), w, days)
+    for measure in ("length", "hc"):
+        col = GROWTH_COLUMNS[measure]
+        out[f"{measure}_velocity_cm_wk"] = cm_per_week(prev(col), ts[col].to_numpy(dtype=float), days)
+    return out
+
+
+def subject_features(ts):
+    """First-to-last growth features for every subject, one groupby pass."""
+    work = ts.copy()
+    aggs = {"n_samples": (DOL_COL, "size"), "first_dol": (DOL_COL, "first"), "last_dol": (DOL_COL, "last")}
+    for measure, col in list(GROWTH_COLUMNS.items()) + [(f"z_{m}", c) for m, c in Z_COLUMNS.items()]:
+        if col not in work:
+            continue
+        # DOL of the rows where this measure was recorded, so first/last
+        # (which skip NaN) pick matching values and days
+        work[f"_dol_{measure}"] = work[DOL_COL].where(work[col].notna())
+        for end in ("first", "last"):
+            aggs[f"{measure}_{end}"] = (col, end)
+            aggs[f"_dol_{measure}_{end}"] = (f"_dol_{measure}", end)
+        aggs[f"_n_{measure}"] = (col, "count")
+
+    feats = work.groupby(SUBJECT_COL, sort=True, observed=True).agg(**aggs)
+
+    def span(measure):
+        return (feats[f"_dol_{measure}_last"] - feats[f"_dol_{measure}_first"]).to_numpy(dtype=float)
+
+    w1, w2 = feats["weight_first"].to_numpy(dtype=float), feats["weight_last"].to_numpy(dtype=float)
+    feats["weight_velocity_exp"] = weight_velocity_exp(w1, w2, span("weight"))
+    feats["weight_velocity_avg"] = weight_velocity_avg(w1, w2, span("weight"))
+    for measure in ("length", "hc"):
+        feats[f"{measure}_velocity_cm_wk"] = cm_per_week(
+            feats[f"{measure}_first"].to_numpy(dtype=float),
+            feats[f"{measure}_last"].to_numpy(dtype=float),
+            span(measure),
+        )
+    for measure in Z_COLUMNS:
+        if f"z_{measure}_first" in feats:
+            # a change needs two measured samples
+            delta = feats[f"z_{measure}_last"] - feats[f"z_{measure}_first"]
+            feats[f"delta_z_{measure}"] = delta.where(feats[f"_n_z_{measure}"] >= 2)
+
+    # flags are NA where the feature behind them could not be computed
+    if "delta_z_weight" in feats:
+        feats["flag_weight_z_decline"] = _flag(feats["delta_z_weight"] < FALTERING_DELTA_Z, feats["delta_z_weight"])
+    feats["flag_slow_weight_gain"] = _flag(feats["weight_velocity_exp"] < SLOW_WEIGHT_GAIN, feats["weight_velocity_exp"])
+    flags = [feats[c] for c in feats if c.startswith("flag_")]
+    # Kleene OR: True if any flag is set, NA if none is but some are unknown
+    feats["growth_faltering"] = flags[0]
+    for flag in flags[1:]:
+        feats["growth_faltering"] = feats["growth_faltering"] | flag
+    return feats.drop(columns=[c for c in feats if c.startswith(("_dol_", "_n_"))])
+
+
+def _flag(condition, value):
+    return condition.astype("boolean").where(value.notna(), pd.NA)
+
+
+def value_at(ts, col, dol):
+    """``col`` linearly interpolated at ``dol`` within each subject.
+
+    ``dol`` is a scalar or one value per subject (in sorted subject order).
+    NaN where the subject has no recorded values around that day.
+    """
+    valid = ts[col].notna().to_numpy()
+    subjects = ts[SUBJECT_COL].to_numpy()
+    codes, uniques = pd.factorize(subjects, sort=True)
+    day = ts[DOL_COL].to_numpy(dtype=float)[valid]
+    val = ts[col].to_numpy(dtype=float)[valid]
+    code = codes[valid]
+    if not len(day):
+        return pd.Series(np.nan, index=pd.Index(uniques, name=SUBJECT_COL))
+
+    # subjects are contiguous and DOL-sorted, so one composite key searches all
+    key = code * DOL_STRIDE + day
+    start = np.searchsorted(code, np.arange(len(uniques)), side="left")
+    stop = np.searchsorted(code, np.arange(len(uniques)), side="right")
+    target = np.broadcast_to(np.asarray(dol, dtype=float), (len(uniques),))
+
+    lo = np.searchsorted(key, np.arange(len(uniques)) * DOL_STRIDE + target, side="right") - 1
+    inside = (stop > start) & (lo >= start) & (lo < stop)
+    lo = np.clip(lo, 0, len(key) - 1)
+    hi = np.where(inside & (lo + 1 < stop), lo + 1, lo)
+
+    span = day[hi] - day[lo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(span > 0, (target - day[lo]) / span, 0.0)
+    exact_or_between = inside & ((span > 0) | (day[lo] == target))
+    out = np.where(exact_or_between, val[lo] + t * (val[hi] - val[lo]), np.nan)
+    return pd.Series(out, index=pd.Index(uniques, name=SUBJECT_COL))
+
+
+def delta_z(ts, dol_from, dol_to, measure="weight"):
+    """Change in z-score between two DOLs for every subject (Δz)."""
+    col = Z_COLUMNS[measure]
+    return value_at(ts, col, dol_to) - value_at(ts, col, dol_from)
+
+
+@lru_cache(maxsize=4)
+def _cohort(version):
+    ts = prepare(data.load_combined())
+    return ts, interval_features(ts), subject_features(ts)
+
+
+def cohort_features():
+    """(time series, interval features, subject features) for the served cohort."""
+    return _cohort(data.version(data.MERGED_ALL))
+
+
+def features_for(subject_id):
+    """Cached first-to-last features for one subject."""
+    return cohort_features()[2].loc[subject_id]
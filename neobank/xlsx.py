@@ -0,0 +1,78 @@
+"""Streaming reader for the raw Excel workbooks.
+
+``pd.read_excel`` builds openpyxl's full workbook model and then a
+DataFrame of the whole sheet, so both are in memory at once. ``iter_sheet``
+opens the workbook read-only and yields typed DataFrames of ``chunk_rows``
+rows instead:
+
+* only the requested columns are kept, matched by header label, so extra
+  columns added to a sheet are never materialized
+* columns listed in ``dtypes`` get that dtype (``"string"`` for labels);
+  every other column is parsed as float64
+
+Callers consume the batches as they come: the unlinked pipeline stage
+joins each one to the sample metadata, and the AC reports (cut into the
+same chunks) go into Parquet through ``store.write_batches``, so no sheet
+is ever held whole.
+"""
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+CHUNK_ROWS = 1024
+
+
+def label(value):
+    return "" if value is None else str(value).strip()
+
+
+def chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def grid(chunk, width):
+    """Rows of one chunk as an object array, padded to ``width`` cells."""
+    return np.array([tuple(r[:width]) + (None,) * (width - len(r)) for r in chunk], dtype=object)
+
+
+def _typed(frame, dtypes):
+    for col in frame.columns:
+        dtype = dtypes.get(col, "float64")
+        if dtype == "string":
+            text = frame[col].map(label)
+            frame[col] = text.where(text != "").astype("string")
+        else:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce").astype(dtype)
+    return frame
+
+
+def iter_sheet(path, sheet=None, columns=None, dtypes=None, chunk_rows=CHUNK_ROWS):
+    """Yield typed DataFrames of ``chunk_rows`` rows of a one-header-row sheet."""
+    dtypes = dtypes or {}
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = [label(v) for v in next(rows, ())]
+        wanted = list(columns) if columns else [h for h in header if h]
+        missing = [c for c in wanted if c not in header]
+        if missing:
+            raise ValueError(f"{Path(path).name} [{ws.title}] has no column(s) {missing}")
+        index = [header.index(c) for c in wanted]
+
+        for chunk in chunks(rows, chunk_rows):
+            cells = grid(chunk, len(header))[:, index]
+            # read-only sheets run on through formatted but empty rows
+            cells = cells[~pd.isna(cells).all(axis=1)]
+            if len(cells):
+                yield _typed(pd.DataFrame(cells, columns=wanted), dtypes)
+    finally:
+        wb.close()
+
@@ -0,0 +1,413 @@
+"""Vectorized INTERGROWTH LMS z-scores.
+
+The reference is compiled once into flat NumPy arrays: every
+(standard, sex, measure) curve is stored back to back, sorted by age, with a
+composite search key of ``group * AGE_STRIDE + age``. Interpolating L, M and
+S for any mix of standards, sexes, measures and ages is then a single
+``np.searchsorted`` plus arithmetic, so a whole cohort (all three measures,
+every standard) is scored in one batched pass instead of re-filtering and
+re-sorting the reference per group.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+AGE_COL = "PMA_weeks"
+SEX_COL = "Infant Sex"
+GA_BIRTH_COL = "GA_birth_weeks"
+CGA_COL = "CGA"
+DOL_COL = "DOL"
+STANDARD_COL = "z_standard"
+
+SEXES = ["male", "female"]
+MEASURES = ["weight", "length", "hc"]
+
+# INTERGROWTH-21st reference families shipped in INTERGROWTH/Zscores
+NEWBORN = "newborn"                      # size at birth, 33+0 to 42+6 weeks
+VERY_PRETERM = "very_preterm"            # size at birth, 24+0 to 32+6 weeks
+POSTNATAL_PRETERM = "postnatal_preterm"  # postnatal growth of preterm infants, by PMA
+STANDARDS = [NEWBORN, VERY_PRETERM, POSTNATAL_PRETERM]
+
+# routing thresholds (weeks / days)
+VERY_PRETERM_GA = 33.0
+PRETERM_GA = 37.0
+BIRTH_DOL = 0
+
+# map your sex values to reference sex labels ("male"/"female")
+SEX_MAP = {
+    "M": "male", "F": "female",
+    "Male": "male", "Female": "female",
+    "m": "male", "f": "female",
+    "male": "male", "female": "female",
+    1: "male", 2: "female",
+}
+
+# measure -> (cohort column, factor converting it to reference units,
+#             output column); INTERGROWTH weight M is in kg
+MEASURE_COLUMNS = {
+    "weight": ("Current Weight", 1 / 1000.0, "z_weight_for_age"),
+    "length": ("Current Height", 1.0, "z_length_for_age"),
+    "hc": ("Current HC", 1.0, "z_hc_for_age"),
+}
+
+# ages are weeks, so any stride above the oldest age keeps groups apart
+AGE_STRIDE = 1000.0
+# slack when comparing a curve's point spacing with ``max_gap``
+GAP_TOLERANCE = 1e-9
+
+
+def lms_z(x, L, M, S):
+    x = np.asarray(x, dtype=float)
+    L = np.asarray(L, dtype=float)
+    M = np.asarray(M, dtype=float)
+    S = np.asarray(S, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        box_cox = ((x / M) ** L - 1) / (L * S)
+        log = np.log(x / M) / S
+    # a measurement must be positive; zero or negative values are not scored
+    return np.where(x > 0, np.where(np.isclose(L, 0.0), log, box_cox), np.nan)
+
+
+def sex_codes(sex):
+    """Codes into ``SEXES`` for raw sex labels; missing values get -1."""
+    codes, uniques = pd.factorize(pd.Series(sex), use_na_sentinel=True)
+    mapped = [SEX_MAP.get(u.strip() if isinstance(u, str) else u) for u in uniques]
+    bad = [u for u, m in zip(uniques, mapped) if m is None]
+    if bad:
+        raise ValueError(f"Unmapped sex values: {bad}. Update SEX_MAP.")
+    lookup = np.array([SEXES.index(m) for m in mapped] + [-1], dtype=np.int64)
+    return lookup[codes]
+
+
+def measure_codes(measure):
+    codes, uniques = pd.factorize(pd.Series(measure))
+    bad = [u for u in uniques if u not in MEASURES]
+    if bad:
+        raise ValueError(f"Unknown measures: {bad}. Expected one of {MEASURES}.")
+    lookup = np.array([MEASURES.index(u) for u in uniques] + [-1], dtype=np.int64)
+    return lookup[codes]
+
+
+def group_codes(sex, measure, standard=0):
+    """Curve index for integer codes; -1 wherever any code is missing."""
+    sex = np.asarray(sex, dtype=np.int64)
+    measure = np.asarray(measure, dtype=np.int64)
+    standard = np.asarray(standard, dtype=np.int64)
+    group = (standard * len(SEXES) + sex) * len(MEASURES) + measure
+    return np.where((sex >= 0) & (measure >= 0) & (standard >= 0), group, -1)
+
+
+class LMSReference:
+    """An LMS reference compiled into contiguous per-(standard, sex, measure) curves.
+
+    With ``max_gap`` (weeks), ages strictly between two published points
+    further apart than that are not interpolated and come back as NaN.
+    """
+
+    def __init__(self, age, L, M, S, offsets, standards=(NEWBORN,), max_gap=None):
+        self.age = age
+        self.L = L
+        self.M = M
+        self.S = S
+        self.standards = list(standards)
+        self.max_gap = max_gap
+        # curve g occupies [offsets[g], offsets[g + 1]); empty if equal
+        self.offsets = offsets
+        n_groups = len(offsets) - 1
+        group = np.repeat(np.arange(n_groups), np.diff(offsets))
+        self.key = group * AGE_STRIDE + age
+
+        start, stop = offsets[:-1], offsets[1:]
+        self.present = stop > start
+        self.age_min = np.where(self.present, age[np.minimum(start, len(age) - 1)], np.nan)
+        self.age_max = np.where(self.present, age[np.maximum(stop - 1, 0)], np.nan)
+
+    @classmethod
+    def from_arrays(cls, sex, measure, age, L, M, S, standard=0, standards=(NEWBORN,), max_gap=None):
+        """Compile from integer standard/sex/measure codes and per-row age, L, M, S."""
+        age = np.asarray(age, dtype=float)
+        group = np.broadcast_to(group_codes(sex, measure, standard), age.shape)
+        order = np.lexsort((age, group))
+        counts = np.bincount(group, minlength=len(standards) * len(SEXES) * len(MEASURES))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return cls(
+            np.ascontiguousarray(age[order]),
+            np.ascontiguousarray(np.asarray(L, dtype=float)[order]),
+            np.ascontiguousarray(np.asarray(M, dtype=float)[order]),
+            np.ascontiguousarray(np.asarray(S, dtype=float)[order]),
+            offsets,
+            standards,
+            max_gap,
+        )
+
+    @classmethod
+    def from_frame(cls, ref_df, age_col="pma_weeks", max_gap=None):
+        """Compile a long ``sex``/``measure``/age/``L``/``M``/``S`` frame.
+
+        A ``standard`` column, if present, compiles every standard it names.
+        """
+        cols = ["sex", "measure", age_col, "L", "M", "S"]
+        if "standard" in ref_df:
+            ref = ref_df[["standard"] + cols].dropna()
+            standard, standards = pd.factorize(ref["standard"])
+        else:
+            ref = ref_df[cols].dropna()
+            standard, standards = 0, [NEWBORN]
+        return cls.from_arrays(
+            sex_codes(ref["sex"].to_numpy()),
+            measure_codes(ref["measure"].to_numpy()),
+            ref[age_col].to_numpy(dtype=float),
+            ref["L"], ref["M"], ref["S"],
+            standard, list(standards), max_gap,
+        )
+
+    def standard_code(self, standard):
+        return standard if isinstance(standard, (int, np.integer)) else self.standards.index(standard)
+
+    def _group_name(self, g):
+        s, rest = divmod(g, len(SEXES) * len(MEASURES))
+        return (self.standards[s], SEXES[rest // len(MEASURES)], MEASURES[rest % len(MEASURES)])
+
+    def in_range(self, group, age):
+        """True where ``age`` lies inside its curve (False for missing groups)."""
+        group = np.asarray(group, dtype=np.int64)
+        valid = group >= 0
+        g = np.where(valid, group, 0)
+        with np.errstate(invalid="ignore"):
+            return valid & (age >= self.age_min[g]) & (age <= self.age_max[g])
+
+    def interpolate(self, group, age, clip=True):
+        """L, M, S at ``age`` for integer group codes.
+
+        With ``clip`` ages outside a curve are clamped to its ends; without it
+        they come back as NaN. Rows with a negative group code, and ages
+        inside a gap wider than ``max_gap``, are NaN.
+        """
+        group = np.asarray(group, dtype=np.int64)
+        age = np.asarray(age, dtype=float)
+        valid = group >= 0
+        group = np.where(valid, group, 0)
+        if not self.present[group[valid]].all():
+            missing = sorted(set(group[valid & ~self.present[group]].tolist()))
+            raise ValueError(f"No reference rows for {[self._group_name(g) for g in missing]}.")
+
+        if clip:
+            age = np.clip(age, self.age_min[group], self.age_max[group])
+        else:
+            valid = valid & self.in_range(group, age)
+        start = self.offsets[group]
+        last = np.maximum(self.offsets[group + 1] - 1, start)
+
+        # left neighbour of each age inside its own curve
+        lo = np.searchsorted(self.key, group * AGE_STRIDE + age, side="right") - 1
+        lo = np.clip(lo, start, np.maximum(last - 1, start))
+        hi = np.minimum(lo + 1, last)
+
+        span = self.age[hi] - self.age[lo]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.where(span > 0, (age - self.age[lo]) / span, 0.0)
+        t = np.where(valid & ~np.isnan(age), t, np.nan)
+        if self.max_gap is not None:
+            gap = (span > self.max_gap + GAP_TOLERANCE) & (t > 0) & (t < 1)
+            t = np.where(gap, np.nan, t)
+
+        def lerp(v):
+            return v[lo] + t * (v[hi] - v[lo])
+
+        return lerp(self.L), lerp(self.M), lerp(self.S)
+
+    def zscore(self, value, sex, measure, age, standard=0, clip=True):
+        """z-scores for raw sex labels and measure names (arrays or scalars)."""
+        value = np.atleast_1d(np.asarray(value, dtype=float))
+        sex = np.broadcast_to(sex, value.shape)
+        measure = np.broadcast_to(measure, value.shape)
+        group = group_codes(sex_codes(sex), measure_codes(measure), self.standard_code(standard))
+        L, M, S = self.interpolate(group, np.broadcast_to(age, value.shape), clip=clip)
+        return lms_z(value, L, M, S)
+
+
+class LMSIndex:
+    """Dense table of L, M, S by (curve, GA step) for O(1) point lookups.
+
+    ``step_days=1`` indexes by GA day, ``step_days=7`` by completed-week
+    rounding like the notebook's ``round(pma_weeks)``. Steps outside a
+    curve hold NaN, so out-of-range ages score as NaN rather than clamping.
+    """
+
+    def __init__(self, ref, step_days=1):
+        self.ref = ref
+        self.step_days = step_days
+        steps_min = math.floor(np.nanmin(ref.age_min) * 7 / step_days)
+        steps_max = math.ceil(np.nanmax(ref.age_max) * 7 / step_days)
+        self.first = steps_min
+        steps = np.arange(steps_min, steps_max + 1)
+        n_groups, n_steps = len(ref.present), len(steps)
+
+        group = np.repeat(np.arange(n_groups), n_steps)
+        group = np.where(ref.present[group], group, -1)
+        step = np.tile(steps, n_groups)
+        L, M, S = ref.interpolate(group, step * step_days / 7.0, clip=True)
+
+        # keep only the steps inside each curve (tolerating float noise at the ends)
+        g = np.maximum(group, 0)
+        inside = (
+            (group >= 0)
+            & (step * step_days >= np.round(ref.age_min[g] * 7, 6))
+            & (step * step_days <= np.round(ref.age_max[g] * 7, 6))
+        )
+        table = np.stack([L, M, S], axis=-1)
+        table[~inside] = np.nan
+        self.table = np.ascontiguousarray(table.reshape(n_groups, n_steps, 3))
+
+    def _step(self, age):
+        return np.rint(np.asarray(age, dtype=float) * 7 / self.step_days) - self.first
+
+    def lms(self, group, age):
+        """Array lookup: L, M, S for integer group codes and ages in weeks."""
+        group = np.asarray(group, dtype=np.int64)
+        k = self._step(age)
+        ok = (group >= 0) & (k >= 0) & (k < self.table.shape[1])
+        rows = self.table[np.where(ok, group, 0), np.where(ok, k, 0).astype(np.int64)]
+        rows[~ok] = np.nan
+        return rows[..., 0], rows[..., 1], rows[..., 2]
+
+    def lms_one(self, sex, measure, age, standard=0):
+        """Scalar lookup without any array or pandas overhead."""
+        label = SEX_MAP.get(sex.strip() if isinstance(sex, str) else sex)
+        if label is None or age is None or math.isnan(age):
+            return (math.nan, math.nan, math.nan)
+        standard = self.ref.standard_code(standard)
+        g = (standard * len(SEXES) + SEXES.index(label)) * len(MEASURES) + MEASURES.index(measure)
+        k = int(round(age * 7 / self.step_days)) - self.first
+        if not 0 <= k < self.table.shape[1]:
+            return (math.nan, math.nan, math.nan)
+        L, M, S = self.table[g, k]
+        return (float(L), float(M), float(S))
+
+    def zscore(self, value, sex, measure, age, standard=0):
+        """Array API: z-scores for raw sex labels and measure names."""
+        value = np.atleast_1d(np.asarray(value, dtype=float))
+        sex = np.broadcast_to(sex, value.shape)
+        measure = np.broadcast_to(measure, value.shape)
+        group = group_codes(sex_codes(sex), measure_codes(measure), self.ref.standard_code(standard))
+        L, M, S = self.lms(group, np.broadcast_to(age, value.shape))
+        return lms_z(value, L, M, S)
+
+    def zscore_one(self, value, sex, measure, age, standard=0):
+        """Scalar API: one z-score, NaN when the point is outside the reference."""
+        L, M, S = self.lms_one(sex, measure, age, standard)
+        if value is None or not value > 0 or math.isnan(M):
+            return math.nan
+        if abs(L) < 1e-8:
+            return math.log(value / M) / S
+        return ((value / M) ** L - 1) / (L * S)
+
+
+def _score_measures(out, ref, sex, standard, age, clip):
+    # stack the three measures so they are interpolated together
+    n = len(out)
+    values = np.concatenate([
+        out[column].to_numpy(dtype=float) * factor
+        for column, factor, _ in MEASURE_COLUMNS.values()
+    ])
+    group = np.concatenate([
+        group_codes(sex, MEASURES.index(m), standard) for m in MEASURE_COLUMNS
+    ])
+    ages = np.tile(age, len(MEASURE_COLUMNS))
+    L, M, S = ref.interpolate(group, ages, clip=clip)
+    z = lms_z(values, L, M, S).reshape(len(MEASURE_COLUMNS), n)
+
+    z_cols = [z_col for _, _, z_col in MEASURE_COLUMNS.values()]
+    for z_col, row in zip(z_cols, z):
+        out[z_col] = row
+
+    # optional QC
+    out["qc_extreme_z"] = (np.abs(z) > 3).any(axis=0)
+    return group, ages
+
+
+def add_intergrowth_zscores(df, ref, age_col=AGE_COL, sex_col=SEX_COL, standard=0):
+    """Add weight, length and HC z-scores against one standard in one batched pass.
+
+    ``ref`` is an ``LMSReference`` or a long L/M/S frame to compile. Ages are
+    clamped to the reference range, as in the original notebook.
+    """
+    if not isinstance(ref, LMSReference):
+        ref = LMSReference.from_frame(ref)
+    out = df.copy()
+    sex = sex_codes(out[sex_col].to_numpy())
+    age = out[age_col].to_numpy(dtype=float)
+    _score_measures(out, ref, sex, ref.standard_code(standard), age, clip=True)
+    return out
+
+
+def add_gestational_ages(df, cga_col=CGA_COL, dol_col=DOL_COL):
+    """Add GA at birth and PMA (weeks) from corrected GA and day of life.
+
+    PMA is the recorded CGA where there is one, otherwise GA at birth + DOL.
+    """
+    out = df.copy()
+    # plain floats, also when CGA/DOL come in as nullable schema dtypes
+    cga = pd.to_numeric(out[cga_col], errors="coerce").astype(float)
+    dol = pd.to_numeric(out[dol_col], errors="coerce").astype(float)
+    out[GA_BIRTH_COL] = cga - dol / 7
+    out[AGE_COL] = cga.where(cga.notna(), out[GA_BIRTH_COL] + dol / 7.0)
+    return out
+
+
+def route_standards(ga_birth, pma, dol):
+    """Pick the standard and the age to score against for every row.
+
+    Birth measurements (DOL <= ``BIRTH_DOL``) use the size-at-birth standard
+    for their GA (very preterm below 33 weeks, newborn from 33 weeks) at
+    GA_birth. Later measurements of preterm infants (GA < 37 weeks) use the
+    postnatal preterm standard at PMA. Anything else, including term infants
+    after birth, gets code -1. Codes index ``STANDARDS``.
+    """
+    ga_birth = np.asarray(ga_birth, dtype=float)
+    pma = np.asarray(pma, dtype=float)
+    dol = np.asarray(dol, dtype=float)
+
+    at_birth = dol <= BIRTH_DOL
+    after_birth = dol > BIRTH_DOL
+    code = np.select(
+        [
+            at_birth & (ga_birth < VERY_PRETERM_GA),
+            at_birth & (ga_birth >= VERY_PRETERM_GA),
+            after_birth & (ga_birth < PRETERM_GA),
+        ],
+        [STANDARDS.index(VERY_PRETERM), STANDARDS.index(NEWBORN), STANDARDS.index(POSTNATAL_PRETERM)],
+        default=-1,
+    )
+    age = np.where(at_birth, ga_birth, pma)
+    return code, age
+
+
+def add_routed_zscores(df, ref, sex_col=SEX_COL, ga_col=GA_BIRTH_COL, pma_col=AGE_COL, dol_col=DOL_COL):
+    """Score every row against the standard that applies to it, in one pass.
+
+    ``ref`` must be compiled with all of ``STANDARDS``. Adds the three
+    z-score columns, ``z_standard`` naming the standard used, and
+    ``qc_z_out_of_range`` for rows whose age falls outside that standard
+    (they are left as NaN instead of being clamped to the table's end).
+    """
+    out = df.copy()
+    code, age = route_standards(
+        out[ga_col].to_numpy(dtype=float),
+        out[pma_col].to_numpy(dtype=float),
+        out[dol_col].to_numpy(dtype=float),
+    )
+    # route_standards codes index STANDARDS; translate to ref's own order
+    lookup = np.array([ref.standard_code(s) for s in STANDARDS] + [-1])
+    standard = lookup[code]
+    sex = sex_codes(out[sex_col].to_numpy())
+
+    group, ages = _score_measures(out, ref, sex, standard, age, clip=False)
+    out[STANDARD_COL] = pd.Series(
+        np.array(STANDARDS + [None], dtype=object)[code], index=out.index, dtype="string"
+    )
+    routed = (group >= 0) & ~np.isnan(ages)
+    out_of_range = (routed & ~ref.in_range(group, ages)).reshape(len(MEASURE_COLUMNS), -1)
+    out["qc_z_out_of_range"] = out_of_range.any(axis=0)
+    return out
@@ -2,15 +2,25 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
-import matplotlib.pyplot as plt
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from neobank import cube, data, db, figures, growth, summary
 
 st.set_page_config(page_title="NeoBANK Cohort Dashboard", layout="wide")
 st.title("NeoBANK Cohort: Linked + Unlinked Samples")
 
-# Load your files
-unlinked = pd.read_excel("Cleaned Data/Unlinked_Merged.xlsx")
-linked = pd.read_excel("Cleaned Data/Linked_Merged.xlsx")
-combined = pd.read_excel("Cleaned Data/merged_ALL.xlsx")
+# Cohort-wide totals and the subject panels come from SQL (neobank.db) and
+# the count charts from the pre-aggregated cube, so the page never loads
+# the whole cohort; both are built by the pipeline
+if db.stale():
+    st.warning(db.STALE_WARNING)
+totals = db.cohort_totals()
+counts = cube.load("combined")
+
+# Figures are cached per database/cube version, so reruns only rebuild what changed
+version = (data.version(db.DB_PATH), data.version(cube.PATHS["combined"]))
 
 # st.success(f"Combined dataset has {combined.shape[0]} samples and {combined['Subject ID'].nunique()} unique subjects.")
 
@@ -32,8 +42,8 @@ st.markdown("""
 
 
 # Count metrics
-num_subjects = combined["Subject ID"].nunique()
-num_samples = combined["sample_unique_id"].nunique()
+num_subjects = totals["n_subjects"]
+num_samples = totals["n_samples"]
 
 def metric_card(title, value, icon=""):
     st.markdown(f"""
@@ -54,72 +64,74 @@ def metric_card(title, value, icon=""):
 col1, col2 = st.columns(2)
 
 with col1:
-    metric_card("Total Samples", combined["sample_unique_id"].nunique())
+    metric_card("Total Samples", num_samples)
 
 with col2:
-    metric_card("Unique Subjects", combined["Subject ID"].nunique())
+    metric_card("Unique Subjects", num_subjects)
 
 
 #############-------------------------
 
 st.subheader("Sample Count per Subject")
 
-sample_counts = combined["Subject ID"].value_counts().sort_index()
-sample_counts_df = sample_counts.reset_index()
-sample_counts_df.columns = ["Subject ID", "Sample Count"]
-
-# Plot bar chart using Plotly for better styling
-import plotly.express as px
+def sample_count_figure():
+    sample_counts_df = counts.counts("Subject ID").sort_index().reset_index()
+    sample_counts_df.columns = ["Subject ID", "Sample Count"]
+
+    fig = px.bar(
+        sample_counts_df,
+        x="Subject ID",
+        y="Sample Count",
+        text="Sample Count",
+        color="Sample Count",
+        color_continuous_scale="Teal"
+    )
 
-fig = px.bar(
-    sample_counts_df,
-    x="Subject ID",
-    y="Sample Count",
-    text="Sample Count",
-    color="Sample Count",
-    color_continuous_scale="Teal"
-)
+    fig.update_layout(
+        xaxis_title="Subject ID",
+        yaxis_title="Number of Samples",
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        font_color="#000000"
+    )
 
-fig.update_layout(
-    xaxis_title="Subject ID",
-    yaxis_title="Number of Samples",
-    plot_bgcolor="#ffffff",
-    paper_bgcolor="#ffffff",
-    font_color="#000000"
-)
+    return fig
 
-st.plotly_chart(fig, use_container_width=True)
+st.plotly_chart(figures.plotly("sample_counts", sample_count_figure, version), use_container_width=True)
 
 
 ############ Aliquots Overview
 st.subheader("Aliquots Overview")
 
 # Metric card for total aliquots
-total_aliquots = combined["Aliquots_num"].sum()
+total_aliquots = totals["n_aliquots"]
 metric_card("Number of Total Aliquots", total_aliquots)
 
-# Aliquots per subject
-aliquots_per_subject = combined.groupby("Subject ID")["Aliquots_num"].sum().reset_index()
-aliquots_per_subject.columns = ["Subject ID", "Total Aliquots"]
-
-fig_aliquots = px.bar(
-    aliquots_per_subject,
-    x="Subject ID",
-    y="Total Aliquots",
-    text="Total Aliquots",
-    color="Total Aliquots",
-    color_continuous_scale="Teal"
-    )
+def aliquots_figure():
+    # Aliquots per subject
+    aliquots_per_subject = counts.counts("Subject ID", "aliquots").sort_index().reset_index()
+    aliquots_per_subject.columns = ["Subject ID", "Total Aliquots"]
+
+    fig_aliquots = px.bar(
+        aliquots_per_subject,
+        x="Subject ID",
+        y="Total Aliquots",
+        text="Total Aliquots",
+        color="Total Aliquots",
+        color_continuous_scale="Teal"
+        )
+
+    fig_aliquots.update_layout(
+        xaxis_title="Subject ID",
+        yaxis_title="Number of Aliquots",
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        font_color="black"
+        )
 
-fig_aliquots.update_layout(
-    xaxis_title="Subject ID",
-    yaxis_title="Number of Aliquots",
-    plot_bgcolor="#ffffff",
-    paper_bgcolor="#ffffff",
-    font_color="black"
-    )
+    return fig_aliquots
 
-st.plotly_chart(fig_aliquots, use_container_width=True)
+st.plotly_chart(figures.plotly("aliquots", aliquots_figure, version), use_container_width=True)
 
 
 
@@ -131,8 +143,8 @@ col_linked, col_sample_source = st.columns(2)
 
 
 # Left: Bar chart for number of 'N' and 'Y' in "Linked?"
-with col_linked:
-    linked_counts = combined["Linked"].value_counts().loc[["N", "Y"]]
+def linked_figure():
+    linked_counts = counts.counts("Linked").loc[["N", "Y"]].rename("count")
     fig_linked = px.bar(
         linked_counts.reset_index(),
         x="Linked",
@@ -149,12 +161,15 @@ with col_linked:
         paper_bgcolor="#ffffff",
         font_color="#000000"
     )
-    st.plotly_chart(fig_linked, use_container_width=True)
+    return fig_linked
 
+with col_linked:
+    st.plotly_chart(figures.plotly("linked", linked_figure, version), use_container_width=True)
 
-with col_sample_source:
+
+def sample_source_figure():
     # Pie chart for "Sample Source"
-    sample_source_counts = combined["Sample Source"].dropna().value_counts()
+    sample_source_counts = counts.counts("Sample Source")
     # Define colors: "Scavenged" dark grey, others light grey
     color_map = {src: "#6B6B6B" if src == "Scavenged" else "#E0E0E0" for src in sample_source_counts.index}
     fig_sample_source = px.pie(
@@ -170,30 +185,36 @@ with col_sample_source:
         paper_bgcolor="#ffffff",
         font_color="#000000"
     )
-    st.plotly_chart(fig_sample_source, use_container_width=True)
+    return fig_sample_source
+
+with col_sample_source:
+    st.plotly_chart(figures.plotly("sample_source", sample_source_figure, version), use_container_width=True)
 
 
 # Bar chart for number of Female and Male infants
-sex_counts = combined["Infant Sex"].value_counts().loc[["Female", "Male"]]
-fig_sex = px.bar(
-    sex_counts.reset_index(),
-    x="Infant Sex",
-    y="count",
-    color="Infant Sex",
-    color_discrete_map={"Female": "#F09EC7", "Male": "#A0C8F0"},  # Pink for Female, Blue for Male
-    text="count",
-    title="Number of Infants by Sex"
-)
+def sex_figure():
+    sex_counts = counts.counts("Infant Sex").loc[["Female", "Male"]].rename("count")
+    fig_sex = px.bar(
+        sex_counts.reset_index(),
+        x="Infant Sex",
+        y="count",
+        color="Infant Sex",
+        color_discrete_map={"Female": "#F09EC7", "Male": "#A0C8F0"},  # Pink for Female, Blue for Male
+        text="count",
+        title="Number of Infants by Sex"
+    )
 
-fig_sex.update_layout(
-    xaxis_title="Infant Sex",
-    yaxis_title="Number of Infants",
-    plot_bgcolor="#ffffff",
-    paper_bgcolor="#ffffff",
-    font_color="#000000"
-)
+    fig_sex.update_layout(
+        xaxis_title="Infant Sex",
+        yaxis_title="Number of Infants",
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        font_color="#000000"
+    )
 
-st.plotly_chart(fig_sex, use_container_width=True)
+    return fig_sex
+
+st.plotly_chart(figures.plotly("sex", sex_figure, version), use_container_width=True)
 
 #############-----------------
 st.subheader("Milk & Nutrition Details")
@@ -211,7 +232,7 @@ selected_milk_var = st.selectbox("Select a milk-related variable to explore:", m
 if selected_milk_var:
     st.markdown(f"**Distribution of** `{selected_milk_var}`")
 
-    value_counts = combined[selected_milk_var].value_counts()
+    value_counts = counts.counts(selected_milk_var).rename("count")
 
     # Show value counts
     st.write(value_counts.to_frame().rename(columns={selected_milk_var: "Count"}))
@@ -230,17 +251,41 @@ st.subheader("Growth Metric Overview")
 #############-----------------
 
 
-# Filter subjects with >3 timepoints
-subject_counts = combined["Subject ID"].value_counts()
-longitudinal_subjects = subject_counts[subject_counts > 3].index.tolist()
+# Subjects with >3 timepoints
+longitudinal_subjects = db.longitudinal_subjects(4)
 
 st.markdown("📍 Showing only subjects with > 3 timepoints")
-selected_subject = st.selectbox("Select a subject:", sorted(longitudinal_subjects))
+selected_subject = st.selectbox("Select a subject:", longitudinal_subjects)
 
-# Filter and sort by DOL
-subject_df = combined[combined["Subject ID"] == selected_subject].copy()
+# Subject's samples, already sorted by DOL so line plots follow the right order
+subject_df = db.subject_samples(selected_subject).copy()
 subject_df["DOL"] = pd.to_numeric(subject_df["DOL"], errors="coerce")  # ensure numeric
-subject_df = subject_df.sort_values("DOL")  # 👈 ensures line plots follow correct order
+
+# Subject summary metrics, looked up in the materialized subject_summary
+subject_summary = summary.lookup(selected_subject)
+if subject_summary is not None:
+    col_ga, col_stay, col_mom = st.columns(3)
+    with col_ga:
+        metric_card("GA at Birth (weeks)", subject_summary["ga_at_birth_weeks"])
+    with col_stay:
+        metric_card("Sampled DOL", f'{subject_summary["first_dol"]} - {subject_summary["last_dol"]}')
+    with col_mom:
+        metric_card("First MOM Day", subject_summary["first_mbm_day"])
+
+# Growth trajectory features (neobank.trajectory), materialized by the pipeline
+def feature_text(value, fmt="{:.1f}"):
+    return "n/a" if pd.isna(value) else fmt.format(value)
+
+growth_features = db.growth_features(selected_subject)
+if growth_features is not None:
+    col_velocity, col_dz, col_faltering = st.columns(3)
+    with col_velocity:
+        metric_card("Weight Gain (g/kg/day)", feature_text(growth_features["weight_velocity_exp"]))
+    with col_dz:
+        metric_card("Weight z-score Change", feature_text(growth_features.get("delta_z_weight"), "{:+.2f}"))
+    with col_faltering:
+        faltering = growth_features["growth_faltering"]
+        metric_card("Growth Faltering", "n/a" if pd.isna(faltering) else ("Yes" if faltering else "No"))
 
 
 # Show number of subjects with >3 timepoints
@@ -261,38 +306,20 @@ st.markdown(f"""
     </div>
 """, unsafe_allow_html=True)
 
-# Define columns for layout
-col1, col2, col3 = st.columns(3)
-
-# Standard figure style function
-def make_growth_plot(x, y, title):
-    fig, ax = plt.subplots(figsize=(4, 3))
-    fig.patch.set_facecolor('#ffffff')
-    ax.set_facecolor('#ffffff')
-    ax.plot(subject_df[x], subject_df[y], marker="o", color="#1B4A81")
-    ax.set_xlabel(x, color='black')
-    ax.set_ylabel(y, color='black')
-    ax.set_title(title, color='black')
-    ax.tick_params(colors='black')
-
-    # Add tick marks every 2 DOL units
-    x_vals = subject_df[x].dropna().sort_values()
-    if not x_vals.empty:
-        tick_range = np.arange(x_vals.min(), x_vals.max() + 2, 3)
-        ax.set_xticks(tick_range)
-    return fig
-
-# Weight
-with col1:
-    st.pyplot(make_growth_plot("DOL", "Current Weight", "Weight (g)"))
-
-# Height
-with col2:
-    st.pyplot(make_growth_plot("DOL", "Current Height", "Height (cm)"))
-
-# Head Circumference
-with col3:
-    st.pyplot(make_growth_plot("DOL", "Current HC", "Head Circumference (cm)"))
+# Optional INTERGROWTH overlays
+col_z, col_centiles = st.columns(2)
+with col_z:
+    show_zscores = st.checkbox("Show INTERGROWTH z-scores")
+with col_centiles:
+    show_centiles = st.checkbox("Show INTERGROWTH centiles")
+
+# Weight, height and head circumference as one interactive figure
+fig_growth = figures.plotly(
+    "growth_panels",
+    lambda: growth.growth_figure(subject_df, zscores=show_zscores, centiles=show_centiles),
+    version, subject=selected_subject, metric=(show_zscores, show_centiles),
+)
+st.plotly_chart(fig_growth, use_container_width=True)
 
 
 ################-----------------  
@@ -301,13 +328,9 @@ st.header("Human Milk Oligosaccharides (HMO) Overview")
 
 
 
-# Find which subjects ever had MOM
-subjects_with_mom = combined.loc[combined["Type of Milk"] == "MOM", "Subject ID"].unique()
-n_with_mom = len(subjects_with_mom)
-
-# All unique subjects
-all_subjects = combined["Subject ID"].unique()
-n_total = len(all_subjects)
+# Subjects who ever had MOM, and all unique subjects
+n_with_mom = counts.subjects(where={"Type of Milk": "MOM"})
+n_total = counts.subjects()
 
 # Those who never had MOM
 n_without_mom = n_total - n_with_mom
@@ -320,36 +343,32 @@ st.markdown(f"**Subjects who DID NOT recieve MOM during sample collection period
 
 st.subheader("Maternal Secretor Status (First MOM Sample per Subject)")
 
-# 1. Keep only MOM rows
-mom_df = combined[combined["Type of Milk"] == "MOM"].copy()
-
-# 2. Deduplicate by Subject ID (keeps the first MOM per subject)
-mom_unique = mom_df.sort_values("sample_unique_id").drop_duplicates("Subject ID", keep="first")
-
-# 3. Count distribution
-secretor_counts = mom_unique["moms_secretor_status"].value_counts().reset_index()
-secretor_counts.columns = ["moms_secretor_status", "count"]
-
-# 4. Plot bar chart
-fig = px.bar(
-    secretor_counts,
-    x="moms_secretor_status",
-    y="count",
-    color="moms_secretor_status",
-    text="count",
-    color_discrete_map={"Secretor": "#4CAF50", "Non-Secretor": "#F44336"},
-    title="Maternal Secretor Status (Unique Mothers)"
-)
+def secretor_figure():
+    # Secretor status of the first MOM sample per subject, counted in SQL
+    secretor_counts = db.secretor_counts("MOM")
 
-fig.update_layout(
-    xaxis_title="Secretor Status",
-    yaxis_title="Number of Mothers",
-    plot_bgcolor="#ffffff",
-    paper_bgcolor="#ffffff",
-    font_color="#000000"
-)
+    # Plot bar chart
+    fig = px.bar(
+        secretor_counts,
+        x="moms_secretor_status",
+        y="count",
+        color="moms_secretor_status",
+        text="count",
+        color_discrete_map={"Secretor": "#4CAF50", "Non-Secretor": "#F44336"},
+        title="Maternal Secretor Status (Unique Mothers)"
+    )
 
-st.plotly_chart(fig, use_container_width=True)
+    fig.update_layout(
+        xaxis_title="Secretor Status",
+        yaxis_title="Number of Mothers",
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        font_color="#000000"
+    )
+
+    return fig
+
+st.plotly_chart(figures.plotly("secretor", secretor_figure, version), use_container_width=True)
 
 
 
@@ -366,102 +385,82 @@ import plotly.express as px
 st.subheader("HMO and Growth Relationship (Longitudinal Subjects)")
 
 # --- Identify longitudinal subjects ---
-subject_counts = combined["Subject ID"].value_counts()
-longitudinal_subjects = subject_counts[subject_counts >= 3].index.tolist()
+longitudinal_subjects = db.longitudinal_subjects(3)
 
 # Dropdown only shows longitudinal subjects
-subject_id = st.selectbox("Select a Subject ID", sorted(longitudinal_subjects))
+subject_id = st.selectbox("Select a Subject ID", longitudinal_subjects)
 
 growth_metric = st.selectbox("Select Growth Metric", ["Current Weight", "Current Height", "Current HC"])
 
 # --- Define HMO columns (nmol/mL block only) ---
 # Explicit ordered list of HMO columns (nmol/mL only, 2'FL through DSLNH)
-hmo_columns = [
-    "2FL [nmol/mL]",
-    "DFLac [nmol/mL]",
-    "3SL [nmol/mL]",
-    "6SL [nmol/mL]",
-    "LNT [nmol/mL]",
-    "LNnT [nmol/mL]",
-    "LNFP I [nmol/mL]",
-    "LNFP II [nmol/mL]",
-    "LNFP III [nmol/mL]",
-    "LSTc [nmol/mL]",
-    "DFLNT [nmol/mL]",
-    "DSLNT [nmol/mL]",
-    "DFLNH [nmol/mL]",
-    "FDSLNH [nmol/mL]",
-    "DSLNH [nmol/mL]"
-]
+hmo_columns = data.HMO_NMOL_COLUMNS
 
+# Only the columns this view plots
+growth_columns = ["Current Weight", "Current Height", "Current HC"]
 
-# --- Filter and sort subject ---
-subject_df = combined[combined["Subject ID"] == subject_id].copy()
-subject_df = subject_df.sort_values("DOL").reset_index(drop=True)
+# --- Subject's samples (sorted by DOL), with the HMO block pivoted in SQL ---
+subject_samples = db.subject_samples(subject_id, hmo_columns)
+subject_df = subject_samples[["Subject ID", "DOL"] + growth_columns]
+# Same samples in the same order, as a (samples x HMOs) block
+hmo_values = subject_samples[hmo_columns]
 
 # --- Check if this subject has any HMO values ---
-if subject_df[hmo_columns].notna().any().any():
-
-    # Normalize HMO values (0–1 per subject)
-    hmo_values = subject_df[hmo_columns]
-    hmo_norm = (hmo_values - hmo_values.min()) / (hmo_values.max() - hmo_values.min())
-    hmo_norm["Sample #"] = range(1, len(hmo_norm) + 1)
-    hmo_norm["DOL"] = subject_df["DOL"].values
-
-    # Melt into long format
-    hmo_long = hmo_norm.melt(
-        id_vars=["Sample #", "DOL"], 
-        value_vars=hmo_columns, 
-        var_name="HMO", 
-        value_name="Relative Abundance"
-    )
-
-    # --- Build figure ---
-    fig = make_subplots(
-        rows=2, cols=1,
-        shared_xaxes=True,
-        row_heights=[0.7, 0.3],
-        vertical_spacing=0.05,
-        subplot_titles=[f"HMO Relative Abundance Heatmap for {subject_id}", f"{growth_metric} Over Time"]
-    )
-
-    # Heatmap
-    fig.add_trace(
-        go.Heatmap(
-            x=hmo_long["Sample #"],
-            y=hmo_long["HMO"],
-            z=hmo_long["Relative Abundance"],
-            colorscale="Blues",
-            colorbar=dict(title="Relative Abundance")
-        ),
-        row=1, col=1
-    )
+if hmo_values.notna().any().any():
+
+    def heatmap_figure():
+        # Normalize HMO values (0–1 per subject)
+        hmo_norm = (hmo_values - hmo_values.min()) / (hmo_values.max() - hmo_values.min())
+
+        # --- Build figure ---
+        fig = make_subplots(
+            rows=2, cols=1,
+            shared_xaxes=True,
+            row_heights=[0.7, 0.3],
+            vertical_spacing=0.05,
+            subplot_titles=[f"HMO Relative Abundance Heatmap for {subject_id}", f"{growth_metric} Over Time"]
+        )
+
+        # Heatmap
+        fig.add_trace(
+            go.Heatmap(
+                x=list(range(1, len(hmo_norm) + 1)),
+                y=hmo_columns,
+                z=hmo_norm.to_numpy().T,
+                colorscale="Blues",
+                colorbar=dict(title="Relative Abundance")
+            ),
+            row=1, col=1
+        )
+
+        # Growth line
+        fig.add_trace(
+            go.Scatter(
+                x=list(range(1, len(subject_df) + 1)),
+                y=subject_df[growth_metric],
+                mode="lines+markers",
+                name=growth_metric,
+                line=dict(color="black", width=2)
+            ),
+            row=2, col=1
+        )
 
-    # Growth line
-    fig.add_trace(
-        go.Scatter(
-            x=list(range(1, len(subject_df) + 1)),
-            y=subject_df[growth_metric],
-            mode="lines+markers",
-            name=growth_metric,
-            line=dict(color="black", width=2)
-        ),
-        row=2, col=1
-    )
+        # Replace x-axis ticks with DOL
+        fig.update_xaxes(
+            tickmode="array",
+            tickvals=list(range(1, len(subject_df["DOL"]) + 1)),
+            ticktext=subject_df["DOL"].tolist(),
+            title="Day of Life"
+        )
 
-    # Replace x-axis ticks with DOL
-    fig.update_xaxes(
-        tickmode="array",
-        tickvals=list(range(1, len(subject_df["DOL"]) + 1)),
-        ticktext=subject_df["DOL"].tolist(),
-        title="Day of Life"
-    )
+        fig.update_layout(
+            height=600,
+            template="simple_white"
+        )
 
-    fig.update_layout(
-        height=600,
-        template="simple_white"
-    )
+        return fig
 
+    fig = figures.plotly("hmo_heatmap", heatmap_figure, version, subject=subject_id, metric=growth_metric)
     st.plotly_chart(fig, use_container_width=True)
 
 else:
@@ -497,23 +496,7 @@ symbol_map = {
 }
 
 # HMO columns (nmol/mL block, 2'FL through DSLNH only)
-hmo_columns = [
-    "2FL [nmol/mL]",
-    "DFLac [nmol/mL]",
-    "3SL [nmol/mL]",
-    "6SL [nmol/mL]",
-    "LNT [nmol/mL]",
-    "LNnT [nmol/mL]",
-    "LNFP I [nmol/mL]",
-    "LNFP II [nmol/mL]",
-    "LNFP III [nmol/mL]",
-    "LSTc [nmol/mL]",
-    "DFLNT [nmol/mL]",
-    "DSLNT [nmol/mL]",
-    "DFLNH [nmol/mL]",
-    "FDSLNH [nmol/mL]",
-    "DSLNH [nmol/mL]"
-]
+hmo_columns = data.HMO_NMOL_COLUMNS
 
 
 # Growth metric options
@@ -523,86 +506,91 @@ growth_metric_options = {
     "Head Circumference": "Current HC"
 }
 
-# Filter subjects with >3 timepoints
-subject_counts = combined["Subject ID"].value_counts()
-longitudinal_subjects = subject_counts[subject_counts > 3].index.tolist()
+# Subjects with >3 timepoints
+longitudinal_subjects = db.longitudinal_subjects(4)
 
 # Dropdowns
-selected_subject = st.selectbox("Select a Subject ID", sorted(longitudinal_subjects))
+selected_subject = st.selectbox("Select a Subject ID", longitudinal_subjects)
 selected_hmo = st.selectbox("Select an HMO to plot", hmo_columns)
 selected_growth_label = st.selectbox("Select Growth Metric", list(growth_metric_options.keys()))
 selected_growth_column = growth_metric_options[selected_growth_label]
 
 # Prepare subject data
-subject_df = combined[combined["Subject ID"] == selected_subject].copy()
+subject_df = db.subject_samples(selected_subject, hmo_columns).copy()
 subject_df["DOL"] = pd.to_numeric(subject_df["DOL"], errors="coerce")
-subject_df = subject_df.sort_values("DOL")
-
-# CGA Binning
-subject_df["CGA_cat"] = pd.cut(
-    subject_df["CGA"],
-    bins=[0, 32, 34, 36, 45],
-    labels=["Very Preterm", "Moderate Preterm", "Late Preterm", "Term"],
-    include_lowest=True
-)
 
-# ---------- BUILD FIG ----------
-fig = go.Figure()
-
-# Growth line
-fig.add_trace(go.Scatter(
-    x=subject_df["DOL"],
-    y=subject_df[selected_growth_column],
-    mode="lines+markers",
-    name=f"{selected_growth_label}",
-    marker=dict(color="#1B4A81", size=10),
-    yaxis="y1"
-))
-
-# HMO points by MBM/DBM and Sample Source
-for mbm_type in subject_df["Type of Milk"].dropna().unique():
-    for sample_source in subject_df["Sample Source"].dropna().unique():
-        filtered = subject_df[
-            (subject_df["Type of Milk"] == mbm_type) &
-            (subject_df["Sample Source"] == sample_source)
-        ]
-        fig.add_trace(go.Scatter(
-            x=filtered["DOL"],
-            y=filtered[selected_hmo],
-            mode="markers",
-            name=f"{mbm_type} / {sample_source}",
-            marker=dict(
-                color=mbm_colors.get(mbm_type, "#959191"),
-                symbol=symbol_map.get(sample_source, "circle"),
-                size=14
-            ),
-            yaxis="y2",
-            hovertext=[
-                f"TPN: {t}<br>HMF: {h}<br>CGA: {c}<br>Iron: {i}<br>Source: {s}" 
-                for t, h, c, i, s in zip(
-                    filtered["TPN"],
-                    filtered["HMF"],
-                    filtered["CGA"],
-                    filtered["Iron"],
-                    filtered["Sample Source"]
-                )
-            ],
-            hoverinfo="text"
-        ))
-
-# Layout
-fig.update_layout(
-    title=f"{selected_growth_label} and {selected_hmo} Over Time for {selected_subject}",
-    xaxis=dict(title="Day of Life (DOL)"),
-    yaxis=dict(title=selected_growth_label, side="left"),
-    yaxis2=dict(
-        title=f"{selected_hmo} (nmol/mL)",
-        overlaying="y",
-        side="right"
-    ),
-    plot_bgcolor="#ffffff",
-    paper_bgcolor="#ffffff",
-    font_color="black"
-)
+def hmo_growth_figure():
+    # CGA Binning
+    subject_df["CGA_cat"] = pd.cut(
+        subject_df["CGA"],
+        bins=[0, 32, 34, 36, 45],
+        labels=["Very Preterm", "Moderate Preterm", "Late Preterm", "Term"],
+        include_lowest=True
+    )
 
+    # ---------- BUILD FIG ----------
+    fig = go.Figure()
+
+    # Growth line
+    fig.add_trace(go.Scatter(
+        x=subject_df["DOL"],
+        y=subject_df[selected_growth_column],
+        mode="lines+markers",
+        name=f"{selected_growth_label}",
+        marker=dict(color="#1B4A81", size=10),
+        yaxis="y1"
+    ))
+
+    # HMO points by MBM/DBM and Sample Source
+    for mbm_type in subject_df["Type of Milk"].dropna().unique():
+        for sample_source in subject_df["Sample Source"].dropna().unique():
+            filtered = subject_df[
+                (subject_df["Type of Milk"] == mbm_type) &
+                (subject_df["Sample Source"] == sample_source)
+            ]
+            fig.add_trace(go.Scatter(
+                x=filtered["DOL"],
+                y=filtered[selected_hmo],
+                mode="markers",
+                name=f"{mbm_type} / {sample_source}",
+                marker=dict(
+                    color=mbm_colors.get(mbm_type, "#959191"),
+                    symbol=symbol_map.get(sample_source, "circle"),
+                    size=14
+                ),
+                yaxis="y2",
+                hovertext=[
+                    f"TPN: {t}<br>HMF: {h}<br>CGA: {c}<br>Iron: {i}<br>Source: {s}" 
+                    for t, h, c, i, s in zip(
+                        filtered["TPN"],
+                        filtered["HMF"],
+                        filtered["CGA"],
+                        filtered["Iron"],
+                        filtered["Sample Source"]
+                    )
+                ],
+                hoverinfo="text"
+            ))
+
+    # Layout
+    fig.update_layout(
+        title=f"{selected_growth_label} and {selected_hmo} Over Time for {selected_subject}",
+        xaxis=dict(title="Day of Life (DOL)"),
+        yaxis=dict(title=selected_growth_label, side="left"),
+        yaxis2=dict(
+            title=f"{selected_hmo} (nmol/mL)",
+            overlaying="y",
+            side="right"
+        ),
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        font_color="black"
+    )
+
+    return fig
+
+fig = figures.plotly(
+    "hmo_growth", hmo_growth_figure, version,
+    subject=selected_subject, hmo=selected_hmo, metric=selected_growth_column,
+)
 st.plotly_chart(fig, use_container_width=True)
@@ -6,6 +6,11 @@ import plotly.express as px
 import matplotlib.pyplot as plt
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from neobank import data, hmo
 
 ####--------------------------------------------------------------------------------------------------------------
 ############### Overview section ###############
@@ -258,7 +263,7 @@ st.plotly_chart(fig1, use_container_width=True)
  ####--------------------------------------------------------------------------------------------------------------
 
 
-df = pd.read_excel("Cleaned Data/Unlinked_Merged.xlsx")
+df = data.load_unlinked()
 
 
 hmo_columns = ["2FL", "DFLAC", "3SL", "6SL", "LNT", "LNnT", "LNFPI",
@@ -288,21 +293,11 @@ growth_metric = st.selectbox("Select Growth Metric", ["Current Weight", "Current
 
 # --- Filter subject data ---
 subject_df = df[df["Subject ID"] == subject_id].copy()
-subject_df = subject_df.sort_values("DOL").reset_index(drop=True)
+subject_df = subject_df.sort_values("DOL", kind="stable").reset_index(drop=True)
 
-# Normalize HMOs per column
-hmo_values = subject_df[hmo_columns]
+# Normalize HMOs per column (same samples, same order, from the HMO store)
+hmo_values = hmo.unlinked().subject_wide(subject_id, hmo_columns)
 hmo_norm = (hmo_values - hmo_values.min()) / (hmo_values.max() - hmo_values.min())
-hmo_norm["Sample #"] = range(1, len(hmo_norm) + 1)
-hmo_norm["DOL"] = subject_df["DOL"].values
-
-# Melt for heatmap
-hmo_long = hmo_norm.melt(
-    id_vars=["Sample #","DOL"], 
-    value_vars=hmo_columns, 
-    var_name="HMO", 
-    value_name="Relative Abundance"
-)
 
 # Example: synthetic clinical events (replace with real when available)
 disease_events = pd.DataFrame({
@@ -326,9 +321,9 @@ fig = make_subplots(
 # Row 1: Heatmap
 fig.add_trace(
     go.Heatmap(
-        x=hmo_long["Sample #"],
-        y=hmo_long["HMO"],
-        z=hmo_long["Relative Abundance"],
+        x=list(range(1, len(hmo_norm) + 1)),
+        y=hmo_columns,
+        z=hmo_norm.to_numpy().T,
         colorscale="Blues",
         colorbar=dict(title="Relative Abundance")
     ),
@@ -1,5 +1,10 @@
 import streamlit as st
 import pandas as pd
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from neobank import data
 
 
 st.title("NeoBANK Dashboard 2025")
@@ -35,7 +40,7 @@ with st.container():
 st.title("Raw Data")
 
 # Load the data
-df = pd.read_excel("Cleaned Data/merged_df.xlsx")
+df = data.load_merged_df()
 st.subheader("📄 Raw Data Preview")
 st.dataframe(df.head(10))  # Show only the first 10 rows for now
 
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from neobank import acreport, batches, secretor, store
+from neobank.data import MERGED_DF
+
+REPORT = acreport.AC_REPORTS[0]
+KEY = batches.KEY
+COLS = ["2FL [nmol/mL]", "LNT [nmol/mL]"]
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=[KEY] + COLS)
+
+
+def test_diff_blank_rows_are_not_new():
+    cohort = _frame([("a", np.nan, np.nan), ("b", 1.0, 2.0)])
+    incoming = _frame([("a", np.nan, np.nan), ("b", np.nan, np.nan)])
+    new, same, conflicting, conflicts = batches.diff_batch(cohort, incoming, COLS)
+    assert not new.any() and same.all() and not conflicting.any()
+    assert conflicts.empty
+
+
+def test_diff_reports_conflicting_cells():
+    cohort = _frame([("a", 1.0, 2.0), ("b", np.nan, np.nan)])
+    incoming = _frame([("a", 1.0, 3.0), ("b", 5.0, np.nan)])
+    new, same, conflicting, conflicts = batches.diff_batch(cohort, incoming, COLS)
+    assert new.tolist() == [False, True]
+    assert conflicting.tolist() == [True, False]
+    assert not same.any()
+    assert conflicts.to_dict("records") == [
+        {KEY: "a", "column": "LNT [nmol/mL]", "existing": 2.0, "incoming": 3.0}
+    ]
+
+
+def test_dedupe_keeps_the_first_row_with_results():
+    wide = _frame([("a", np.nan, np.nan), ("a", 1.0, 2.0), ("a", 1.0, 4.0), ("b", 3.0, 3.0)])
+    first, duplicates = batches._dedupe_batch(wide, COLS)
+    assert first[KEY].tolist() == ["a", "b"]
+    assert first[COLS].iloc[0].tolist() == [1.0, 2.0]
+    assert duplicates["column"].tolist() == ["LNT [nmol/mL]"]
+
+
+def _rebuild(path):
+    # what the pipeline's combined stage produces for the report's HMO columns
+    long, samples = acreport.read_report(REPORT)
+    wide = acreport.to_wide(long, acreport.first_reported(long, samples))
+    cohort = store.read_parquet(MERGED_DF).merge(wide, on=KEY, how="left")
+    status = secretor.classify(cohort["2FL [nmol/mL]"], secretor.THRESHOLDS["nmol/mL"])
+    cohort["moms_secretor_status"] = secretor.mom_status(cohort, status)
+    # as stored, so the dtypes match what upsert_batch reads back
+    store.write_parquet(cohort, path)
+    return store.read_parquet(path), [c for c in wide.columns if c != KEY and c in cohort]
+
+
+@pytest.fixture(scope="module")
+def rebuilt(tmp_path_factory):
+    return _rebuild(tmp_path_factory.mktemp("rebuild") / "merged_ALL.parquet")
+
+
+def test_upsert_matches_a_full_rebuild(rebuilt, tmp_path):
+    full, value_cols = rebuilt
+    empty = full.copy()
+    empty[value_cols] = np.nan
+    empty["moms_secretor_status"] = pd.NA
+    path = tmp_path / "merged_ALL.parquet"
+    store.write_parquet(empty, path)
+
+    result, upserted = batches.upsert_batch(REPORT, cohort_path=path, write=False)
+    assert result.conflicts.empty
+    pd.testing.assert_frame_equal(
+        upserted[[KEY] + value_cols].reset_index(drop=True),
+        full[[KEY] + value_cols].reset_index(drop=True),
+    )
+    assert (upserted["moms_secretor_status"].astype("string").fillna("")
+            == full["moms_secretor_status"].astype("string").fillna("")).all()
+
+
+def test_upsert_of_an_ingested_report_is_a_no_op(rebuilt, tmp_path):
+    full, value_cols = rebuilt
+    path = tmp_path / "merged_ALL.parquet"
+    store.write_parquet(full, path)
+    cohort = store.read_parquet(path)
+
+    result, upserted = batches.upsert_batch(REPORT, cohort_path=path, write=False)
+    assert result.inserted == [] and result.subjects == []
+    assert result.conflicts.empty
+    pd.testing.assert_frame_equal(upserted, cohort)
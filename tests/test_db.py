@@ -0,0 +1,42 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from neobank import data, db, reference, store, zscore
+
+
+def _connect(tables):
+    con = db.register_functions(sqlite3.connect(":memory:"))
+    for name, table in tables.items():
+        table.to_sql(name, con, index=False)
+    return con
+
+
+def test_lms_z_udf_matches_numpy():
+    rng = np.random.default_rng(0)
+    n = 500
+    value = rng.uniform(0.5, 60.0, n)
+    L = np.r_[rng.uniform(-2.0, 2.0, n - 2), 0.0, 1e-10]
+    M = value * rng.uniform(0.7, 1.3, n)
+    S = rng.uniform(0.02, 0.2, n)
+    con = _connect({"t": pd.DataFrame({"value": value, "L": L, "M": M, "S": S})})
+    sql = pd.read_sql_query("SELECT lms_z(value, L, M, S) AS z FROM t ORDER BY rowid", con)["z"]
+    assert np.allclose(sql, zscore.lms_z(value, L, M, S), rtol=0, atol=1e-12)
+    assert db.lms_z(None, 1.0, 1.0, 0.1) is None
+    assert db.lms_z(-1.0, 1.0, 1.0, 0.1) is None
+
+
+def test_sql_zscores_match_numpy():
+    cohort = zscore.add_gestational_ages(store.read_parquet(data.MERGED_ALL))
+    tables = db.tables(cohort)
+    con = _connect({"Subjects": tables["Subjects"], "growth_refs": tables["growth_refs"]})
+    sql = pd.read_sql_query(db._zscore_sql().format(where="1"), con)
+    expected = zscore.add_routed_zscores(cohort, reference.load())
+
+    assert len(sql) == len(cohort)
+    for _, _, z_col in zscore.MEASURE_COLUMNS.values():
+        z = expected[z_col].to_numpy(dtype=float)
+        assert np.isfinite(z).any()
+        # the daily grid re-associates the interpolation, a few 1e-12 z at most
+        assert np.allclose(sql[z_col].to_numpy(dtype=float), z, rtol=0, atol=1e-10, equal_nan=True)
@@ -0,0 +1,53 @@
+import plotly.graph_objects as go
+
+from neobank.figures import FigureCache
+
+
+def _figure(n):
+    return go.Figure(go.Scatter(x=list(range(n)), y=list(range(n))))
+
+
+def test_plotly_hit_returns_the_cached_figure():
+    cache = FigureCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _figure(10)
+
+    first = cache.plotly("a", build)
+    assert cache.plotly("a", build) is first
+    assert len(builds) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.size == len(first.to_json())
+
+
+def test_evicts_least_recently_used_past_the_cap():
+    size = len(_figure(100).to_json())
+    cache = FigureCache(max_bytes=2 * size)
+    cache.plotly("a", lambda: _figure(100))
+    cache.plotly("b", lambda: _figure(100))
+    cache.plotly("a", lambda: _figure(100))
+    cache.plotly("c", lambda: _figure(100))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size <= cache.max_bytes
+
+    cache.put("big", b"x" * (3 * size))
+    assert cache.get("big") is None
+
+
+def test_png_bytes():
+    import matplotlib.pyplot as plt
+
+    cache = FigureCache()
+
+    def build():
+        fig, ax = plt.subplots()
+        ax.plot([0, 1], [0, 1])
+        return fig
+
+    png = cache.png("p", build, dpi=20)
+    assert png.startswith(b"\x89PNG")
+    assert cache.png("p", build) is png
+    assert cache.size == len(png)
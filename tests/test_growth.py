@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from neobank import growth
+
+
+def _subject():
+    return pd.DataFrame({
+        "Subject ID": "S1",
+        "Infant Sex": "Female",
+        "DOL": [14, 0, 7],
+        "CGA": [32.0, 30.0, 31.0],
+        "Current Weight": [1500.0, 1200.0, np.nan],
+        "Current Height": [41.0, 39.0, 40.0],
+        "Current HC": [29.0, 27.5, 28.0],
+    })
+
+
+def test_one_trace_per_panel_in_dol_order():
+    fig = growth.growth_figure(_subject())
+    assert len(fig.data) == len(growth.PANELS)
+    weight = fig.data[0]
+    assert list(weight.x) == [0, 7, 14]
+    assert np.isnan(weight.y[1])
+    assert list(weight.y[[0, 2]]) == [1200.0, 1500.0]
+
+
+def test_zscore_row():
+    fig = growth.growth_figure(_subject(), zscores=True)
+    z = [t for t in fig.data if t.name.endswith("z-score")]
+    assert len(z) == len(growth.PANELS)
+    assert all(t.yaxis != fig.data[0].yaxis for t in z)
+    assert np.isfinite(z[1].y).all()
+
+
+def test_centile_bands_cover_the_stay():
+    fig = growth.growth_figure(_subject(), centiles=True)
+    bands = [t for t in fig.data if t.name.startswith("centile")]
+    assert len(bands) == len(growth.PANELS) * len(growth.BAND_CENTILES)
+    assert min(bands[0].x) >= -growth.DOL_TICK
+    assert max(bands[0].x) <= 14 + growth.DOL_TICK
+
+
+def test_birth_centiles_at_dol_zero():
+    fig = growth.growth_figure(_subject(), centiles=True)
+    birth = [t for t in fig.data if t.name.startswith("birth centiles")]
+    assert len(birth) == len(growth.PANELS)
+    weight = birth[0]
+    assert list(weight.x) == [0]
+    # GA at birth is 30 weeks, inside the published 24-33 week curves
+    assert weight.error_y.arrayminus[0] > 0 and weight.error_y.array[0] > 0
+
+
+def test_no_birth_centiles_outside_the_published_range():
+    term = _subject().assign(CGA=[39.0, 37.0, 38.0])
+    fig = growth.growth_figure(term, centiles=True)
+    assert not [t for t in fig.data if t.name.startswith("birth centiles")]
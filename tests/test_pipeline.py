@@ -0,0 +1,69 @@
+from functools import partial
+
+import pytest
+
+from neobank.pipeline import core
+from neobank.pipeline.core import Stage, _dependencies, _execute, run
+
+
+def _read(value):
+    return value
+
+
+def _write(path, **frames):
+    path.write_text(repr(sorted(frames.items())))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_reads_are_passed_to_their_stage(tmp_path, workers):
+    stages = [
+        Stage("a", partial(_write, tmp_path / "a"), [], [],
+              reads={"x": partial(_read, 1), "y": partial(_read, 2)}),
+        Stage("b", partial(_write, tmp_path / "b"), [], []),
+    ]
+    _execute(stages, workers)
+    assert (tmp_path / "a").read_text() == repr([("x", 1), ("y", 2)])
+    assert (tmp_path / "b").read_text() == "[]"
+
+
+def _fail():
+    raise RuntimeError("stage failed")
+
+
+def test_code_hash_covers_imported_neobank_modules():
+    from neobank.pipeline import stages
+
+    names = [m.__name__ for m in _dependencies(stages)]
+    assert "neobank.zscore" in names and "neobank.normalize" in names
+    assert Stage("s", partial(stages.build_combined), [], []).code_hash() == \
+        Stage("s", stages.build_combined, [], []).code_hash()
+
+
+def test_manifest_is_saved_after_each_wave(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "ROOT", tmp_path)
+    out = tmp_path / "a.txt"
+    manifest = tmp_path / "manifest.json"
+    first = Stage("a", partial(_write, out), [], [out])
+    second = Stage("b", _fail, [out], [])
+    with pytest.raises(RuntimeError):
+        run([first, second], manifest_path=manifest, log=lambda msg: None, workers=1)
+
+    logged = []
+    with pytest.raises(RuntimeError):
+        run([first, second], manifest_path=manifest, log=logged.append, workers=1)
+    assert logged[0] == "[a] up to date"
+
+
+def test_unlinked_area_counts_join_chunk_by_chunk():
+    import pandas as pd
+
+    from neobank.pipeline import stages
+
+    meta = stages.clean_unlinked_metadata(
+        pd.read_excel(stages.UNLINKED_METADATA_XLSX),
+        pd.read_excel(stages.UNLINKED_SUBJECTS_XLSX, sheet_name="Subject Metadata"),
+    )
+    whole = stages.merge_unlinked_area_counts(meta, stages.iter_unlinked_area_counts(chunk_rows=100_000))
+    chunked = stages.merge_unlinked_area_counts(meta, stages.iter_unlinked_area_counts(chunk_rows=16))
+    assert len(whole) > 16
+    pd.testing.assert_frame_equal(whole, chunked)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from neobank import reference, zscore
+from neobank.zscore import LMSReference
+
+
+def _zlevel_table(L, M, S, ga_weeks):
+    z = reference.Z_LEVELS
+    rows = []
+    for ga, l, m, s in zip(ga_weeks, L, M, S):
+        values = m * (1 + l * s * z) ** (1 / l)
+        rows += [("female", "weight", ga, level, v) for level, v in zip(z, values)]
+    return pd.DataFrame(rows, columns=["sex", "measure", "ga_weeks", "z_level", "value"])
+
+
+def test_fit_lms_recovers_parameters():
+    L, M, S = np.array([-1.2, 0.4, 1.5]), np.array([1.1, 2.0, 3.2]), np.array([0.14, 0.12, 0.09])
+    fitted = reference.fit_lms(_zlevel_table(L, M, S, [24.0, 25.0, 26.0]))
+    assert np.allclose(fitted["L"], L, atol=1e-3)
+    assert np.allclose(fitted["M"], M)
+    assert np.allclose(fitted["S"], S, atol=1e-4)
+    assert fitted["max_abs_dz"].max() < 1e-3
+
+
+def test_fit_rescores_published_levels():
+    fitted = reference.fit_lms(_zlevel_table([0.5], [2.0], [0.1], [30.0]))
+    values = _zlevel_table([0.5], [2.0], [0.1], [30.0])["value"]
+    z = zscore.lms_z(values, fitted["L"][0], fitted["M"][0], fitted["S"][0])
+    assert np.allclose(z, reference.Z_LEVELS, atol=1e-3)
+
+
+def test_compiled_reference_within_tolerance():
+    ref = reference.compile_reference()
+    assert (ref["max_abs_dz"] <= ref["standard"].map(reference.MAX_ABS_DZ)).all()
+
+
+def _curve(ages, max_gap):
+    n = len(ages)
+    return LMSReference.from_arrays(
+        np.zeros(n, dtype=int), np.zeros(n, dtype=int), ages,
+        np.ones(n), np.linspace(1.0, 2.0, n), np.full(n, 0.1), max_gap=max_gap,
+    )
+
+
+def test_interpolation_stops_at_wide_gaps():
+    ref = _curve([24.0, 25.0, 33.0], max_gap=reference.MAX_GA_GAP_WEEKS)
+    _, M, _ = ref.interpolate(np.zeros(4, dtype=int), [24.5, 25.0, 28.0, 33.0])
+    assert np.allclose(M[[0, 1, 3]], [1.25, 1.5, 2.0])
+    assert np.isnan(M[2])
+
+    _, M, _ = _curve([24.0, 25.0, 33.0], max_gap=None).interpolate(np.array([0]), [29.0])
+    assert np.allclose(M, 1.75)
+
+
+def test_coverage_gaps_lists_wide_gaps():
+    ref = pd.DataFrame({
+        "standard": "very_preterm", "sex": "female", "measure": "hc",
+        "ga_weeks": [24.0, 25.0, 34.0], "L": 1.0, "M": 1.0, "S": 0.1,
+    })
+    gaps = reference.coverage_gaps(ref)
+    assert gaps["ga_weeks"].tolist() == [25.0]
+    assert gaps["gap_weeks"].tolist() == [9.0]
@@ -0,0 +1,17 @@
+import pandas as pd
+import pytest
+
+from neobank import store
+
+
+def test_derived_file_refuses_other_source_versions(tmp_path):
+    path = tmp_path / "facts.parquet"
+    df = pd.DataFrame({"row": [0, 1], "value": [1.5, None]})
+    store.write_derived(df, path, "abc")
+    assert store.derived_from(path) == "abc"
+    pd.testing.assert_frame_equal(store.read_derived(path, tmp_path / "source.xlsx", "abc"), df)
+
+    with pytest.raises(store.OutOfDateError, match="source.xlsx"):
+        store.read_derived(path, tmp_path / "source.xlsx", "def")
+    with pytest.raises(FileNotFoundError):
+        store.read_derived(tmp_path / "missing.parquet", tmp_path / "source.xlsx", "abc")
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from neobank.subjects import SubjectIndex
+
+
+def test_slices_follow_positions_not_labels():
+    df = pd.DataFrame({
+        "Subject ID": ["B", "A", None, "B", "A", "B"],
+        "DOL": [5, 3, 1, np.nan, 3, 2],
+        "sample": ["b5", "a3", "x", "bNaN", "a3'", "b2"],
+    }, index=[10, 4, 0, 2, 1, 3])
+    index = SubjectIndex(df)
+    assert index.subjects == ["A", "B"]
+    # stable on DOL ties, missing DOL last, rows without a subject dropped
+    assert index.slice("A")["sample"].tolist() == ["a3", "a3'"]
+    assert index.slice("B")["sample"].tolist() == ["b2", "b5", "bNaN"]
+    assert index.counts.to_dict() == {"A": 2, "B": 3}
+    assert index.longitudinal(3) == ["B"]
+    assert index.slice("C").empty
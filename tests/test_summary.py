@@ -0,0 +1,64 @@
+import pandas as pd
+
+from neobank import data, store, summary
+
+
+def _cohort():
+    cohort = store.read_parquet(data.MERGED_ALL)
+    subjects = cohort[summary.SUBJECT_COL].dropna().astype(str).unique()[:4]
+    return cohort[cohort[summary.SUBJECT_COL].astype(str).isin(subjects)].reset_index(drop=True)
+
+
+def test_digests_ignore_row_order():
+    cohort = _cohort()
+    shuffled = cohort.sample(frac=1, random_state=0)
+    pd.testing.assert_series_equal(summary.subject_digests(cohort), summary.subject_digests(shuffled))
+
+
+def test_digests_change_with_input_rows_only():
+    cohort = _cohort()
+    before = summary.subject_digests(cohort)
+    first = before.index[0]
+    rows = cohort[summary.SUBJECT_COL].astype(str) == first
+
+    edited = cohort.copy()
+    edited.loc[rows.idxmax(), "DOL"] = edited.loc[rows, "DOL"].max() + 100
+    after = summary.subject_digests(edited)
+    assert (before != after).tolist() == [s == first for s in before.index]
+
+    # columns outside INPUT_COLUMNS do not touch the digest
+    other = cohort.assign(**{"Current Weight": 0.0})
+    pd.testing.assert_series_equal(before, summary.subject_digests(other))
+
+
+def test_refresh_recomputes_changed_subjects(tmp_path):
+    path = tmp_path / "subject_summary.parquet"
+    cohort = _cohort()
+    messages = []
+    full = summary.refresh(cohort, path, log=messages.append)
+    assert messages[-1].startswith(f"[subject_summary] {len(full)} of {len(full)}")
+
+    assert summary.refresh(cohort, path, log=messages.append).equals(full)
+    assert messages[-1].startswith(f"[subject_summary] 0 of {len(full)}")
+
+    dropped = full[summary.SUBJECT_COL].iloc[0]
+    rest = cohort[cohort[summary.SUBJECT_COL].astype(str) != str(dropped)]
+    edited = rest.copy()
+    edited.loc[edited.index[0], "DOL"] = edited["DOL"].max() + 1
+    out = summary.refresh(edited, path, log=messages.append)
+    assert messages[-1].startswith(f"[subject_summary] 1 of {len(full) - 1}")
+    assert str(dropped) not in out[summary.SUBJECT_COL].astype(str).tolist()
+    pd.testing.assert_frame_equal(
+        out.drop(columns=summary.DIGEST_COL).convert_dtypes(),
+        summary.compute(edited).convert_dtypes(),
+    )
+
+
+def test_compute_builds_only_the_tables_it_reads(monkeypatch):
+    from neobank import db
+
+    def fail(df):
+        raise AssertionError("db.tables builds every table")
+
+    monkeypatch.setattr(db, "tables", fail)
+    assert len(summary.compute(_cohort())) == 4
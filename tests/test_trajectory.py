@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from neobank import trajectory
+
+
+def _features():
+    ts = pd.DataFrame({
+        "Subject ID": ["A", "A", "B", "C", "C"],
+        "DOL": [1, 8, 3, 1, 8],
+        "Current Weight": [1000.0, 1300.0, 900.0, 1000.0, 1010.0],
+        "Current Height": [35.0, 36.0, 34.0, np.nan, np.nan],
+        "Current HC": [25.0, 26.0, 24.0, 25.0, 25.2],
+        "z_weight_for_age": [-1.0, -2.5, 0.1, np.nan, 0.3],
+    })
+    return trajectory.subject_features(trajectory.prepare(ts))
+
+
+def test_velocities():
+    feats = _features()
+    assert np.isclose(feats.loc["A", "weight_velocity_exp"], 1000 * np.log(1.3) / 7)
+    assert np.isclose(feats.loc["A", "length_velocity_cm_wk"], 1.0)
+    assert np.isnan(feats.loc["C", "length_velocity_cm_wk"])
+
+
+def test_delta_z_needs_two_measured_samples():
+    feats = _features()
+    assert np.isclose(feats.loc["A", "delta_z_weight"], -1.5)
+    # B has one sample, C one measured z-score
+    assert feats.loc[["B", "C"], "delta_z_weight"].isna().all()
+
+
+def test_flags_are_na_when_unknown():
+    feats = _features()
+    assert feats["flag_weight_z_decline"].dtype == "boolean"
+    assert feats.loc["A", "flag_weight_z_decline"]
+    assert pd.isna(feats.loc["B", "flag_weight_z_decline"])
+    assert pd.isna(feats.loc["C", "flag_weight_z_decline"])
+    # C gains slowly, so it falters whatever its z-scores say; B is unknown
+    assert feats.loc["C", "flag_slow_weight_gain"]
+    assert feats.loc["A", "growth_faltering"]
+    assert pd.isna(feats.loc["B", "growth_faltering"])
+    assert feats.loc["C", "growth_faltering"]
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from neobank import reference, zscore
+from neobank.zscore import NEWBORN, POSTNATAL_PRETERM, STANDARDS, VERY_PRETERM
+
+
+def test_route_standards():
+    code, age = zscore.route_standards(
+        ga_birth=[28.0, 35.0, 30.0, 38.0, np.nan],
+        pma=[28.0, 35.0, 34.0, 40.0, 30.0],
+        dol=[0, 0, 28, 14, 5],
+    )
+    expected = [STANDARDS.index(VERY_PRETERM), STANDARDS.index(NEWBORN), STANDARDS.index(POSTNATAL_PRETERM), -1, -1]
+    assert code.tolist() == expected
+    assert age[:3].tolist() == [28.0, 35.0, 34.0]
+
+
+def test_routed_zscores_match_each_standard():
+    ref = reference.load()
+    df = pd.DataFrame({
+        "Infant Sex": ["Female", "Male", "Female", "Male"],
+        "GA_birth_weeks": [28.0, 36.0, 30.0, 39.0],
+        "PMA_weeks": [28.0, 36.0, 34.0, 41.0],
+        "DOL": [0, 0, 28, 14],
+        "Current Weight": [1100.0, 2600.0, 1900.0, 3500.0],
+        "Current Height": [37.0, 46.0, 43.0, 50.0],
+        "Current HC": [26.0, 32.5, 30.0, 35.0],
+    })
+    out = zscore.add_routed_zscores(df, ref)
+    assert out[zscore.STANDARD_COL].tolist()[:3] == [VERY_PRETERM, NEWBORN, POSTNATAL_PRETERM]
+    assert pd.isna(out[zscore.STANDARD_COL].iloc[3])
+
+    for i, (standard, age) in enumerate([(VERY_PRETERM, 28.0), (NEWBORN, 36.0), (POSTNATAL_PRETERM, 34.0)]):
+        row = df.iloc[i]
+        z = ref.zscore(row["Current Weight"] / 1000.0, row["Infant Sex"], "weight", age, standard, clip=False)
+        assert np.isclose(out["z_weight_for_age"].iloc[i], z[0])
+    assert out[["z_weight_for_age", "z_length_for_age", "z_hc_for_age"]].iloc[3].isna().all()
+
+
+def test_routed_zscores_flag_out_of_range():
+    df = pd.DataFrame({
+        "Infant Sex": ["Female"], "GA_birth_weeks": [23.0], "PMA_weeks": [23.0], "DOL": [0],
+        "Current Weight": [600.0], "Current Height": [30.0], "Current HC": [21.0],
+    })
+    out = zscore.add_routed_zscores(df, reference.load())
+    assert out["qc_z_out_of_range"].iloc[0]
+    assert np.isnan(out["z_weight_for_age"].iloc[0])
+
+
+def test_index_matches_interpolation_on_grid_days():
+    ref = reference.load()
+    index = reference.load_index(step_days=1)
+    group = np.repeat(np.arange(len(ref.present)), 200)
+    group = np.where(ref.present[group], group, -1)
+    days = np.tile(np.arange(24 * 7, 24 * 7 + 200), len(ref.present))
+    L, M, S = ref.interpolate(group, days / 7.0)
+    Li, Mi, Si = index.lms(group, days / 7.0)
+    inside = ~np.isnan(Mi)
+    assert inside.any()
+    assert np.allclose(np.c_[L, M, S][inside], np.c_[Li, Mi, Si][inside])
+    # NaN steps are outside the curve or inside a gap, never a lookup miss
+    outside = ~ref.in_range(group, days / 7.0) & ~np.isclose(days / 7.0, ref.age_max[np.maximum(group, 0)])
+    assert (~inside == (outside | np.isnan(M))).all()
+
+
+def test_index_scalar_and_array_agree():
+    index = reference.load_index(POSTNATAL_PRETERM, step_days=1)
+    ages = np.array([27.0, 30.4, 45.1, 80.0])
+    z = index.zscore([1.0, 1.4, 3.0, 5.0], "F", "weight", ages, POSTNATAL_PRETERM)
+    one = [index.zscore_one(v, "F", "weight", a, POSTNATAL_PRETERM) for v, a in zip([1.0, 1.4, 3.0, 5.0], ages)]
+    assert np.allclose(z, one, equal_nan=True)
+    assert np.isnan(z[-1])
+
+
+def test_non_positive_values_score_nan():
+    index = reference.load_index(POSTNATAL_PRETERM, step_days=1)
+    values = [0.0, -1.2, 1.4]
+    z = index.zscore(values, "F", "weight", 30.4, POSTNATAL_PRETERM)
+    one = [index.zscore_one(v, "F", "weight", 30.4, POSTNATAL_PRETERM) for v in values]
+    assert np.isnan(z[:2]).all() and np.isnan(one[:2]).all()
+    assert np.isclose(z[2], one[2])